@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Benchmarks of the stages of the plotting pipeline.
+
+Synthetic ARINC 717 raw data and HDF files of several durations and numbers
+of parameters are generated within a work directory (and reused by later
+runs). Each stage is timed a number of times and the best time is written
+to a JSON report, which can be compared with a baseline report:
+
+    python -m benchmarks.run -o report.json
+    python -m benchmarks.run -o new.json --baseline report.json
+
+Each HDF profile (see flightdataplotter.hdf_profile) is benchmarked by
+writing the parameters of the synthetic HDF files with it and reading them
+back whole, as the overview does, and in windows, as zooming does.
+
+Decoding with process_data is benchmarked with the synthetic raw data of
+the shortest duration and a synthetic LFL matching it, or with --lfl and
+--raw-data when provided. It requires compass and is skipped without it, or
+if compass does not accept the synthetic LFL.
+
+A stage which fails is recorded within the report's errors and the other
+stages still run. The report is written after each stage.
+'''
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import matplotlib
+matplotlib.use('Agg')
+
+import h5py
+import matplotlib.pyplot as plt
+import numpy as np
+
+from benchmarks.synthetic import make_hdf, make_lfl, make_raw_data, param_names
+from flightdataplotter.decimate import minmax_decimate
+from flightdataplotter.hdf_profile import PROFILES
+from flightdataplotter.plot_params import ProcessAndPlotLoops, copy_file_part, copy_frame_part, process_raw_hdf
+from flightdataplotter.plotting import PlotSession, _line_specs
+
+
+HOURS = (1, 10, 20)
+PARAM_COUNTS = (1, 100, 5000)
+# Parameters plotted from each HDF file, as the AXIS groups of an LFL would.
+AXIS_PARAMS = 8
+# Windows read from each parameter when benchmarking zoomed reads.
+READ_WINDOWS = 100
+REGRESSION_THRESHOLD = 1.25
+
+
+def measure(func, repeat=3):
+    '''
+    Time func, returning the best and median of repeat calls.
+
+    :rtype: dict
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': float(np.median(times)), 'repeat': repeat}
+
+
+def _axes(count):
+    names = param_names(count)[:AXIS_PARAMS]
+    return [names[:1], names[1:4] or None, names[4:] or None, None, None, None]
+
+
+def bench_raw_data(work_dir, hours, repeat):
+    results = {}
+    for duration in hours:
+        data_path = os.path.join(work_dir, 'raw_%gh.dat' % duration)
+        if not os.path.isfile(data_path):
+            make_raw_data(data_path, duration * 3600)
+
+        def copy_percent():
+            os.remove(copy_file_part(data_path, 25, 75))
+
+        def copy_frames():
+            os.remove(copy_frame_part(data_path, 0, int(duration * 450)))
+
+        print('copy_file_part %gh' % duration)
+        results['copy_file_part/%gh' % duration] = measure(copy_percent, repeat)
+        print('copy_frame_part %gh' % duration)
+        results['copy_frame_part/%gh' % duration] = measure(copy_frames, repeat)
+    return results
+
+
+def bench_hdf(work_dir, hours, param_counts, repeat):
+    results = {}
+    for duration in hours:
+        for count in param_counts:
+            label = '%gh/%dp' % (duration, count)
+            print('Plotting stages %s' % label)
+            hdf_path = make_hdf(os.path.join(work_dir, 'flight_%gh_%dp.hdf5' % (duration, count)),
+                                duration, count)
+            axes = _axes(count)
+            results['process_raw_hdf/' + label] = measure(lambda: process_raw_hdf(hdf_path, axes), repeat)
+
+            params, plot_axes = process_raw_hdf(hdf_path, axes)
+            # The overview of each line is computed on first use, so this
+            # includes reading every plotted sample once.
+            results['line_specs/' + label] = measure(
+                lambda: _line_specs(process_raw_hdf(hdf_path, axes)[0], plot_axes, False), repeat)
+
+            def render():
+                session = PlotSession(False, blit=False)
+                session.update(params, plot_axes)
+                session.fig.canvas.draw()
+                plt.close(session.fig)
+
+            results['render_agg/' + label] = measure(render, repeat)
+
+            session = PlotSession(False, blit=False)
+            session.update(params, plot_axes)
+            axis = session._axes[1]
+            xlim = axis.get_xlim()
+            span = (xlim[1] - xlim[0]) / 100
+
+            def zoom():
+                for step in range(10):
+                    axis.set_xlim(xlim[0] + step * span, xlim[0] + (step + 1) * span)
+                session.fig.canvas.draw()
+
+            results['zoom_agg/' + label] = measure(zoom, repeat)
+            plt.close(session.fig)
+    return results
+
+
+def _read_whole(hdf_path, names):
+    with h5py.File(hdf_path, 'r') as hdf:
+        for name in names:
+            group = hdf['series'][name]
+            group['data'][:]
+            group['mask'][:]
+
+
+def _read_windows(hdf_path, names):
+    with h5py.File(hdf_path, 'r') as hdf:
+        for name in names:
+            group = hdf['series'][name]
+            size = group['data'].shape[0]
+            # Windows of 1% spread over the parameter.
+            span = max(size // READ_WINDOWS, 1)
+            for start in range(0, size, max(size // 10, 1)):
+                group['data'][start:start + span]
+                group['mask'][start:start + span]
+
+
+def bench_hdf_profiles(work_dir, hours, param_counts, profiles, repeat):
+    '''
+    Write the parameters of each synthetic HDF file with each profile and
+    read the plotted parameters back. The size written is recorded with the
+    write times.
+    '''
+    results = {}
+    for duration in hours:
+        for count in param_counts:
+            src_path = make_hdf(os.path.join(work_dir, 'flight_%gh_%dp.hdf5' % (duration, count)),
+                                duration, count)
+            names = param_names(count)[:AXIS_PARAMS]
+            for name in profiles:
+                profile = PROFILES[name]
+                label = '%s/%gh/%dp' % (name, duration, count)
+                print('HDF profile %s' % label)
+                hdf_path = os.path.join(work_dir, 'profile_%s.hdf5' % name)
+
+                def write():
+                    with h5py.File(src_path, 'r') as src, profile.open(hdf_path) as dest:
+                        dest.attrs.update(src.attrs)
+                        profile.copy_params(dest, src['series'].items())
+
+                results['hdf_write/' + label] = measure(write, repeat)
+                results['hdf_write/' + label]['bytes'] = os.path.getsize(hdf_path)
+                results['hdf_read/' + label] = measure(lambda: _read_whole(hdf_path, names), repeat)
+                results['hdf_read_windows/' + label] = measure(lambda: _read_windows(hdf_path, names), repeat)
+                os.remove(hdf_path)
+    return results
+
+
+def bench_decimate(hours, repeat):
+    results = {}
+    for duration in hours:
+        y = np.ma.masked_invalid(np.cumsum(np.random.RandomState(0).normal(size=int(duration * 3600 * 8))))
+        x = np.arange(len(y))
+        results['minmax_decimate/%gh' % duration] = measure(lambda: minmax_decimate(x, y, 2000), repeat)
+    return results
+
+
+def bench_process_data(work_dir, lfl_path, data_path, jobs, repeat):
+    '''
+    Decode the LFL's AXIS parameters with an empty cache (cold) and then
+    again with the parameters cached (warm).
+    '''
+    output_path = os.path.join(work_dir, 'process_data.hdf5')
+
+    def process(cache_dir):
+        loops = ProcessAndPlotLoops(output_path, False, lfl_path, None)
+        loops.process_data(lfl_path, data_path, output_path, -1, False, False, {},
+                           jobs=jobs, cache_dir=cache_dir)
+        return loops
+
+    def cold():
+        cache_dir = tempfile.mkdtemp(dir=work_dir)
+        try:
+            process(cache_dir)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    results = {'process_data/cold': measure(cold, repeat)}
+    cache_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        loops = process(cache_dir)
+        results['process_data/warm'] = measure(
+            lambda: loops.process_data(lfl_path, data_path, output_path, -1, False, False, {},
+                                       jobs=jobs, cache_dir=cache_dir), repeat)
+    finally:
+        shutil.rmtree(cache_dir)
+    return results
+
+
+def validate_lfl(lfl_path, names):
+    '''
+    Check that compass parses every named parameter of an LFL without
+    errors.
+
+    :raises ImportError: If compass is not installed.
+    :raises ValueError: If compass rejects the LFL or any of the parameters.
+    '''
+    from compass.arinc717.data_frame_parser import parse_lfl
+
+    lfl_parser, param_list = parse_lfl(lfl_path, param_names=names, aircraft_info={}, required=False)
+    errors = lfl_parser.format_errors()
+    if errors:
+        raise ValueError('compass rejected %s:\n%s' % (lfl_path, errors))
+    missing = sorted(set(names) - {p.name for p in param_list})
+    if missing:
+        raise ValueError('compass did not parse %s from %s' % (', '.join(missing), lfl_path))
+
+
+def synthetic_flight(work_dir, hours):
+    '''
+    Paths of synthetic raw data and an LFL of its AXIS_PARAMS parameters.
+
+    :rtype: (str, str)
+    '''
+    data_path = os.path.join(work_dir, 'raw_%gh.dat' % hours)
+    if not os.path.isfile(data_path):
+        make_raw_data(data_path, hours * 3600)
+    return make_lfl(os.path.join(work_dir, 'synthetic.lfl'), AXIS_PARAMS), data_path
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    '''
+    Ratio of each result's best time to the baseline's.
+
+    :returns: Ratios by benchmark name and the names slower than threshold.
+    :rtype: (dict, list)
+    '''
+    ratios = {}
+    for name, result in results.items():
+        if name in baseline and baseline[name]['best'] > 0:
+            ratios[name] = result['best'] / baseline[name]['best']
+    regressions = sorted(name for name, ratio in ratios.items() if ratio > threshold)
+    return ratios, regressions
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the stages of the plotting pipeline.')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='Path of the JSON report.')
+    parser.add_argument('--baseline', help='Path of a report to compare with.')
+    parser.add_argument(
+        '--threshold', type=float, default=REGRESSION_THRESHOLD,
+        help='Ratio to the baseline above which a benchmark has regressed.')
+    parser.add_argument(
+        '--work-dir', default=os.path.join(tempfile.gettempdir(), 'FlightDataPlotterBenchmarks'),
+        help='Directory of the synthetic data, which is reused between runs.')
+    parser.add_argument('--hours', type=float, nargs='+', default=HOURS, help='Flight durations.')
+    parser.add_argument('--params', type=int, nargs='+', default=PARAM_COUNTS,
+                        help='Numbers of parameters within the HDF files.')
+    parser.add_argument('--hdf-profiles', nargs='*', choices=sorted(PROFILES), default=sorted(PROFILES),
+                        help='HDF profiles to benchmark. Default is all of them.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of times each stage is run.')
+    parser.add_argument('--lfl', dest='lfl_path',
+                        help='LFL for benchmarking process_data. Default is a synthetic LFL.')
+    parser.add_argument('--raw-data', dest='data_path',
+                        help='Raw data for benchmarking process_data. Default is synthetic raw data.')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Jobs for process_data.')
+    return parser
+
+
+def write_report(path, report):
+    '''
+    Write the report, replacing any earlier one atomically.
+    '''
+    partial_path = path + '.partial'
+    with open(partial_path, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    os.replace(partial_path, path)
+
+
+def process_data_stage(args):
+    '''
+    Benchmark process_data with the LFL and raw data given or, after
+    checking that compass accepts its LFL, a synthetic flight.
+    '''
+    if args.lfl_path and args.data_path:
+        lfl_path, data_path = args.lfl_path, args.data_path
+    else:
+        lfl_path, data_path = synthetic_flight(args.work_dir, min(args.hours))
+        validate_lfl(lfl_path, param_names(AXIS_PARAMS))
+    return bench_process_data(args.work_dir, lfl_path, data_path, args.jobs, args.repeat)
+
+
+def main():
+    args = create_parser().parse_args()
+    if not os.path.isdir(args.work_dir):
+        os.makedirs(args.work_dir)
+
+    results = {}
+    errors = {}
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'results': results,
+        'errors': errors,
+    }
+    stages = [
+        ('decimate', lambda: bench_decimate(args.hours, args.repeat)),
+        ('raw_data', lambda: bench_raw_data(args.work_dir, args.hours, args.repeat)),
+        ('hdf', lambda: bench_hdf(args.work_dir, args.hours, args.params, args.repeat)),
+        ('hdf_profiles', lambda: bench_hdf_profiles(
+            args.work_dir, args.hours, args.params, args.hdf_profiles, args.repeat)),
+        ('process_data', lambda: process_data_stage(args)),
+    ]
+    for name, stage in stages:
+        try:
+            results.update(stage())
+        except ImportError as err:
+            print('Skipping %s: %s' % (name, err))
+        except Exception as err:
+            # Record the failure and carry on with the other stages.
+            traceback.print_exc()
+            print('Stage %s failed: %s' % (name, err))
+            errors[name] = '%s: %s' % (err.__class__.__name__, err)
+        write_report(args.output, report)
+
+    status = 1 if errors else 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        ratios, regressions = compare(results, baseline, args.threshold)
+        report['baseline'] = {'path': args.baseline, 'ratios': ratios, 'regressions': regressions}
+        for name in sorted(ratios):
+            print('%-40s %6.2fx%s' % (name, ratios[name], ' REGRESSED' if name in regressions else ''))
+        if regressions:
+            status = 1
+
+    write_report(args.output, report)
+    print('Report: %s' % args.output)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Synthetic flight data for benchmarking.
+'''
+
+from __future__ import division
+
+import os
+
+import h5py
+import numpy as np
+
+from flightdataplotter import raw_data
+
+
+# Frequencies of synthetic parameters, cycled through.
+FREQUENCIES = (1, 1, 1, 2, 4, 8, 0.5, 0.25)
+
+
+def make_raw_data(path, seconds, wps=256, seed=0):
+    '''
+    Write ARINC 717 raw data of the given duration with sync words at the
+    start of each subframe and slowly varying values in the other words.
+
+    :returns: path
+    :rtype: str
+    '''
+    state = np.random.RandomState(seed)
+    subframes = -(-int(seconds) // raw_data.SUBFRAMES_PER_FRAME) * raw_data.SUBFRAMES_PER_FRAME
+    with open(path, 'wb') as data:
+        # Write a superframe at a time to bound memory use.
+        chunk = raw_data.FRAMES_PER_SUPERFRAME * raw_data.SUBFRAMES_PER_FRAME
+        for start in range(0, subframes, chunk):
+            count = min(chunk, subframes - start)
+            steps = state.randint(-2, 3, size=(count, wps))
+            words = (np.cumsum(steps, axis=0) + 2048) & 0xFFF
+            words[np.isin(words, raw_data.SYNC_WORDS)] = 0
+            words[:, 0] = np.resize(raw_data.SYNC_WORDS, count)
+            data.write(words.astype('<u2').tobytes())
+    return path
+
+
+def param_names(count):
+    '''
+    Names of synthetic parameters. The first is always Altitude STD, which
+    is plotted on the first axis.
+    '''
+    return ['Altitude STD'] + ['Parameter %04d' % index for index in range(1, count)]
+
+
+def make_lfl(path, count, wps=256):
+    '''
+    Write an LFL describing raw data written by make_raw_data with the same
+    words per second: count 12-bit unsigned parameters (see param_names)
+    recorded once per subframe in the words following the sync word. All but
+    Altitude STD, which is always plotted, are within the AXIS_1 group.
+
+    :returns: path
+    :rtype: str
+    '''
+    if not 0 < count < wps:
+        raise ValueError('Between 1 and %d parameters fit within a subframe.' % (wps - 1))
+    names = param_names(count)
+    lines = [
+        '[Frame]',
+        'Name = Synthetic',
+        'Type = ARINC 717',
+        'Words Per Second = %d' % wps,
+        'Sync Words = %s' % ', '.join('0x%03X' % word for word in raw_data.SYNC_WORDS),
+        '',
+        '[Parameter Group]',
+        # A single name needs a trailing comma to be read as a list.
+        'AXIS_1 = %s,' % ', '.join(names[1:] or names),
+        '',
+        '[Parameters]',
+    ]
+    for index, name in enumerate(names):
+        lines.extend([
+            '[[%s]]' % name,
+            'Type = Unsigned',
+            'Rate = 1',
+            # The first word of each subframe is the sync word.
+            'Location = %d' % (index + 2),
+            'MSB = 12',
+            'LSB = 1',
+            'Units = ft',
+        ])
+    with open(path, 'w') as lfl:
+        lfl.write('\n'.join(lines) + '\n')
+    return path
+
+
+def make_hdf(path, hours, count, seed=0):
+    '''
+    Write an HDF file in the hdfaccess layout holding count parameters of
+    the given duration at a mix of frequencies. Existing files are reused.
+
+    :returns: path
+    :rtype: str
+    '''
+    if os.path.isfile(path):
+        return path
+    state = np.random.RandomState(seed)
+    duration = int(hours * 3600)
+    partial_path = path + '.partial'
+    with h5py.File(partial_path, 'w') as hdf:
+        hdf.attrs['duration'] = duration
+        series = hdf.create_group('series')
+        for index, name in enumerate(param_names(count)):
+            frequency = FREQUENCIES[index % len(FREQUENCIES)]
+            size = int(duration * frequency)
+            data = np.cumsum(state.normal(size=size))
+            mask = np.zeros(size, dtype=bool)
+            # A masked gap in every parameter.
+            mask[size // 3:size // 3 + size // 50] = True
+            group = series.create_group(name)
+            group.create_dataset('data', data=data, chunks=True)
+            group.create_dataset('mask', data=mask, chunks=True)
+            group.attrs['frequency'] = frequency
+            group.attrs['supf_offset'] = state.uniform(0, 1 / frequency)
+            group.attrs['units'] = 'ft'
+    os.replace(partial_path, path)
+    return path
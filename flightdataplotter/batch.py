@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Headless rendering of many flights with one LFL.
+
+Each flight is decoded and its axes rendered to image files with the Agg
+backend within a pool of worker processes. A summary of timings, parameter
+errors and all masked parameters is written as JSON alongside the images.
+
+Usage: python -m flightdataplotter.batch LFL "flights/*.dat" -o output
+'''
+
+from __future__ import print_function
+
+import argparse
+import collections
+import glob
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+
+from flightdataplotter.lfl import config_axes
+from flightdataplotter.memory import (
+    AUTO, auto_superframes, samples_per_second, superframe_bytes, superframes_arg, words_per_second)
+from flightdataplotter.raw_data import frame_words_per_second
+from flightdataplotter.plotting import PlotSession
+from flightdataplotter.sources import open_params
+
+
+FORMATS = ('png', 'svg', 'pdf')
+SUMMARY_NAME = 'summary.json'
+
+# Aircraft info keys by argument destination.
+AIRCRAFT_INFO_ARGS = (
+    ('tail_number', 'Tail Number'),
+    ('aircraft_family', 'Aircraft Family'),
+    ('aircraft_series', 'Aircraft Series'),
+    ('aircraft_model', 'Aircraft Model'),
+    ('engine_manufacturer', 'Engine Manufacturer'),
+    ('engine_series', 'Engine Series'),
+    ('engine_type', 'Engine Type'),
+)
+
+
+def expand_paths(patterns):
+    '''
+    Paths of the files matching any of the glob patterns, in order and
+    without duplicates.
+
+    :type patterns: iterable of str
+    :rtype: list of str
+    '''
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(path for path in matches if os.path.isfile(path))
+    return list(dict.fromkeys(paths))
+
+
+def flight_names(data_paths):
+    '''
+    Names of the output files of each flight: the name of its raw data file
+    without extension, followed by a hash of its path when another flight has
+    the same name.
+
+    :type data_paths: list of str
+    :rtype: list of str
+    '''
+    names = [os.path.splitext(os.path.basename(data_path))[0] for data_path in data_paths]
+    counts = collections.Counter(names)
+    return [
+        '%s-%s' % (name, hashlib.sha1(os.path.abspath(data_path).encode('utf-8')).hexdigest()[:8])
+        if counts[name] > 1 else name
+        for name, data_path in zip(names, data_paths)]
+
+
+def render_params(params, axes, image_base, formats=('png',), mask_flag=False, title=''):
+    '''
+    Render the axes of a flight to image files.
+
+    :param image_base: Path of the images without extension.
+    :type image_base: str
+    :returns: Paths of the images and names of all masked parameters.
+    :rtype: (list of str, list of str)
+    '''
+    session = PlotSession(mask_flag, blit=False)
+    try:
+        session.update(params, axes, title=title)
+        if mask_flag:
+            # The plotted sources show masked samples, so check separately.
+            all_masked = sorted(
+                name for name, param in params.items()
+                if hasattr(param, 'source') and param.source(masked=True).all_masked())
+        else:
+            # Reuse the checks made while plotting rather than reading every
+            # parameter again.
+            all_masked = sorted(session.all_masked)
+        session.fig.suptitle(title)
+        image_paths = []
+        for image_format in formats:
+            image_path = '%s.%s' % (image_base, image_format)
+            session.fig.savefig(image_path)
+            image_paths.append(image_path)
+    finally:
+        if session.fig is not None:
+            plt.close(session.fig)
+    return image_paths, all_masked
+
+
+def render_flight(lfl_path, data_path, output_dir, aircraft_info, formats=('png',),
+                  mask_flag=False, superframes_in_memory=-1, keep_hdf=False, name=None):
+    '''
+    Decode a flight and render its axes. Run within a worker process.
+
+    :param name: Name of the output files, see flight_names. Defaults to the
+        name of the raw data file.
+    :type name: str or None
+    :returns: Summary of the flight. Failures are recorded rather than raised.
+    :rtype: dict
+    '''
+    import configobj
+    from compass.arinc717.data_frame_parser import parse_lfl
+    from compass.arinc717.hdf import create_hdf
+
+    name = name or os.path.splitext(os.path.basename(data_path))[0]
+    hdf_path = os.path.join(output_dir, name + '.hdf5')
+    result = {
+        'data_path': data_path,
+        'name': name,
+        'images': [],
+        'decode_time': None,
+        'plot_time': None,
+        'param_errors': '',
+        'missing': [],
+        'all_masked': [],
+        'error': None,
+    }
+    try:
+        start = time.time()
+        axes = config_axes(configobj.ConfigObj(lfl_path))
+        param_names = set(itertools.chain.from_iterable(axes.values()))
+        param_names.discard('Superframe Counter')
+        lfl_parser, param_list = parse_lfl(
+            lfl_path, param_names=param_names, aircraft_info=aircraft_info, required=False)
+        result['param_errors'] = lfl_parser.format_errors()
+        if superframes_in_memory == AUTO:
+            # Every worker of the pool may be decoding at once.
+            wps = words_per_second(frame_words_per_second(lfl_parser.frame), data_path)
+            superframes_in_memory = auto_superframes(
+                superframe_bytes(wps, samples_per_second(param_list)), workers=os.cpu_count())
+        create_hdf(data_path, hdf_path, lfl_parser.frame, param_list,
+                   superframes_in_memory=superframes_in_memory)
+        result['decode_time'] = time.time() - start
+
+        start = time.time()
+        params, result['missing'] = open_params(hdf_path, itertools.chain.from_iterable(axes.values()))
+        result['images'], result['all_masked'] = render_params(
+            params, axes, os.path.join(output_dir, name), formats=formats,
+            mask_flag=mask_flag, title=os.path.basename(data_path))
+        result['plot_time'] = time.time() - start
+    except Exception:
+        result['error'] = traceback.format_exc()
+    finally:
+        if not keep_hdf and os.path.isfile(hdf_path):
+            os.remove(hdf_path)
+    return result
+
+
+def _render_flight(args):
+    return render_flight(*args)
+
+
+def run_batch(lfl_path, data_paths, output_dir, aircraft_info, jobs=None, formats=('png',),
+              mask_flag=False, superframes_in_memory=-1, keep_hdf=False):
+    '''
+    Render each flight within a pool of worker processes and write a summary
+    to summary.json within the output directory.
+
+    :param jobs: Number of worker processes, defaults to the number of CPUs.
+    :type jobs: int or None
+    :returns: The summary.
+    :rtype: dict
+    '''
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    start = time.time()
+    args_list = [(lfl_path, data_path, output_dir, aircraft_info, formats, mask_flag,
+                  superframes_in_memory, keep_hdf, name)
+                 for data_path, name in zip(data_paths, flight_names(data_paths))]
+    results = []
+    pool = multiprocessing.Pool(processes=jobs)
+    try:
+        for result in pool.imap_unordered(_render_flight, args_list):
+            print('%s %s' % ('FAILED' if result['error'] else 'Rendered', result['data_path']))
+            results.append(result)
+    finally:
+        pool.terminate()
+
+    summary = {
+        'lfl_path': lfl_path,
+        'aircraft_info': aircraft_info,
+        'total_time': time.time() - start,
+        'flights': sorted(results, key=lambda result: data_paths.index(result['data_path'])),
+        'failed': sum(1 for result in results if result['error']),
+    }
+    with open(os.path.join(output_dir, SUMMARY_NAME), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description='Render the axes of many flights decoded with one LFL to image files.')
+    parser.add_argument('lfl_path', help='Path of LFL file.')
+    parser.add_argument(
+        'data_paths', nargs='+', metavar='RAW_DATA',
+        help='Paths or glob patterns of raw data files (quote patterns).')
+    parser.add_argument(
+        '-o', '--output-dir', dest='output_dir', default='.',
+        help='Directory to write images and the summary to.')
+    parser.add_argument(
+        '-j', '--jobs', dest='jobs', type=int, default=None,
+        help='Number of flights rendered at once. Default is the number of CPUs.')
+    parser.add_argument(
+        '-f', '--format', dest='formats', nargs='+', choices=FORMATS, default=['png'],
+        help='Image formats to write. Default is png.')
+    parser.add_argument(
+        '--keep-hdf', dest='keep_hdf', action='store_true',
+        help='Keep the decoded HDF file of each flight.')
+    parser.add_argument(
+        '--superframes-in-memory', dest='superframes_in_memory', type=superframes_arg, default=-1,
+        help="Number of superframes stored in memory before writing to HDF5 file, or 'auto' "
+             "to choose it once per flight from the memory available.")
+    parser.add_argument(
+        '-m', '--show-masked', dest='mask_flag', action='store_true',
+        help='Show masked data.')
+    parser.add_argument(
+        '-d', '--frame-doubled', dest='frame_doubled', action='store_true',
+        help='The input raw data is frame doubled.')
+    parser.add_argument(
+        '-s', '--stretched', dest='stretched',
+        help='Name of frame Stretched definition to apply.')
+    for dest, key in AIRCRAFT_INFO_ARGS:
+        parser.add_argument('--' + dest.replace('_number', '').replace('_', '-'), dest=dest, help=key + '.')
+    return parser
+
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+    if not os.path.isfile(args.lfl_path):
+        parser.error('LFL file path not valid: %s' % args.lfl_path)
+    data_paths = expand_paths(args.data_paths)
+    if not data_paths:
+        parser.error('No raw data files found.')
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('Jobs argument must be positive. Found %s' % args.jobs)
+
+    aircraft_info = {
+        'Frame Doubled': args.frame_doubled,
+        'Stretched': args.stretched,
+    }
+    for dest, key in AIRCRAFT_INFO_ARGS:
+        if getattr(args, dest):
+            aircraft_info[key] = getattr(args, dest)
+
+    print('Rendering %d flights.' % len(data_paths))
+    summary = run_batch(
+        args.lfl_path, data_paths, args.output_dir, aircraft_info, jobs=args.jobs,
+        formats=args.formats, mask_flag=args.mask_flag,
+        superframes_in_memory=args.superframes_in_memory, keep_hdf=args.keep_hdf)
+    print('Rendered %d flights in %.1f seconds, %d failed. Summary: %s' % (
+        len(data_paths), summary['total_time'], summary['failed'],
+        os.path.join(args.output_dir, SUMMARY_NAME)))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
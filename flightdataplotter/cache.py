@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+On-disk caching of decoded parameters so that saving an LFL only decodes the
+parameters whose definitions have changed.
+
+The cache persists between sessions. Parameters are stored by the hash of the
+raw data's content so that reopening a flight finds them even if the file has
+been copied or moved, and the least recently used are evicted once the cache
+exceeds its size limit.
+
+Compressed raw data files are decompressed into the cache once so that later
+runs read them uncompressed.
+'''
+
+from __future__ import print_function
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import h5py
+
+from flightdataplotter.hdf_profile import DEFAULT_PROFILE, PROFILES
+
+
+def _default_cache_dir():
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or tempfile.gettempdir()
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'FlightDataPlotter')
+
+
+CACHE_DIR = _default_cache_dir()
+CACHE_SIZE = 2 * 1024 ** 3  # bytes
+RAW_CACHE_SIZE = 8 * 1024 ** 3  # bytes
+COPY_BUFFER_SIZE = 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _normalize(value):
+    '''
+    Convert configobj sections into plain builtins so that equivalent
+    definitions serialise identically.
+    '''
+    if hasattr(value, 'dict'):
+        value = value.dict()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def hash_values(*values):
+    '''
+    Stable hash of JSON-serialisable (or configobj) values.
+
+    :rtype: str
+    '''
+    text = json.dumps([_normalize(v) for v in values], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def file_identity(path):
+    '''
+    Cheap identity of a file based on its location, size and modification
+    time.
+
+    :rtype: str
+    '''
+    stat = os.stat(path)
+    return hash_values(os.path.abspath(path), stat.st_size, stat.st_mtime)
+
+
+def content_hash(path, cache_dir=None):
+    '''
+    Hash of a file's content. Hashes are remembered by file identity within
+    the cache directory so that large files are only read once.
+
+    :rtype: str
+    '''
+    cache_dir = cache_dir or CACHE_DIR
+    hashes_dir = os.path.join(cache_dir, 'hashes')
+    identity_path = os.path.join(hashes_dir, file_identity(path))
+    if os.path.isfile(identity_path):
+        with open(identity_path) as identity_file:
+            return identity_file.read().strip()
+
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as data:
+        for block in iter(lambda: data.read(HASH_BLOCK_SIZE), b''):
+            sha1.update(block)
+    digest = sha1.hexdigest()
+    if not os.path.isdir(hashes_dir):
+        os.makedirs(hashes_dir)
+    with open(identity_path, 'w') as identity_file:
+        identity_file.write(digest)
+    return digest
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def evict(cache_dir=None, max_size=CACHE_SIZE, keep=()):
+    '''
+    Remove the least recently used stored parameters until the cache is no
+    larger than max_size.
+
+    :param keep: Store directories, or entries, which are in use and must
+        not be evicted.
+    :type keep: iterable of str
+    :returns: Number of bytes removed.
+    :rtype: int
+    '''
+    cache_dir = cache_dir or CACHE_DIR
+    params_dir = os.path.join(cache_dir, 'params')
+    if not os.path.isdir(params_dir):
+        return 0
+    keep = {os.path.abspath(path) for path in keep}
+    paths = []
+    kept = []
+    for store_name in os.listdir(params_dir):
+        store_dir = os.path.join(params_dir, store_name)
+        if not os.path.isdir(store_dir):
+            continue
+        for file_name in os.listdir(store_dir):
+            path = os.path.join(store_dir, file_name)
+            paths.append(path)
+            if os.path.abspath(store_dir) in keep or os.path.abspath(path) in keep:
+                kept.append(path)
+
+    removed = _evict_files(paths, max_size, keep=kept)
+    for store_name in os.listdir(params_dir):
+        store_dir = os.path.join(params_dir, store_name)
+        if os.path.isdir(store_dir) and not os.listdir(store_dir):
+            os.rmdir(store_dir)
+    return removed
+
+
+def _evict_files(paths, max_size, keep=()):
+    '''
+    Remove the least recently modified files until their total size is no
+    larger than max_size.
+
+    :returns: Number of bytes removed.
+    :rtype: int
+    '''
+    keep = set(keep)
+    entries = []
+    total = 0
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        total += stat.st_size
+        if path not in keep:
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    removed = 0
+    for _mtime, size, path in sorted(entries):
+        if total - removed <= max_size:
+            break
+        _remove(path)
+        removed += size
+    return removed
+
+
+def decompress(src_path, open_func, cache_dir=None, max_size=RAW_CACHE_SIZE):
+    '''
+    Path of an uncompressed copy of a compressed raw data file within the
+    cache, decompressing it on first use. Copies are identified by the
+    source's location, size and modification time and the least recently
+    used are removed once their total size exceeds max_size.
+
+    :param open_func: Function which opens the source as a decompressed file object.
+    :type open_func: callable
+    :rtype: str
+    '''
+    raw_dir = os.path.join(cache_dir or CACHE_DIR, 'raw')
+    if not os.path.isdir(raw_dir):
+        os.makedirs(raw_dir)
+    dest_path = os.path.join(raw_dir, file_identity(src_path) + '.dat')
+    if os.path.isfile(dest_path):
+        os.utime(dest_path, None)
+    else:
+        print('Decompressing raw data into cache: %s' % dest_path)
+        partial_path = dest_path + '.partial'
+        src = open_func(src_path)
+        try:
+            with open(partial_path, 'wb') as dest:
+                shutil.copyfileobj(src, dest, COPY_BUFFER_SIZE)
+        finally:
+            src.close()
+        os.replace(partial_path, dest_path)
+
+    paths = [os.path.join(raw_dir, name) for name in os.listdir(raw_dir)
+             if not name.endswith('.partial')]
+    _evict_files(paths, max_size, keep=[dest_path])
+    return dest_path
+
+
+def concatenated_attrs(sources):
+    '''
+    File attributes of the concatenation of several HDF files, such as the
+    chunks of a progressive decode. Attributes are taken from the first
+    source except the duration, which is the total of the sources'.
+
+    :param sources: Paths of the HDF files, in order.
+    :type sources: list of str
+    :rtype: dict
+    '''
+    attrs = {}
+    duration = 0
+    for path in sources:
+        with h5py.File(path, 'r') as src:
+            if not attrs:
+                attrs.update(src.attrs)
+            duration += src.attrs.get('duration', 0)
+    if 'duration' in attrs:
+        attrs['duration'] = duration
+    return attrs
+
+
+def write_concatenated(group, name, sources):
+    '''
+    Write a parameter whose samples are the concatenation of the same
+    parameter within several HDF files as virtual datasets which refer to
+    the sources rather than copying their samples. The sources must remain
+    unchanged while the result is read. Attributes are taken from the first
+    source.
+
+    :param group: Group to write the parameter's group into.
+    :type group: h5py.Group
+    :param sources: Paths of the HDF files holding the parameter, in order.
+    :type sources: list of str
+    '''
+    dest = group.create_group(name)
+    files = [h5py.File(path, 'r') for path in sources]
+    try:
+        groups = [hdf['series'][name] for hdf in files]
+        dest.attrs.update(groups[0].attrs)
+        for dataset_name in ('data', 'mask'):
+            if not all(dataset_name in src for src in groups):
+                continue
+            datasets = [src[dataset_name] for src in groups]
+            layout = h5py.VirtualLayout(
+                shape=(sum(dataset.shape[0] for dataset in datasets),), dtype=datasets[0].dtype)
+            start = 0
+            for path, dataset in zip(sources, datasets):
+                length = dataset.shape[0]
+                layout[start:start + length] = h5py.VirtualSource(
+                    os.path.abspath(path), dataset.name, shape=(length,))
+                start += length
+            dest.create_virtual_dataset(dataset_name, layout)
+    finally:
+        for hdf in files:
+            hdf.close()
+
+
+class DecodedParameterStore(object):
+    '''
+    Persistent store of decoded parameters for a single raw data file.
+
+    Each entry is a small HDF5 file holding one decoded parameter, named after
+    the hash of the parameter's LFL definition, the frame definition and the
+    aircraft info it was decoded with. The modification time of an entry is
+    updated whenever it is used so that eviction removes the least recently
+    used.
+
+    Entries may also be kept within a second store on a memory-backed
+    filesystem so that decoding and plotting avoid disk I/O. Both stores
+    are searched for an entry.
+
+    Entries are written with an HDF profile (see hdf_profile). Entries of
+    profiles other than the converter's layout are named after the profile
+    too so that changing profile never reads entries of another layout.
+    '''
+    def __init__(self, data_path, store_dir=None, cache_dir=None, profile=None, memory_cache_dir=None):
+        '''
+        :param data_path: Path of the raw data file the parameters are decoded from.
+        :type data_path: str
+        :param store_dir: Directory of the store (default is named after the
+            raw data's content within the cache directory).
+        :type store_dir: str
+        :param cache_dir: Cache directory (default is CACHE_DIR).
+        :type cache_dir: str
+        :param profile: Layout of the entries written (default is the
+            converter's layout).
+        :type profile: HDFProfile or None
+        :param memory_cache_dir: Cache directory on a memory-backed
+            filesystem for entries added with memory=True, or None.
+        :type memory_cache_dir: str or None
+        '''
+        self.data_path = data_path
+        self.profile = profile or PROFILES[DEFAULT_PROFILE]
+        if not store_dir:
+            store_dir = os.path.join(cache_dir or CACHE_DIR, 'params', content_hash(data_path, cache_dir))
+        self.store_dir = store_dir
+        self.memory_store_dir = None
+        if memory_cache_dir:
+            self.memory_store_dir = os.path.join(memory_cache_dir, 'params', os.path.basename(store_dir))
+        for path in (self.store_dir, self.memory_store_dir):
+            if path and not os.path.isdir(path):
+                os.makedirs(path)
+
+    def _path(self, key, memory=False):
+        if self.profile.native:
+            name = key + '.hdf5'
+        else:
+            name = '%s.%s.hdf5' % (key, self.profile.name)
+        return os.path.join(self.memory_store_dir if memory else self.store_dir, name)
+
+    def find(self, key):
+        '''
+        Path of a stored parameter, preferring the memory store.
+
+        :rtype: str or None
+        '''
+        for memory in ((True, False) if self.memory_store_dir else (False,)):
+            path = self._path(key, memory=memory)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def key(self, param_conf, frame_conf, aircraft_info):
+        '''
+        :param param_conf: LFL definition of the parameter.
+        :type param_conf: configobj.Section or dict or None
+        :param frame_conf: LFL sections which define the frame.
+        :type frame_conf: dict
+        :param aircraft_info: Aircraft info passed to the LFL parser.
+        :type aircraft_info: dict
+        :returns: Key of the decoded parameter within the store.
+        :rtype: str
+        '''
+        return hash_values(param_conf, frame_conf, aircraft_info)
+
+    def add(self, key, hdf_path, name, memory=False):
+        '''
+        Copy a decoded parameter from an HDF file into the store.
+
+        :param memory: Whether to add it to the memory store rather than the
+            store on disk. Ignored without a memory store.
+        :type memory: bool
+        :returns: Whether the parameter was found within the HDF file.
+        :rtype: bool
+        '''
+        with h5py.File(hdf_path, 'r') as src:
+            if 'series' not in src or name not in src['series']:
+                return False
+            # Write to a partial file so that an interrupted copy never
+            # appears as a valid entry.
+            path = self._path(key, memory=memory and bool(self.memory_store_dir))
+            partial_path = path + '.partial'
+            with self.profile.open(partial_path) as dest:
+                dest.attrs.update(src.attrs)
+                self.profile.copy_params(dest, [(name, src['series'][name])])
+        os.replace(partial_path, path)
+        return True
+
+    def add_concatenated(self, key, sources, name, memory=False):
+        '''
+        Copy the concatenation of a decoded parameter within several HDF
+        files, such as the chunks of a progressive decode, into the store.
+        File attributes describe the concatenation (see concatenated_attrs).
+
+        :param sources: Paths of the HDF files holding the parameter, in order.
+        :type sources: list of str
+        :param memory: Whether to add it to the memory store rather than the
+            store on disk. Ignored without a memory store.
+        :type memory: bool
+        '''
+        # The samples are joined into a file with the layout of the first
+        # source, one source at a time, which is removed once the entry is
+        # written.
+        concat_path = self._path(key, memory=memory and bool(self.memory_store_dir)) + '.concat'
+        try:
+            with h5py.File(concat_path, 'w') as concat, contextlib.ExitStack() as sources_stack:
+                concat.attrs.update(concatenated_attrs(sources))
+                groups = [sources_stack.enter_context(h5py.File(path, 'r'))['series'][name]
+                          for path in sources]
+                dest = concat.create_group('series').create_group(name)
+                dest.attrs.update(groups[0].attrs)
+                for dataset_name in ('data', 'mask'):
+                    if not all(dataset_name in group for group in groups):
+                        continue
+                    datasets = [group[dataset_name] for group in groups]
+                    first = datasets[0]
+                    dataset = dest.create_dataset(
+                        dataset_name, shape=(sum(src.shape[0] for src in datasets),), dtype=first.dtype,
+                        chunks=first.chunks, maxshape=(None,) if first.chunks else None,
+                        compression=first.compression, compression_opts=first.compression_opts,
+                        shuffle=first.shuffle)
+                    dataset.attrs.update(first.attrs)
+                    start = 0
+                    for src in datasets:
+                        dataset[start:start + src.shape[0]] = src[:]
+                        start += src.shape[0]
+            self.add(key, concat_path, name, memory=memory)
+        finally:
+            if os.path.isfile(concat_path):
+                os.remove(concat_path)
+
+    def build(self, output_path, keys, link=True, chunks=None):
+        '''
+        Assemble an HDF file from stored parameters.
+
+        :param output_path: Path of the HDF file to create.
+        :type output_path: str
+        :param keys: Store keys by parameter name.
+        :type keys: dict
+        :param link: Whether to refer to the stored parameters with external
+            links rather than copying them, which makes building the file
+            almost instant. The file is then only valid while the store is.
+            Copies are written with the store's profile.
+        :type link: bool
+        :param chunks: Parameters which are not stored but concatenated
+            virtually from the given HDF files (see write_concatenated).
+            If no stored parameters are written, the file attributes
+            describe the concatenation (see concatenated_attrs).
+        :type chunks: dict of list or None
+        :returns: Names of the parameters written.
+        :rtype: list
+        '''
+        written = []
+        # Replace the output atomically as it may be being read for plotting.
+        partial_path = output_path + '.partial'
+        with self.profile.open(partial_path) as dest, contextlib.ExitStack() as sources_stack:
+            series = dest.require_group('series')
+            copies = []
+            for name, key in sorted(keys.items()):
+                path = self.find(key)
+                if path is None:
+                    continue
+                os.utime(path, None)
+                if not written:
+                    with h5py.File(path, 'r') as src:
+                        dest.attrs.update(src.attrs)
+                if link:
+                    series[name] = h5py.ExternalLink(os.path.abspath(path), '/series/' + name)
+                else:
+                    src = sources_stack.enter_context(h5py.File(path, 'r'))
+                    copies.append((name, src['series'][name]))
+                written.append(name)
+            for name, sources in sorted((chunks or {}).items()):
+                if not written:
+                    dest.attrs.update(concatenated_attrs(sources))
+                write_concatenated(series, name, sources)
+                written.append(name)
+            self.profile.copy_params(dest, copies)
+        os.replace(partial_path, output_path)
+        return written
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Reading parameters from CSV files directly into masked arrays for plotting.
+
+Only the columns of the parameters being plotted are converted, a chunk of
+rows at a time, by NumPy's C parser (numpy.loadtxt) so that the samples
+never pass through an HDF file.
+
+The file must have a header row naming the columns and one row per sample at
+a fixed rate. Formats needing conversion, such as those of particular
+recorders, are converted by compass instead.
+'''
+
+from __future__ import print_function
+
+import io
+import itertools
+
+import numpy as np
+
+
+CHUNK_SIZE = 16 * 1024 ** 2  # characters
+HEADER_SEARCH_LINES = 100
+# Rows whose timestamps are used to work out the sample rate.
+RATE_ROWS = 1000
+
+
+class CSVParameter(object):
+    '''
+    Parameter read from a CSV file, providing the attributes used for
+    plotting.
+    '''
+    def __init__(self, name, array, frequency=1.0, units=None):
+        '''
+        :param array: Samples with invalid values masked.
+        :type array: np.ma.MaskedArray
+        :param frequency: Sample rate of the file.
+        :type frequency: float
+        '''
+        self.name = name
+        self.array = array
+        self.frequency = self.hz = frequency
+        self.offset = 0
+        self.units = units
+        self.data_type = None
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.name)
+
+
+def _split(line, delimiter):
+    return [field.strip().strip('"') for field in line.split(delimiter)]
+
+
+def find_header(lines, param_names, delimiter=','):
+    '''
+    Locate the header row, the first row which names any of the parameters.
+    Rows before it hold file information and are skipped.
+
+    :param lines: The first lines of the file.
+    :type lines: list of str
+    :returns: Index of the header row within lines and its column names.
+    :rtype: (int, list of str)
+    :raises ValueError: If no header row is found.
+    '''
+    param_names = set(param_names)
+    for index, line in enumerate(lines):
+        columns = _split(line, delimiter)
+        if param_names.intersection(columns):
+            return index, columns
+    raise ValueError('None of the parameters %s were found in the CSV header.'
+                     % ', '.join(sorted(param_names)))
+
+
+def parse_seconds(value):
+    '''
+    Seconds from a timestamp, either a number of seconds or a time of day
+    such as 10:00:01.5.
+
+    :type value: str
+    :rtype: float
+    :raises ValueError: If the timestamp is not understood.
+    '''
+    value = value.strip().strip('"')
+    seconds = 0.0
+    for part in value.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def sample_rate(timestamps):
+    '''
+    Sample rate from the median interval between timestamps. Timestamps
+    which are not understood are ignored.
+
+    :type timestamps: iterable of str
+    :rtype: float
+    :raises ValueError: If no interval could be found.
+    '''
+    seconds = []
+    for value in timestamps:
+        try:
+            seconds.append(parse_seconds(value))
+        except ValueError:
+            continue
+    intervals = np.diff(seconds)
+    intervals = intervals[intervals > 0]
+    if not len(intervals):
+        raise ValueError('Could not work out the sample rate from the timestamps.')
+    return 1.0 / float(np.median(intervals))
+
+
+def _to_float(value):
+    try:
+        return float(value.strip().strip('"'))
+    except ValueError:
+        return np.nan
+
+
+def _parse_rows(text, delimiter, usecols, field_count):
+    '''
+    Convert the columns usecols of complete rows of a CSV file to an array.
+    Blank rows and rows beginning with '#' are skipped. Rows with the wrong
+    number of fields are converted as empty rows, which are masked, so that
+    later rows keep their time.
+
+    Rows are found with array operations on the text's bytes and converted
+    by the C parser of numpy.loadtxt, so the text is only split into lines
+    where rows must be skipped or replaced. Only text holding empty or
+    non-numeric values, which the parser rejects, is converted a value at a
+    time.
+
+    :param text: Rows, each ending with a newline.
+    :type text: str
+    :rtype: np.ndarray
+    '''
+    # Multi-byte characters never contain the ASCII delimiter or newline.
+    raw = text.encode('utf-8')
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    positions = np.flatnonzero(buf == ord(delimiter))
+    counts = np.searchsorted(positions, ends) - np.searchsorted(positions, starts)
+    comment = buf[np.minimum(starts, len(buf) - 1)] == ord('#')
+    comment[starts == ends] = False
+    # Only rows without delimiters can be blank.
+    blank = np.zeros(len(ends), dtype=bool)
+    for index in np.flatnonzero((counts == 0) & ~comment):
+        blank[index] = not raw[starts[index]:ends[index]].strip()
+    skipped = blank | comment
+    if skipped.all():
+        return np.empty((0, len(usecols)))
+    misaligned = ~skipped & (counts != field_count - 1)
+    if skipped.any() or misaligned.any():
+        lines = np.array(text.split('\n')[:len(ends)], dtype=object)
+        lines[misaligned] = delimiter * (field_count - 1)
+        text = '\n'.join(lines[~skipped]) + '\n'
+    options = dict(delimiter=delimiter, usecols=usecols, dtype=np.float64, ndmin=2, comments=None)
+    try:
+        return np.loadtxt(io.StringIO(text), quotechar='"', **options)
+    except ValueError:
+        return np.loadtxt(io.StringIO(text), converters=_to_float, **options)
+
+
+def read_csv(csv_path, param_names, frequency=None, delimiter=',', chunk_size=CHUNK_SIZE, time_column=None):
+    '''
+    Read the named parameters from a CSV file.
+
+    Rows are converted in chunks with numpy.loadtxt, reading only the columns
+    of the named parameters. Empty and non-numeric values are masked, as are
+    rows with the wrong number of fields. Blank rows and rows beginning with
+    '#', which some formats use for units, are skipped.
+
+    :param param_names: Names of the columns to read.
+    :type param_names: iterable of str
+    :param chunk_size: Characters of whole rows converted at a time.
+    :type chunk_size: int
+    :param frequency: Sample rate of the rows. If None, it is worked out
+        from the time column, or is 1 Hz without one.
+    :type frequency: float or None
+    :param time_column: Name of a column of timestamps (see parse_seconds).
+    :type time_column: str or None
+    :returns: Parameters by name and the names which were not found.
+    :rtype: (dict, list)
+    :raises ValueError: If the header or the time column is not found.
+    '''
+    param_names = list(dict.fromkeys(param_names))
+    with io.open(csv_path, 'r', newline='', errors='replace') as csv_file:
+        head = list(itertools.islice(csv_file, HEADER_SEARCH_LINES))
+        header_index, columns = find_header(head, param_names, delimiter=delimiter)
+        first_rows = head[header_index + 1:]
+        if frequency is None and time_column:
+            if time_column not in columns:
+                raise ValueError('Time column %s was not found in the CSV header.' % time_column)
+            time_index = columns.index(time_column)
+            first_rows += list(itertools.islice(csv_file, max(RATE_ROWS - len(first_rows), 0)))
+            frequency = sample_rate(
+                _split(line, delimiter)[time_index] for line in first_rows
+                if line.strip() and not line.startswith('#') and line.count(delimiter) == len(columns) - 1)
+        indices = {}
+        missing = []
+        for name in param_names:
+            if name in columns:
+                indices[name] = columns.index(name)
+            else:
+                missing.append(name)
+        usecols = sorted(set(indices.values()))
+
+        chunks = []
+        text = ''.join(first_rows)
+        while usecols:
+            text += csv_file.read(chunk_size)
+            if not text:
+                break
+            if not text.endswith('\n'):
+                # Complete the last row.
+                text += csv_file.readline()
+                if not text.endswith('\n'):
+                    text += '\n'
+            chunks.append(_parse_rows(text, delimiter, usecols, len(columns)))
+            text = ''
+
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(usecols)))
+    params = {}
+    for name, index in indices.items():
+        values = data[:, usecols.index(index)]
+        params[name] = CSVParameter(
+            name, np.ma.masked_invalid(values), frequency=frequency or 1.0)
+    return params, missing
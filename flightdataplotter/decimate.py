@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Decimation of long parameter arrays for plotting.
+
+Drawing millions of points per line makes rendering and navigation slow
+although only a few thousand can be distinguished on screen. Lines are
+reduced to the minimum and maximum of each pixel-wide bin so that spikes
+remain visible, and are decimated again from the full data when the visible
+x-range changes.
+'''
+
+from __future__ import division
+
+import numpy as np
+
+
+def minmax_decimate(x, y, n_bins):
+    '''
+    Reduce a line to the minimum and maximum values within each of n_bins
+    bins of consecutive samples, in the order they occur.
+
+    Masked (and NaN) samples are ignored and bins without any valid samples
+    are returned as NaN so that gaps in the data remain visible.
+
+    :param x: x-coordinates of the samples.
+    :type x: np.ndarray
+    :param y: Sample values.
+    :type y: np.ndarray or np.ma.MaskedArray
+    :param n_bins: Number of bins, usually the width of the axis in pixels.
+    :type n_bins: int
+    :returns: x and y of at most 2 * n_bins points with masked samples as NaN.
+    :rtype: (np.ndarray, np.ndarray)
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.ma.filled(np.ma.asarray(y).astype(np.float64), np.nan)
+    length = len(y)
+    if n_bins < 1 or length <= 2 * n_bins:
+        return x, y
+
+    size = -(-length // n_bins)
+    n_bins = -(-length // size)
+    bins = np.full(n_bins * size, np.nan)
+    bins[:length] = y
+    bins = bins.reshape(n_bins, size)
+    valid = ~np.isnan(bins)
+
+    # Fully invalid bins select their first sample, which is NaN.
+    mins = np.where(valid, bins, np.inf).argmin(axis=1)
+    maxs = np.where(valid, bins, -np.inf).argmax(axis=1)
+
+    indices = np.empty((n_bins, 2), dtype=np.intp)
+    indices[:, 0] = np.minimum(mins, maxs)
+    indices[:, 1] = np.maximum(mins, maxs)
+    indices += (np.arange(n_bins) * size)[:, np.newaxis]
+    indices = indices.ravel()
+    return x[indices], y[indices]
+
+
+class DecimatedLine(object):
+    '''
+    A line which is drawn from decimated data and decimated again from its
+    source whenever the x-limits of its axis change.
+    '''
+    def __init__(self, axis, source, **kwargs):
+        '''
+        :param axis: Axis to plot on.
+        :type axis: matplotlib.axes.Axes
+        :param source: Source of the line's data, providing read(xlim, n_bins),
+            or None for an empty line.
+        :type source: flightdataplotter.sources.ArraySource or flightdataplotter.sources.HDFSource
+        :param kwargs: Keyword arguments for axis.plot.
+        '''
+        self.axis = axis
+        self.source = source
+        self.line, = axis.plot(*self._read(None), **kwargs)
+        # A plain function is referenced strongly by the callback registry
+        # which keeps this object alive as long as the axis.
+        self._cid = axis.callbacks.connect('xlim_changed', lambda ax: self.update(ax.get_xlim()))
+
+    def _read(self, xlim):
+        if self.source is None:
+            return [], []
+        return self.source.read(xlim, max(int(self.axis.bbox.width), 1))
+
+    def update(self, xlim=None):
+        '''
+        Decimate the line for the x-range being displayed.
+        '''
+        self.line.set_data(*self._read(xlim))
+
+    def set_source(self, source, xlim=None):
+        '''
+        Replace the line's data.
+        '''
+        self.source = source
+        self.update(xlim)
+
+    def remove(self):
+        '''
+        Remove the line from its axis.
+        '''
+        self.axis.callbacks.disconnect(self._cid)
+        self.line.remove()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Decoding raw data into HDF files in worker processes so that decoding can be
+abandoned as soon as its result is no longer wanted.
+'''
+
+from __future__ import print_function
+
+import multiprocessing
+import os
+
+
+CANCEL_CHECK_INTERVAL = 0.05  # seconds
+
+# The last LFL parsed within a worker process. Workers of a pool which
+# decodes several chunks of the same raw data parse the LFL once.
+_parsed = {}
+
+
+class DecodeCancelled(Exception):
+    pass
+
+
+def decode_params(lfl_path, data_path, output_path, param_names, aircraft_info,
+                  superframes_in_memory=-1):
+    '''
+    Parse the LFL and decode the named parameters into an HDF file. Run within
+    a worker process. The parsed LFL is reused by later calls within the
+    same process while the LFL file, parameters and aircraft info are
+    unchanged.
+
+    :returns: Names of the parameters decoded.
+    :rtype: list
+    '''
+    from compass.arinc717.data_frame_parser import parse_lfl
+    from compass.arinc717.hdf import create_hdf
+
+    stat = os.stat(lfl_path)
+    parse_key = (os.path.abspath(lfl_path), stat.st_mtime_ns, stat.st_size,
+                 tuple(sorted(param_names)), tuple(sorted(aircraft_info.items())))
+    if parse_key not in _parsed:
+        _parsed.clear()
+        _parsed[parse_key] = parse_lfl(
+            lfl_path, param_names=param_names, aircraft_info=aircraft_info, required=False)
+    lfl_parser, param_list = _parsed[parse_key]
+    if param_list:
+        create_hdf(data_path, output_path, lfl_parser.frame, param_list,
+                   superframes_in_memory=superframes_in_memory)
+    return [p.name for p in param_list]
+
+
+def partition(items, parts):
+    '''
+    Split items into at most parts lists of similar length.
+
+    :rtype: list of list
+    '''
+    items = sorted(items)
+    return [items[i::parts] for i in range(min(parts, len(items)))]
+
+
+def map_cancellable(func, args_list, wait_cancel=None, processes=None, pool=None):
+    '''
+    Call func(*args) for each args within a pool of worker processes.
+
+    :param args_list: Arguments of each call.
+    :type args_list: list of tuple
+    :param wait_cancel: Called with a timeout in seconds while waiting for the
+        results and returns True if the calls should be cancelled.
+    :type wait_cancel: callable or None
+    :param processes: Number of worker processes, defaults to one per call.
+    :type processes: int or None
+    :param pool: Pool to call func within, which is kept open for later calls
+        if all calls succeed. A pool is created for these calls if None.
+    :type pool: multiprocessing.pool.Pool or None
+    :returns: Results of each call, in order.
+    :rtype: list
+    :raises DecodeCancelled: If the calls were cancelled. The workers are
+        terminated immediately.
+    '''
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(processes=processes or max(len(args_list), 1))
+    completed = False
+    try:
+        results = [pool.apply_async(func, args) for args in args_list]
+        for result in results:
+            while not result.ready():
+                if wait_cancel and wait_cancel(CANCEL_CHECK_INTERVAL):
+                    raise DecodeCancelled()
+                result.wait(0 if wait_cancel else None)
+            # Raise the first failure without waiting for the other calls.
+            if not result.successful():
+                result.get()
+        results = [result.get() for result in results]
+        completed = True
+        return results
+    finally:
+        if own_pool or not completed:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+wx dialogs of the interactive plotter.
+
+Importing this module selects the WXAgg matplotlib backend. It is only
+imported when a dialog or the interactive plot is required, so that other
+uses of the package do not need wx or a display.
+'''
+
+from __future__ import print_function
+
+import sys
+
+import matplotlib
+import wx
+
+matplotlib.use('WXAgg')
+
+
+_app = None
+
+
+def get_app():
+    '''
+    The wx application, created on first use.
+
+    :rtype: wx.App
+    '''
+    global _app
+    if _app is None:
+        _app = wx.App.Get() or wx.App()
+    return _app
+
+
+class Frame(wx.Frame):
+    '''
+    There a built-in message dialogs which display a message, but they were
+    freezing due to the application's threading model.
+    '''
+    def __init__(self, title, message):
+        wx.Frame.__init__(self, None, title=title)
+        #self.Bind(wx.EVT_CLOSE, self.OnClose)
+        panel = wx.Panel(self)
+        box = wx.BoxSizer(wx.VERTICAL)
+
+        m_text = wx.StaticText(panel, -1, message, size=(340, 100),
+                               style=wx.TE_MULTILINE)
+        m_text.SetSize(m_text.GetBestSize())
+        button = wx.Button(panel, label='OK')
+        button.SetDefault()
+        button.Bind(wx.EVT_BUTTON, self.OnClose)
+        box.Add(m_text, flag=wx.ALL)
+        box.Add(button, flag=wx.EXPAND)
+
+        panel.SetSizerAndFit(box)
+        self.Layout()
+        self.Fit()
+
+    def OnClose(self, event):
+        self.Destroy()
+
+
+def show_error_dialog(title, message, main_loop=True):
+    '''
+    Show error.
+
+    :param main_loop: Whether to run the GUI event loop, which is not needed
+        if it is already running.
+    :type main_loop: bool
+    '''
+    frame = Frame(title, message)
+    frame.Show()
+    if main_loop:
+        get_app().MainLoop()
+
+
+def lfl_file_dialog():
+    get_app()
+    #TOOD: Remember last directory accessed!
+    lfl_dialog = wx.FileDialog(None, message="Please choose an LFL file",
+                               defaultDir='',
+                               wildcard="*.lfl")
+    if lfl_dialog.ShowModal() == wx.ID_OK:
+        lfl_path = lfl_dialog.GetPath()
+    else:
+        show_error_dialog('Error!', 'An LFL file must be selected.')
+        sys.exit(1)
+    return lfl_path
+
+
+def data_file_dialog():
+    get_app()
+    data_dialog = wx.FileDialog(None, message="Please choose a raw data file",
+                                defaultDir='',
+                                wildcard="*.*")
+    if data_dialog.ShowModal() == wx.ID_OK:
+        data_path = data_dialog.GetPath()
+    else:
+        show_error_dialog('Error!', 'A raw data file must be selected.')
+        sys.exit(1)
+    return data_path
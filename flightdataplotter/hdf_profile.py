@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Dataset layouts of the decoded parameters read for plotting.
+
+Plotting reads whole parameters for the overview and windows of time when
+zooming, so chunks are aligned to whole superframes of each parameter's
+samples. Compression trades CPU time for less I/O; LZF is fast enough that
+decompressing is usually cheaper than reading the uncompressed samples.
+'''
+
+from __future__ import division
+
+import h5py
+
+from flightdataplotter import raw_data
+
+
+SUPERFRAME_DURATION = raw_data.FRAMES_PER_SUPERFRAME * raw_data.FRAME_DURATION  # seconds
+
+
+class HDFProfile(object):
+    '''
+    Chunking and compression options of the datasets written.
+    '''
+    def __init__(self, name, chunk_superframes=None, compression=None, compression_opts=None,
+                 shuffle=False):
+        '''
+        :param chunk_superframes: Superframes of samples within each chunk,
+            or None to keep the layout written by the converter.
+        :type chunk_superframes: int or None
+        :param compression: 'lzf', 'gzip' or None.
+        :type compression: str or None
+        :param shuffle: Whether to apply the byte shuffle filter before
+            compression.
+        :type shuffle: bool
+        '''
+        self.name = name
+        self.chunk_superframes = chunk_superframes
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.shuffle = shuffle
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.name)
+
+    @property
+    def native(self):
+        '''
+        Whether datasets are copied with the converter's layout.
+        '''
+        return self.chunk_superframes is None
+
+    def open(self, path):
+        '''
+        Create an HDF file to write with the profile.
+
+        :rtype: h5py.File
+        '''
+        return h5py.File(path, 'w')
+
+    def dataset_options(self, size, frequency=1.0):
+        '''
+        Keyword arguments of create_dataset for a dataset of a parameter.
+
+        :param size: Number of samples.
+        :type size: int
+        :param frequency: Sample rate of the parameter.
+        :type frequency: float
+        :rtype: dict
+        '''
+        if not self.chunk_superframes or not size:
+            return {}
+        chunk = int(round(frequency * SUPERFRAME_DURATION * self.chunk_superframes))
+        options = {'chunks': (min(max(chunk, 1), size),)}
+        if self.compression:
+            options['compression'] = self.compression
+            if self.compression_opts is not None:
+                options['compression_opts'] = self.compression_opts
+            options['shuffle'] = self.shuffle
+        return options
+
+    def _create_param(self, series, group, name):
+        dest = series.create_group(name)
+        dest.attrs.update(group.attrs)
+        frequency = float(group.attrs.get('frequency', 1.0))
+        for item_name, item in group.items():
+            if isinstance(item, h5py.Dataset) and len(item.shape) == 1:
+                dataset = dest.create_dataset(
+                    item_name, shape=item.shape, dtype=item.dtype,
+                    **self.dataset_options(item.shape[0], frequency))
+                dataset.attrs.update(item.attrs)
+                if item.shape[0]:
+                    dataset[:] = item[:]
+            else:
+                group.copy(item, dest, name=item_name)
+
+    def copy_params(self, hdf, groups):
+        '''
+        Copy parameter groups into the series group of a file opened with
+        open, writing their datasets with the profile's layout.
+
+        :param hdf: File opened with open.
+        :type hdf: h5py.File
+        :param groups: Parameter groups by name.
+        :type groups: iterable of (str, h5py.Group)
+        '''
+        series = hdf.require_group('series')
+        if self.native:
+            for name, group in groups:
+                group.file.copy(group, series, name=name)
+            return
+        for name, group in groups:
+            self._create_param(series, group, name)
+        hdf.flush()
+
+
+PROFILES = {profile.name: profile for profile in (
+    # The layout written by the converter.
+    HDFProfile('native'),
+    HDFProfile('none', chunk_superframes=16),
+    HDFProfile('lzf', chunk_superframes=16, compression='lzf', shuffle=True),
+    HDFProfile('gzip', chunk_superframes=16, compression='gzip', compression_opts=1, shuffle=True),
+)}
+DEFAULT_PROFILE = 'native'
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Reading plot configuration from LFL files.
+'''
+
+from flightdataplotter.raw_data import CounterLocation
+
+
+def config_axes(config, changed_params=()):
+    '''
+    Parameters to plot on each axis as defined by the AXIS_* parameter groups
+    of an LFL. The first axis always shows Altitude STD.
+
+    :param config: Parsed LFL.
+    :type config: configobj.ConfigObj
+    :param changed_params: Parameters to show on an extra second axis.
+    :type changed_params: iterable of str
+    :returns: Parameter names by axis index, starting from 1.
+    :rtype: dict
+    :raises ValueError: If the AXIS_1 group is not defined.
+    '''
+    axes = {1: ['Altitude STD']}
+    if changed_params:
+        # Add an axis for parameters which have changed.
+        axes[2] = list(changed_params)
+
+    # Read AXIS_* parameter groups.
+    axis_offset = len(axes)
+    group_index = 1
+    while True:
+        group_name = 'AXIS_%d' % group_index
+        try:
+            axis = config['Parameter Group'][group_name]
+            # Force a single entry to look like a list.
+            if isinstance(axis, str):
+                axes[group_index + axis_offset] = [axis,]
+            else:
+                axes[group_index + axis_offset] = axis
+        except KeyError:
+            break
+        group_index += 1
+
+    if len(axes) == 1:
+        raise ValueError('AXIS_1 parameter group is not defined! Please define '
+                         'a parameter group within the LFL named AXIS_1. '
+                         'Subsequent axes can be defined with groups named '
+                         'AXIS_2, AXIS_3, etc.')
+    return axes
+
+
+# Parameters which take part in decoding every other parameter. The
+# Superframe Counter locates each frame within its superframe, so superframe
+# parameters depend on its definition.
+FRAME_PARAMETERS = ('Superframe Counter',)
+
+
+def frame_config(config):
+    '''
+    The parts of an LFL which every parameter's decoding depends on: all
+    sections except the parameter definitions and groups, and the
+    definitions of FRAME_PARAMETERS.
+
+    :param config: Parsed LFL.
+    :type config: configobj.ConfigObj
+    :rtype: dict
+    '''
+    frame_conf = {key: value for key, value in config.items()
+                  if key not in ('Parameters', 'Parameter Group')}
+    params_conf = config.get('Parameters', {})
+    frame_conf['Frame Parameters'] = {name: params_conf.get(name) for name in FRAME_PARAMETERS}
+    return frame_conf
+
+
+def superframe_counter(config):
+    '''
+    Location of the Superframe Counter within each frame as defined by an
+    LFL. The counter is read from its Location (the word within the
+    subframe, where the sync word is word 1), Subframe (default 1), MSB
+    (default 12) and LSB (default 1).
+
+    :param config: Parsed LFL.
+    :type config: configobj.ConfigObj
+    :returns: Location of the counter or None if it is not defined.
+    :rtype: CounterLocation or None
+    :raises ValueError: If the definition is not a valid location.
+    '''
+    counter = config.get('Parameters', {}).get('Superframe Counter')
+    if not counter or 'Location' not in counter:
+        return None
+    try:
+        return CounterLocation(
+            int(counter.get('Subframe', 1)), int(counter['Location']),
+            int(counter.get('MSB', 12)), int(counter.get('LSB', 1)))
+    except (TypeError, ValueError):
+        raise ValueError('Superframe Counter location is not valid: %s' % dict(counter))
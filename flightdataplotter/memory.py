@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Choosing the number of superframes decoded in memory before they are written
+to the HDF file.
+
+Too few superframes make many small HDF writes and too many exhaust memory on
+long flights. The number is worked out from the memory available and the
+memory a superframe needs for the frame and parameters being decoded. It is
+chosen once, when a decode starts.
+'''
+
+from __future__ import division, print_function
+
+import os
+
+from flightdataplotter import raw_data
+
+
+AUTO = 'auto'
+# Fraction of the available memory which decoding may use.
+MEMORY_FRACTION = 0.25
+# Decoded samples are stored as float64 data with a boolean mask.
+HDF_BYTES_PER_SAMPLE = 8 + 1
+# Intermediate arrays roughly double the memory of decoded samples.
+BYTES_PER_SAMPLE = 2 * HDF_BYTES_PER_SAMPLE
+DEFAULT_WPS = 1024
+MIN_SUPERFRAMES = 1
+MAX_SUPERFRAMES = 4096
+SUPERFRAME_DURATION = raw_data.FRAMES_PER_SUPERFRAME * raw_data.FRAME_DURATION  # seconds
+
+
+def superframes_arg(value):
+    '''
+    argparse type of --superframes-in-memory: an integer or 'auto'.
+    '''
+    if value == AUTO:
+        return AUTO
+    return int(value)
+
+
+def available_memory():
+    '''
+    Memory available to new processes in bytes, or None if unknown.
+
+    :rtype: int or None
+    '''
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _param_frequency(param):
+    for attr in ('frequency', 'hz', 'rate'):
+        value = getattr(param, attr, None)
+        if value:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def samples_per_second(param_list):
+    '''
+    Total sample rate of the parameters being decoded, read from each
+    parameter's frequency, hz or rate attribute. Parameters without one are
+    counted at 1 Hz and named in a message.
+
+    :param param_list: Parameters from the LFL parser.
+    :type param_list: list
+    :rtype: float
+    '''
+    total = 0.0
+    unknown = []
+    for param in param_list:
+        frequency = _param_frequency(param)
+        if frequency is None:
+            unknown.append(str(getattr(param, 'name', param)))
+            frequency = 1.0
+        total += frequency
+    if unknown:
+        print('Sample rate unknown for %s; assuming 1 Hz when estimating memory.' % ', '.join(sorted(unknown)))
+    return total
+
+
+def words_per_second(frame_wps=None, data_path=None):
+    '''
+    Words per second of the raw data: the rate defined by the LFL frame (see
+    raw_data.frame_words_per_second), else the rate detected from the raw
+    data, else DEFAULT_WPS, which is reported in a message.
+
+    :param frame_wps: Rate defined by the LFL frame, if known.
+    :type frame_wps: int or None
+    :param data_path: Path of uncompressed raw data to detect the rate from.
+    :type data_path: str or None
+    :rtype: int
+    '''
+    if frame_wps:
+        return frame_wps
+    if data_path:
+        words = raw_data.map_words(data_path)
+        try:
+            return raw_data.find_sync(words[:raw_data.SYNC_SEARCH_BYTES // raw_data.WORD_SIZE])[1]
+        except ValueError:
+            pass
+    print('Words per second unknown; assuming %d when estimating memory.' % DEFAULT_WPS)
+    return DEFAULT_WPS
+
+
+def superframe_bytes(wps, sample_rate):
+    '''
+    Estimate of the memory needed to decode a superframe.
+
+    :param wps: Words per second of the raw data (see words_per_second).
+    :type wps: int
+    :param sample_rate: Total sample rate of the parameters being decoded
+        (see samples_per_second).
+    :type sample_rate: float
+    :rtype: int
+    '''
+    raw = wps * SUPERFRAME_DURATION * raw_data.WORD_SIZE
+    return int(raw + sample_rate * SUPERFRAME_DURATION * BYTES_PER_SAMPLE)
+
+
+def decoded_ratio(wps, sample_rate):
+    '''
+    Estimate of the size of the decoded HDF file relative to the size of the
+    raw data it is decoded from.
+
+    :type wps: int
+    :type sample_rate: float
+    :rtype: float
+    '''
+    return sample_rate * HDF_BYTES_PER_SAMPLE / (wps * raw_data.WORD_SIZE)
+
+
+def auto_superframes(bytes_per_superframe, workers=1, available=None, fraction=MEMORY_FRACTION):
+    '''
+    Number of superframes to decode in memory within each worker.
+
+    :param bytes_per_superframe: See superframe_bytes.
+    :type bytes_per_superframe: int
+    :param workers: Number of processes decoding at once.
+    :type workers: int
+    :param available: Available memory in bytes, read from the system if None.
+    :type available: int or None
+    :rtype: int
+    '''
+    if available is None:
+        available = available_memory()
+    if not available or bytes_per_superframe <= 0:
+        return MIN_SUPERFRAMES
+    budget = available * fraction / max(workers, 1)
+    return int(min(max(budget // bytes_per_superframe, MIN_SUPERFRAMES), MAX_SUPERFRAMES))
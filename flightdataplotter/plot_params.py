@@ -10,49 +10,54 @@ from __future__ import print_function
 
 import argparse
 import configobj
+import hashlib
+import io
 import itertools
+import importlib
 import logging
-import matplotlib
-
+import multiprocessing
 import os
-import sys
+import queue
+import shutil
 import tempfile
 import threading
 import time
 import traceback
-import wx
 
 import numpy as np
 
-from datetime import datetime
+from collections import namedtuple
 from argparse import RawTextHelpFormatter
 
-from analysis_engine.library import align
-
-import compass
-from compass.compass_cli import configobj_error_message
-from compass.arinc717.data_frame_parser import parse_lfl
-from compass.arinc717.hdf import create_hdf
-
-from hdfaccess.file import hdf_file
-
-matplotlib.use('WXAgg')
-
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-from pylab import setp
-
-
+from flightdataplotter import raw_data
+from flightdataplotter.cache import (
+    CACHE_DIR, CACHE_SIZE, RAW_CACHE_SIZE, DecodedParameterStore, decompress, evict, hash_values)
+from flightdataplotter.csv_data import read_csv
+from flightdataplotter.decode import DecodeCancelled, decode_params, map_cancellable, partition
+from flightdataplotter.hdf_profile import DEFAULT_PROFILE, PROFILES
+from flightdataplotter.lfl import config_axes, frame_config, superframe_counter
+from flightdataplotter.memory import (
+    AUTO, auto_superframes, decoded_ratio, samples_per_second, superframe_bytes, superframes_arg,
+    words_per_second)
+from flightdataplotter.profiling import NULL_PROFILER, Profiler
+from flightdataplotter.scratch import DISK, MODES, SCRATCH_SIZE, memory_cache_dir, memory_dir, scratch_dir
+from flightdataplotter.sources import open_params
+from flightdataplotter.watcher import create_watcher
+
+
+# Names of the compass functions which convert each CSV type to HDF. compass
+# is only imported when one is used.
 CSV_FUNCTIONS = {
-    'hfdm': compass.process_hfdm_csv_data,
-    'latitude': compass.process_latitude_data,
-    'chinook': compass.process_chinook_data,
-    'dash8': compass.process_dash8_data,
-    'g1000': compass.process_garmin1000_data,
+    'hfdm': 'process_hfdm_csv_data',
+    'latitude': 'process_latitude_data',
+    'chinook': 'process_chinook_data',
+    'dash8': 'process_dash8_data',
+    'g1000': 'process_garmin1000_data',
 }
-
-
-app = wx.App()
+# CSV files with a header row of parameter names, read directly without
+# conversion to HDF.
+GENERIC_CSV = 'generic'
+CSV_TYPES = sorted(CSV_FUNCTIONS) + [GENERIC_CSV]
 
 
 # Argument parsing.
@@ -75,11 +80,66 @@ def create_parser():
         help='Use command line arguments rather than file dialogs.')
     help_message_superframes = "Number of superframes stored in memory before writing \n" \
         "to HDF5 file. A value of 0 will cause all superframes to be \n" \
-        "stored in memory. Default is 100 superframes."
+        "stored in memory. Default is 100 superframes. 'auto' chooses \n" \
+        "the number once per decode from the memory available at its start."
     parser.add_argument(
         '--superframes-in-memory',
-        dest='superframes_in_memory', action='store', type=int, default=-1,
+        dest='superframes_in_memory', action='store', type=superframes_arg, default=-1,
         help=help_message_superframes)
+    parser.add_argument(
+        '--progressive', dest='progressive', nargs='?', type=int, const=8, default=None,
+        metavar='SUPERFRAMES',
+        help="Preview uncompressed raw data by decoding SUPERFRAMES \n"
+             "superframes at a time (default 8) and plotting the parameters \n"
+             "after each, with progress and the estimated time remaining in \n"
+             "the window title. Chunks start where the Superframe Counter \n"
+             "wraps so that they are joined into the whole flight's \n"
+             "parameters, which are cached. Without a Superframe Counter the \n"
+             "whole file is decoded at once.")
+    parser.add_argument(
+        '-j', '--jobs', dest='jobs', action='store', type=int, default=1,
+        help="Number of processes to decode parameters with. Parameters \n"
+             "are divided between the processes. Default is 1.")
+    parser.add_argument(
+        '--cache-dir', dest='cache_dir', default=CACHE_DIR,
+        help="Directory of the cache of decoded parameters which is kept \n"
+             "between sessions. Default is %s." % CACHE_DIR)
+    parser.add_argument(
+        '--cache-size', dest='cache_size', type=float, default=CACHE_SIZE / 1024.0 ** 2,
+        help="Size limit of the cache in megabytes. The least recently used \n"
+             "parameters are removed beyond it. Default is %d." % (CACHE_SIZE / 1024 ** 2))
+    parser.add_argument(
+        '--raw-cache-size', dest='raw_cache_size', type=float, default=RAW_CACHE_SIZE / 1024.0 ** 2,
+        help="Size limit in megabytes of the decompressed copies of zip \n"
+             "(.SAC) and bz2 raw data kept within the cache directory. \n"
+             "A value of 0 disables the copies. Default is %d." % (RAW_CACHE_SIZE / 1024 ** 2))
+    parser.add_argument(
+        '--scratch', dest='scratch', choices=MODES, default=DISK,
+        help="Where to write the HDF files of each decode: memory (a \n"
+             "memory-backed filesystem such as /dev/shm), disk, or auto \n"
+             "(memory when the files also fit within the memory available). \n"
+             "Parameters decoded in memory are cached in memory, until the \n"
+             "system restarts, rather than on disk so the plot reads them \n"
+             "from memory. Decodes larger than --scratch-size are written \n"
+             "and cached on disk. Default is %s." % DISK)
+    parser.add_argument(
+        '--scratch-size', dest='scratch_size', type=float, default=SCRATCH_SIZE / 1024.0 ** 2,
+        help="Estimated size in megabytes of the decoded files above which \n"
+             "they are written to disk rather than memory, and the size \n"
+             "limit of the parameters cached in memory. Default is %d." % (SCRATCH_SIZE / 1024 ** 2))
+    parser.add_argument(
+        '--hdf-profile', dest='hdf_profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+        help="Layout of the decoded parameters read for plotting: native \n"
+             "(as written by the converter), none (chunks of 16 superframes, \n"
+             "uncompressed), lzf or gzip. Default is %s." % DEFAULT_PROFILE)
+    parser.add_argument(
+        '--profile', dest='profile', action='store_true',
+        help="Print the wall time, CPU time and peak memory of each stage \n"
+             "of processing and plotting after every cycle.")
+    parser.add_argument(
+        '--profile-trace', dest='profile_trace', metavar='PATH',
+        help="Also write the stages to a Chrome trace JSON file (implies \n"
+             "--profile), viewable in chrome://tracing.")
     parser.add_argument(
         '-d', '--frame-doubled',
         dest='frame_doubled', default=False, action='store_true',
@@ -94,6 +154,17 @@ def create_parser():
     parser.add_argument(
         '--stop', dest='percent_stop', type=int, default=100,
         help='Percentage into the file to inspect up until.')
+    parser.add_argument(
+        '--time-window', dest='time_window', type=float, nargs=2,
+        metavar=('START', 'STOP'),
+        help='Window of the raw data to inspect in seconds. The selection is \n'
+             'aligned to frame boundaries using the LFL frame.')
+    parser.add_argument(
+        '--superframes', dest='superframe_range', type=int, nargs=2,
+        metavar=('START', 'STOP'),
+        help='Range of superframe indices of the raw data to inspect. \n'
+             'Superframes are counted from where the Superframe Counter \n'
+             'defined by the LFL first wraps.')
     parser.add_argument(
         '--tail', dest='tail_number',
         help='Aircraft tail number.')
@@ -122,10 +193,21 @@ def create_parser():
         '-m', '--show-masked', dest='mask_flag', action='store_true',
         help="Show masked data.")
     parser.add_argument(
-        '--csv', dest='csv_type',
+        '--csv', dest='csv_type', choices=CSV_TYPES,
         help="Process CSV file, options are: \n" \
-             "hfdm, g1000, dash8, latitude, chinook \n" \
-             "Example: --csv hfdm; --csv g1000; --csv dash8")
+             "%s \n" \
+             "Example: --csv hfdm; --csv g1000; --csv dash8 \n" \
+             "Recorder formats are converted to an HDF5 file at the output \n" \
+             "path. generic files, with a header row of parameter names and \n" \
+             "a row per sample, are read directly." % ', '.join(CSV_TYPES))
+    parser.add_argument(
+        '--csv-frequency', dest='csv_frequency', type=float, default=None,
+        help="Sample rate of the rows of a generic CSV file. Default is \n"
+             "worked out from --csv-time-column, or 1 Hz without one.")
+    parser.add_argument(
+        '--csv-time-column', dest='csv_time_column',
+        help="Column of timestamps (seconds or hh:mm:ss) of a generic CSV \n"
+             "file from which to work out the sample rate.")
     parser.add_argument(
         '--hdf', dest='hdf_flag', action='store_true',
         help="Process HDF5 file")
@@ -149,28 +231,123 @@ def create_parser():
     return parser
 
 
-def copy_file_part(src_path, percent_start=0, percent_stop=100):
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Magic numbers of the compressed formats supported by open_raw_data.
+COMPRESSED_SIGNATURES = (
+    b'PK\x03\x04',  # zip (.SAC)
+    b'BZh',  # bz2
+    b'\x1f\x8b',  # gzip
+)
+
+
+def is_compressed(path):
+    '''
+    Whether the file at path is a compressed raw data file.
+    '''
+    with open(path, 'rb') as f:
+        header = f.read(4)
+    return header.startswith(COMPRESSED_SIGNATURES)
+
+
+def _zero_copy(src, dest, offset, amount):
+    '''
+    Copy amount bytes from offset within src to the current position of dest
+    within the kernel. Returns the number of bytes copied, which is less than
+    amount if no zero-copy method is available.
+    '''
+    copied = 0
+    methods = []
+    if hasattr(os, 'copy_file_range'):
+        methods.append(lambda count: os.copy_file_range(
+            src.fileno(), dest.fileno(), count, offset + copied))
+    if hasattr(os, 'sendfile'):
+        methods.append(lambda count: os.sendfile(
+            dest.fileno(), src.fileno(), offset + copied, count))
+    for method in methods:
+        try:
+            while copied < amount:
+                count = method(amount - copied)
+                if not count:
+                    break
+                copied += count
+        except OSError:
+            # Unsupported for this file system or platform, try the next
+            # method from where the last one stopped.
+            continue
+        break
+    return copied
+
+
+def _open_source(src_path):
+    '''
+    Open a raw data file, decompressing it if required.
+
+    :returns: File object and whether the source is compressed.
+    '''
+    if not is_compressed(src_path):
+        return open(src_path, 'rb'), False
+    from flightdatautilities.filesystem_tools import open_raw_data
+    return open_raw_data(src_path), True
+
+
+def _copy_part(src, compressed, dest_path, offset, amount, buffer_size=COPY_BUFFER_SIZE):
+    '''
+    Stream amount bytes from offset within the open source to dest_path.
+    '''
+    # Write to a partial file so that an interrupted copy is not reused.
+    partial_path = dest_path + '.partial'
+    with open(partial_path, 'wb') as dest:
+        copied = 0 if compressed else _zero_copy(src, dest, offset, amount)
+        src.seek(offset + copied)
+        while copied < amount:
+            data = src.read(min(buffer_size, amount - copied))
+            if not data:
+                break
+            dest.write(data)
+            copied += len(data)
+    os.replace(partial_path, dest_path)
+
+
+def _part_path(src_path, ext, dest_dir=None, name=None):
+    '''
+    Path of a part of a raw data file, named after the source (or name) with
+    the suffix ext, within dest_dir or the source's directory.
+    '''
+    name = name or os.path.splitext(os.path.basename(src_path))[0]
+    return os.path.join(dest_dir or os.path.dirname(src_path), name + ext)
+
+
+def copy_file_part(src_path, percent_start=0, percent_stop=100,
+                   buffer_size=COPY_BUFFER_SIZE, dest_dir=None, name=None):
     '''
     Copies percentage of the source path to a new destination file. If source
     is compressed, output is read out into a decompressed file.
 
     src_path can be either a zip (.SAC), bz2 or uncompressed data file
 
-    NOTE: Reads data into memory
+    Data is streamed in chunks of buffer_size bytes so memory use does not
+    depend on the size of the part. Uncompressed sources are copied within
+    the kernel where supported.
+
+    :param dest_dir: Directory of the destination file, defaults to the
+        source's directory.
+    :type dest_dir: str
+    :param name: Name of the destination file before its suffix, defaults
+        to the source's name.
+    :type name: str
+
     TODO: Move to flightdatautilities.filesystem_tools ?
     '''
-
-    from flightdatautilities.filesystem_tools import open_raw_data
     ext = '_%d-%d.dat' % (percent_start, percent_stop)
-    dest_path = os.path.splitext(src_path)[0] + ext
+    dest_path = _part_path(src_path, ext, dest_dir, name)
     if os.path.isfile(dest_path) and os.path.getsize(dest_path):
         print('Partial file already exists; using: %s' % dest_path)
         return dest_path
+    src, compressed = _open_source(src_path)
     try:
-        src = open_raw_data(src_path)
         src.seek(0, 2)
         size = src.tell()
-        src.seek(0)
         offset = int(percent_start * size / 100.0)
         if offset % 2:
             offset += 1  # make sure the start is even
@@ -178,12 +355,66 @@ def copy_file_part(src_path, percent_start=0, percent_stop=100):
         amount = read_end - offset
         if amount % 2:
             amount -= 1  # make multiple of np.short (2 bytes)
-        src.seek(offset)
-        data = src.read(amount)
+        _copy_part(src, compressed, dest_path, offset, amount, buffer_size=buffer_size)
+    finally:
+        src.close()
+    return dest_path
+
+
+def copy_frame_part(src_path, frame_start, frame_stop, frame=None, ext=None,
+                    buffer_size=COPY_BUFFER_SIZE, dest_dir=None, name=None, counter=None):
+    '''
+    Copies a range of ARINC 717 frames of the source path to a new destination
+    file. The first frame is located from the sync words so that the part
+    starts and ends exactly on frame boundaries and only the selected words
+    are read.
+
+    :param frame_start: Index of the first frame to copy.
+    :type frame_start: int
+    :param frame_stop: Index of the frame to stop before.
+    :type frame_stop: int
+    :param frame: Frame from the LFL parser which defines the words per
+        second. If not provided, the rate is detected from the raw data.
+    :param ext: Suffix of the destination file.
+    :type ext: str
+    :param dest_dir: Directory of the destination file, defaults to the
+        source's directory.
+    :type dest_dir: str
+    :param name: Name of the destination file before its suffix, defaults
+        to the source's name.
+    :type name: str
+    :param counter: Location of the Superframe Counter. If provided, frames
+        are counted from the first frame of the first complete superframe.
+    :type counter: raw_data.CounterLocation
+    '''
+    ext = ext or '_frames%d-%d.dat' % (frame_start, frame_stop)
+    dest_path = _part_path(src_path, ext, dest_dir, name)
+    if os.path.isfile(dest_path) and os.path.getsize(dest_path):
+        print('Partial file already exists; using: %s' % dest_path)
+        return dest_path
+    src, compressed = _open_source(src_path)
+    try:
+        wps = raw_data.frame_words_per_second(frame)
+        if compressed:
+            header = src.read(raw_data.SUPERFRAME_SEARCH_BYTES if counter else raw_data.SYNC_SEARCH_BYTES)
+            words = np.frombuffer(header[:len(header) - len(header) % raw_data.WORD_SIZE], dtype='<u2')
+            sync_index, wps = raw_data.find_sync(words, wps)
+            frame_count = None
+        else:
+            # Only the pages searched for sync words and the counter are read.
+            words = raw_data.map_words(src_path)
+            sync_index, wps, frame_count = raw_data.locate_frames(words, wps)
+        if counter:
+            first_frame = raw_data.first_superframe(words, sync_index, wps, counter)
+            frame_start += first_frame
+            frame_stop += first_frame
+        if frame_count is not None and frame_start >= frame_count:
+            raise ValueError('Selection starts after the last of %d frames.' % frame_count)
+        offset, amount = raw_data.frame_byte_range(
+            sync_index * raw_data.WORD_SIZE, wps, frame_start, frame_stop)
+        _copy_part(src, compressed, dest_path, offset, amount, buffer_size=buffer_size)
     finally:
         src.close()
-    with open(dest_path, 'wb') as dest:
-        dest.write(data)
     return dest_path
 
 
@@ -193,28 +424,38 @@ def validate_args(parser):
     '''
     args = parser.parse_args()
     if not (args.csv_type or args.hdf_flag) and not args.lfl_path:
+        from flightdataplotter.gui import lfl_file_dialog
         args.lfl_path = lfl_file_dialog()
     if not (args.csv_type or args.hdf_flag) and not os.path.isfile(args.lfl_path):
         parser.error('LFL file path not valid: %s' % args.lfl_path)
 
     if not args.data_path:
+        from flightdataplotter.gui import data_file_dialog
         args.data_path = data_file_dialog()
     if not os.path.isfile(args.data_path):
         parser.error('Data file path not valid: %s' % args.data_path)
 
-    if args.percent_start > 0 or args.percent_stop < 100:
-        args.data_path = copy_file_part(
-            args.data_path, args.percent_start, args.percent_stop)
-        print("Read data chunk into new file: %s" % args.data_path)
-
-    if not args.output_path:
-        args.output_path = os.path.join(
-            tempfile.gettempdir(),
-            os.path.splitext(os.path.basename(args.data_path))[0] + '.hdf5')
-
-    if args.superframes_in_memory == 0 or args.superframes_in_memory < -1:
-        parser.error('Superframes in memory argument must be -1 or positive. '
-                     'Found %s' % args.superframes_in_memory)
+    if args.raw_cache_size < 0:
+        parser.error('Raw cache size argument must not be negative. Found %s' % args.raw_cache_size)
+    # Outputs are named after the flight's file even when it is read from
+    # the raw data cache.
+    flight_name = os.path.splitext(os.path.basename(args.data_path))[0]
+    part_dir = None
+    if args.raw_cache_size and not (args.csv_type or args.hdf_flag) and is_compressed(args.data_path):
+        # Decompress once so that selecting parts and decoding read the data
+        # uncompressed, now and on later runs.
+        from flightdatautilities.filesystem_tools import open_raw_data
+        args.data_path = decompress(
+            args.data_path, open_raw_data, cache_dir=args.cache_dir,
+            max_size=int(args.raw_cache_size * 1024 ** 2))
+        # Parts are written outside of the cache, whose files are evicted,
+        # within a directory of the decompressed copy so that parts of
+        # different flights with the same name are never reused.
+        part_dir = os.path.join(
+            tempfile.gettempdir(), 'FlightDataPlotter',
+            os.path.splitext(os.path.basename(args.data_path))[0])
+        if not os.path.isdir(part_dir):
+            os.makedirs(part_dir)
 
     aircraft_info = {
         'Frame Doubled': args.frame_doubled,
@@ -235,6 +476,76 @@ def validate_args(parser):
     if args.engine_type:
         aircraft_info['Engine Type'] = args.engine_type
 
+    if args.time_window and args.superframe_range:
+        parser.error('Only one of --time-window and --superframes may be used.')
+    if args.time_window or args.superframe_range:
+        if args.csv_type or args.hdf_flag:
+            parser.error('--time-window and --superframes require ARINC 717 raw data.')
+        if args.percent_start > 0 or args.percent_stop < 100:
+            parser.error('--start and --stop cannot be combined with --time-window or --superframes.')
+        counter = None
+        if args.time_window:
+            start, stop = args.time_window
+            frame_start, frame_stop = raw_data.seconds_to_frames(start, stop)
+            ext = '_%gs-%gs.dat' % (start, stop)
+        else:
+            start, stop = args.superframe_range
+            # Superframes are counted from the first frame of the first
+            # complete superframe, located from the Superframe Counter.
+            try:
+                counter = superframe_counter(configobj.ConfigObj(args.lfl_path))
+            except (configobj.ConfigObjError, ValueError) as err:
+                parser.error(str(err))
+            if not counter:
+                parser.error('--superframes requires the Superframe Counter to be defined by the LFL.')
+            frame_start, frame_stop = raw_data.superframes_to_frames(start, stop)
+            ext = '_sf%d-%d.dat' % (start, stop)
+        if frame_start < 0 or frame_stop <= frame_start:
+            parser.error('Selection must be a positive, increasing range.')
+        from compass.arinc717.data_frame_parser import parse_lfl
+        # Frame doubling and stretching change the frame's words per second.
+        lfl_parser, _param_list = parse_lfl(
+            args.lfl_path, param_names=[], aircraft_info=aircraft_info, required=False)
+        try:
+            args.data_path = copy_frame_part(
+                args.data_path, frame_start, frame_stop, frame=lfl_parser.frame, ext=ext,
+                dest_dir=part_dir, name=flight_name, counter=counter)
+        except ValueError as err:
+            parser.error(str(err))
+        print("Read data chunk into new file: %s" % args.data_path)
+        flight_name = os.path.splitext(os.path.basename(args.data_path))[0]
+    elif args.percent_start > 0 or args.percent_stop < 100:
+        args.data_path = copy_file_part(
+            args.data_path, args.percent_start, args.percent_stop, dest_dir=part_dir, name=flight_name)
+        print("Read data chunk into new file: %s" % args.data_path)
+        flight_name = os.path.splitext(os.path.basename(args.data_path))[0]
+
+    if not args.output_path:
+        output_dir = tempfile.gettempdir()
+        if args.scratch != DISK:
+            output_dir = memory_dir() or output_dir
+        args.output_path = os.path.join(output_dir, flight_name + '.hdf5')
+
+    if args.scratch_size < 0:
+        parser.error('Scratch size argument must not be negative. Found %s' % args.scratch_size)
+
+    if args.superframes_in_memory != AUTO and (
+            args.superframes_in_memory == 0 or args.superframes_in_memory < -1):
+        parser.error('Superframes in memory argument must be -1, positive or auto. '
+                     'Found %s' % args.superframes_in_memory)
+
+    if args.progressive is not None and args.progressive < 1:
+        parser.error('Progressive argument must be positive. Found %s' % args.progressive)
+
+    if args.jobs < 1:
+        parser.error('Jobs argument must be positive. Found %s' % args.jobs)
+
+    if args.csv_frequency is not None and args.csv_frequency <= 0:
+        parser.error('CSV frequency argument must be positive. Found %s' % args.csv_frequency)
+
+    if args.cache_size < 0:
+        parser.error('Cache size argument must not be negative. Found %s' % args.cache_size)
+
     return (
         args.lfl_path,
         args.data_path,
@@ -250,6 +561,16 @@ def validate_args(parser):
         args.axis5,
         args.axis6,
         aircraft_info,
+        args.jobs,
+        args.cache_dir,
+        int(args.cache_size * 1024 ** 2),
+        args.csv_time_column,
+        args.csv_frequency,
+        Profiler(args.profile_trace) if args.profile or args.profile_trace else NULL_PROFILER,
+        args.progressive,
+        args.hdf_profile,
+        args.scratch,
+        int(args.scratch_size * 1024 ** 2),
     )
 
 
@@ -257,130 +578,48 @@ def validate_args(parser):
 ###############################################################################
 
 
-def plot_parameters(params, axes, mask_flag, title=''):
+def load_params(hdf_path, param_names):
     '''
-    Plot resulting parameters.
+    Open only the named parameters from an HDF file rather than every
+    parameter within it. Samples are read from the file when they are
+    plotted.
+
+    :param param_names: Names of parameters to load.
+    :type param_names: iterable of str
+    :returns: Parameters by name. Missing parameters are reported and omitted.
+    :rtype: dict
     '''
-    print('Plotting parameters.')
-    max_freq = 0
-    min_freq = float('inf')
-
-    for name, param in params.items():
-        max_freq = max(max_freq, param.frequency)
-        min_freq = min(min_freq, param.frequency)
-
-    for param_name, param in params.items():
-        if max_freq == param.frequency:
-            param_max_freq = param
-        if param.frequency == min_freq:
-            param_min_freq_len = len(param.array)
-
-    # Truncate parameter arrays to successfully align them since the file
-    # has not been through split sections.
-    for param_name, param in params.items():
-        array_len = param_min_freq_len * (param.frequency / min_freq)
-        if array_len != len(param.array):
-            print('Truncated %s from %d to %d for display purposes' % (
-                param_name, len(param.array), array_len))
-            param.array = param.array[:array_len]
-
-    #==========================================================================
-    # Plot Preparation
-    #==========================================================================
-
-    # Invariant parameters are identified here. They could be inserted into
-    # the plot configuration file, but this is more straightforward.
-    plt.rc('axes', grid=True)
-    plt.rc('grid', color='0.75', linestyle='-', linewidth=0.5)
-
-    # These items are altered during the plot, so not suited to plt.rc setup
-    prop = fm.FontProperties(size=10)
-    legendprops = dict(shadow=True, fancybox=True, markerscale=0.5, prop=prop)
-
-    # Start by making a big clean canvas
-    fig = plt.figure(facecolor='white', figsize=(8, 6))
-    fig.canvas.set_window_title("%s %s" % (
-        title, datetime.now().strftime('%A, %d %B %Y at %X')))
-
-    # Add the "reference" altitude plot, and title this
-    # (If we title the empty plot, it acquires default 0-1 scales)
-    param_name = axes[1][0]
-    param = params[param_name]
-    array = align(param, param_max_freq)
-    first_axis = fig.add_subplot(len(axes), 1, 1)
-    if mask_flag:
-        first_axis.plot(array.data, label=param_name)
-    else:
-        first_axis.plot(array, label=param_name)
+    params, missing = open_params(hdf_path, param_names)
+    for name in missing:
+        print('Parameter %s was not found in the HDF file.' % name)
+    return params
 
-    ####plt.title("Processed on %s" %
-    ####          datetime.now().strftime('%A, %d %B %Y at %X'))
-    setp(first_axis.get_xticklabels(), visible=False)
 
-    # Now plot the additional data from the AXIS_N lists at the top of the lfl
-    for index, param_names in axes.items():
-        if index == 1:
-            continue
-        axis = fig.add_subplot(len(axes), 1, index, sharex=first_axis)
-        # Avoid iterating over string
-        if isinstance(param_names, str):
-            param_names = [param_names]
-        for param_name in param_names:
-            param = params[param_name]
-            # Data is aligned in time but the samples are not interpolated so
-            # that scaling issues can be easily addressed
-            label_text = param.name
-            args = []
-            if np.ma.all(param.array.mask):
-                args.append([])
-                label_text += ' <ALL MASKED>'
-            elif param.data_type == 'ASCII' or param.array.dtype.char == 'S':
-                print("Warning: ASCII not supported. Param '%s'" % param)
-                args.append([])
-                label_text += ' <ASCII NOT DRAWN>'
-            elif param.hz != max_freq:
-                # Data is aligned in time but the samples are not
-                # interpolated so that scaling issues can be easily addressed
-                args.append(np.arange(len(param.array)) * (max_freq / param.hz))
-                args.append(param.array)
-            else:
-                args.append(param.array)
+def process_raw_hdf(hdf, axes):
+    params_to_plot = load_params(
+        hdf, itertools.chain.from_iterable(axis for axis in axes if axis is not None))
 
-            if param.units is None:
-                label_text += " [No units]"
-            else:
-                if not isinstance(param.units, str):
-                    label_text += " : " + param.units.decode()
-                else:
-                    label_text += " : " + param.units
-            values_mapping = getattr(param.array, 'values_mapping', None)
-            if values_mapping:
-                label_text += '\n%s' % values_mapping
-            if mask_flag:
-                param.array.mask = False
-            axis.plot(*args, label=label_text)
-            axis.legend(loc='upper right', **legendprops)
-            if index < len(axes):
-                setp(axis.get_xticklabels(), visible=False)
-        plt.legend(loc='upper right', prop={'size': 10})
-    plt.show()
+    filtered_axes = dict(enumerate(filter(None, axes), start=1))
+    return params_to_plot, filtered_axes
 
 
-def process_raw_hdf(hdf, axes):
-    with hdf_file(hdf) as h:
-        params = h.get_params()
+def process_csv(csv_path, axes, frequency=None, time_column=None):
+    '''
+    Read the parameters on the axes directly from a generic CSV file.
 
-    params_to_plot = {}
-    for axis in axes:
-        if axis is not None:
-            for param in axis:
-                try:
-                    params_to_plot[param] = params[param]
-                except KeyError:
-                    print('Parameter %s was not found in the HDF file.' % param)
+    :param frequency: Sample rate of the rows (see read_csv).
+    :type frequency: float or None
+    :param time_column: Column of timestamps to work out the rate from.
+    :type time_column: str or None
+    '''
+    params, missing = read_csv(
+        csv_path, itertools.chain.from_iterable(axis for axis in axes if axis is not None),
+        frequency=frequency, time_column=time_column)
+    for name in missing:
+        print('Parameter %s was not found in the CSV file.' % name)
 
     filtered_axes = dict(enumerate(filter(None, axes), start=1))
-    return params_to_plot, filtered_axes
+    return params, filtered_axes
 
 
 # Processing and plotting loops
@@ -391,11 +630,45 @@ class ProcessError(Exception):
     pass
 
 
+# Number of parse_lfl results kept by ProcessAndPlotLoops.
+PARSE_CACHE_SIZE = 16
+
+# Events sent from the processing thread to the plotting loop.
+PROCESSED = 'processed'  # data: (hdf_path, axes)
+PARTIAL = 'partial'  # data: (hdf_path, axes, progress)
+ERROR = 'error'  # data: (title, message)
+CANCELLED = 'cancelled'  # data: None
+PROGRESS = 'progress'  # data: message
+EXIT = 'exit'  # data: None
+
+ProcessEvent = namedtuple('ProcessEvent', ('kind', 'data'))
+
+PROGRESS_BAR_WIDTH = 20
+
+
+def format_progress(fraction, eta):
+    '''
+    Progress as a text bar with the estimated time remaining.
+
+    :param fraction: Fraction complete, from 0 to 1.
+    :type fraction: float
+    :param eta: Estimated seconds remaining.
+    :type eta: float
+    :rtype: str
+    '''
+    filled = int(round(fraction * PROGRESS_BAR_WIDTH))
+    minutes, seconds = divmod(int(round(eta)), 60)
+    return '[%s%s] %3d%% ETA %d:%02d' % (
+        '#' * filled, '-' * (PROGRESS_BAR_WIDTH - filled), fraction * 100, minutes, seconds)
+
+
 class ProcessAndPlotLoops(threading.Thread):
-    def __init__(self, hdf_path, plot_changed, lfl_path, function):
+    def __init__(self, hdf_path, plot_changed, lfl_path, function, profiler=NULL_PROFILER):
         '''
         :param hdf_path: Output path for HDF file.
         :type hdf_path: str
+        :param profiler: Records the stages of each cycle.
+        :type profiler: flightdataplotter.profiling.Profiler or NullProfiler
         '''
         self._hdf_path = hdf_path
         self._lfl_path = lfl_path
@@ -404,53 +677,119 @@ class ProcessAndPlotLoops(threading.Thread):
         self._changed_params = set()
         self._plot_changed = plot_changed
 
-        self.__error_lock = threading.Lock()
-        self.__error_messages = []
+        self._events = queue.Queue()
+        # Called after sending an event while the GUI event loop is running.
+        self._wake = None
 
         self.exit_loop = threading.Event()
-        self._ready_to_plot = threading.Event()
-
-        self._axes = None
 
         self._last_config = None
+        self._param_store = None
+        self._config_cache = None
+        self._parse_cache = {}
+        # Directories of progressively decoded chunks which the output may
+        # refer to until it is rebuilt from the store.
+        self._preview_dirs = []
+        self._watcher = None
+        self._lfl_saved = False
+        self._profiler = profiler
 
         super(ProcessAndPlotLoops, self).__init__()
 
+    def _send_event(self, kind, data=None):
+        self._events.put(ProcessEvent(kind, data))
+        wake = self._wake
+        if wake is not None:
+            wake()
+
     def _queue_error_message(self, title, message):
-        self.__error_lock.acquire()
-        self.__error_messages.append((title, message))
-        self.__error_lock.release()
-
-    def _get_error_message(self):
-        self.__error_lock.acquire()
-        if self.__error_messages:
-            message = self.__error_messages.pop()
-        else:
-            message = None
-        self.__error_lock.release()
-        return message
+        self._send_event(ERROR, (title, message))
+
+    def _next_events(self, block=True):
+        '''
+        Return all pending events, blocking until one is available if block
+        is True. Superseded PROCESSED and PARTIAL events are dropped so that
+        only the latest result is plotted.
+        '''
+        events = []
+        if block:
+            events.append(self._events.get())
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        processed = [e for e in events if e.kind in (PROCESSED, PARTIAL)]
+        return [e for e in events if e.kind not in (PROCESSED, PARTIAL) or e is processed[-1]]
+
+    def _wait_cancel(self, timeout):
+        '''
+        Wait up to timeout seconds for a reason to cancel processing.
+        '''
+        if self.exit_loop.is_set():
+            return True
+        if self._watcher is None:
+            # Only exiting cancels processing outside of run(), but the
+            # timeout must still be waited so callers do not spin.
+            return self.exit_loop.wait(timeout)
+        if self._watcher.wait(timeout=timeout):
+            self._lfl_saved = True
+        return self._lfl_saved
 
     def process_data(self, lfl_path, data_path, output_path,
-                     superframes_in_memory, plot_changed, mask_flag, aircraft_info):
+                     superframes_in_memory, plot_changed, mask_flag, aircraft_info,
+                     jobs=1, cache_dir=None, cache_size=CACHE_SIZE, progressive=None,
+                     hdf_profile=DEFAULT_PROFILE, scratch=DISK, scratch_size=SCRATCH_SIZE):
         '''
         :param lfl_path: Path of LFL file.
         :type lfl_path: str
         :param output_path: Output path of HDF file.
         :type output_path: str
         :param superframes_in_memory: Number of superframes to process in
-            memory.
-        :type superframes_in_memory: int
+            memory, or 'auto' to choose from the memory available.
+        :type superframes_in_memory: int or str
         :param plot_changed: Whether or not to plot parameters which change
             within the LFL.
         :type plot_changed: bool
+        :param jobs: Number of processes to decode parameters with.
+        :type jobs: int
+        :param cache_dir: Directory of the decoded parameter cache.
+        :type cache_dir: str
+        :param cache_size: Size limit of the cache in bytes.
+        :type cache_size: int
+        :param progressive: Number of superframes to decode at a time,
+            publishing the parameters after each, or None to decode the whole
+            file at once.
+        :type progressive: int or None
+        :param hdf_profile: Name of the layout of the decoded parameters
+            (see hdf_profile.PROFILES).
+        :type hdf_profile: str
+        :param scratch: Where to write the HDF files of each decode (see
+            scratch.scratch_dir).
+        :type scratch: str
+        :param scratch_size: Estimated size of the decoded files in bytes
+            above which they are written to disk.
+        :type scratch_size: int
         '''
-        # Load config to read AXIS groups.
-        try:
-            config = configobj.ConfigObj(lfl_path)
-        except configobj.ConfigObjError as err:
-            message = configobj_error_message(err)
-            self._queue_error_message('Error while parsing LFL!', message)
-            raise ValueError(message)
+        from compass.arinc717.data_frame_parser import parse_lfl
+        from compass.compass_cli import configobj_error_message
+
+        # Load config to read AXIS groups. The parsed config is reused if the
+        # LFL was saved without changes.
+        with self._profiler.stage('configobj'):
+            with open(lfl_path, 'rb') as lfl_file:
+                content = lfl_file.read()
+            content_hash = hashlib.sha1(content).hexdigest()
+            if self._config_cache and self._config_cache[0] == content_hash:
+                config = self._config_cache[1]
+            else:
+                try:
+                    config = configobj.ConfigObj(io.BytesIO(content))
+                except configobj.ConfigObjError as err:
+                    message = configobj_error_message(err)
+                    self._queue_error_message('Error while parsing LFL!', message)
+                    raise ValueError(message)
+                self._config_cache = (content_hash, config)
 
         if self._last_config:
             for param_name, param_conf in config['Parameters'].items():
@@ -461,187 +800,362 @@ class ProcessAndPlotLoops(threading.Thread):
 
         self._last_config = dict(config)
 
-        axes = {1: ['Altitude STD']}
-        if plot_changed and self._changed_params:
-            # Add an axis for parameters which have changed.
-            axes[2] = list(self._changed_params)
-
-        # Read AXIS_* parameter groups.
-        axis_offset = len(axes)
-        group_index = 1
-        while True:
-            group_name = 'AXIS_%d' % group_index
-            try:
-                axis = config['Parameter Group'][group_name]
-                # Force a single entry to look like a list.
-                if isinstance(axis, str):
-                    axes[group_index + axis_offset] = [axis,]
-                else:
-                    axes[group_index + axis_offset] = axis
-            except KeyError:
-                break
-            group_index += 1
-
-        if len(axes) == 1:
-            message = 'AXIS_1 parameter group is not defined! Please define ' \
-                      'a parameter group within the LFL named AXIS_1. ' \
-                      'Subsequent axes can be defined with groups named ' \
-                      'AXIS_2, AXIS_3, etc.'
-            self._queue_error_message('AXIS_1 group missing', message)
-            raise ValueError(message)
+        try:
+            axes = config_axes(config, self._changed_params if plot_changed else ())
+        except ValueError as err:
+            self._queue_error_message('AXIS_1 group missing', str(err))
+            raise
 
         # Create a list of all parameters within the groups.
         param_names = set(itertools.chain.from_iterable(axes.values()))
         if 'Superframe Counter' in param_names:
             param_names.remove('Superframe Counter')
 
-        try:
-            lfl_parser, param_list = parse_lfl(
-                lfl_path, param_names=param_names, aircraft_info=aircraft_info, required=False)
-        except configobj.ConfigObjError as err:
-            message = configobj_error_message(err)
-            self._queue_error_message('Error while parsing LFL!', message)
-            raise ValueError(message)
-
-        param_errors = lfl_parser.format_errors()
-        if param_errors:
-            self._queue_error_message('Parameter Errors', param_errors)
-
-        print('Processing params: %s' % ', '.join([p.name for p in param_list]))
-        try:
-            create_hdf(data_path, output_path, lfl_parser.frame, param_list,
-                       superframes_in_memory=superframes_in_memory)
-        except Exception as err:
-            message = 'Error occurred during processing. Please ensure the ' \
-                'frame doubling is declared if applicable as well as both ' \
-                'the LFL and raw data file are correct. Exception:\n%s' % err
-            self._queue_error_message('Processing failed!', message)
-            traceback.print_exc()
-            raise ProcessError(message)
-
+        # Only decode parameters whose definition (or the frame definition,
+        # including the Superframe Counter) has changed since they were last
+        # decoded.
+        if self._param_store is None or self._param_store.data_path != data_path:
+            with self._profiler.stage('hash raw data'):
+                self._param_store = DecodedParameterStore(
+                    data_path, cache_dir=cache_dir, profile=PROFILES[hdf_profile],
+                    memory_cache_dir=memory_cache_dir() if scratch != DISK else None)
+        frame_conf = frame_config(config)
+        params_conf = config.get('Parameters', {})
+        keys = {name: self._param_store.key(params_conf.get(name), frame_conf, aircraft_info)
+                for name in param_names}
+        stale_names = {name for name, key in keys.items() if key not in self._param_store}
+
+        # Edits which only change AXIS groups leave nothing stale, so neither
+        # parse_lfl nor create_hdf are run.
+        decode_names = []
+        if stale_names:
+            # The result of parsing depends only on the sections of the
+            # parameters requested and the frame.
+            parse_key = hash_values(
+                frame_conf, {name: params_conf.get(name) for name in stale_names}, aircraft_info)
+            if parse_key not in self._parse_cache:
+                try:
+                    with self._profiler.stage('parse_lfl'):
+                        lfl_parser, param_list = parse_lfl(
+                            lfl_path, param_names=stale_names, aircraft_info=aircraft_info, required=False)
+                except configobj.ConfigObjError as err:
+                    message = configobj_error_message(err)
+                    self._queue_error_message('Error while parsing LFL!', message)
+                    raise ValueError(message)
+                if len(self._parse_cache) >= PARSE_CACHE_SIZE:
+                    self._parse_cache.pop(next(iter(self._parse_cache)))
+                self._parse_cache[parse_key] = (
+                    [p.name for p in param_list], lfl_parser.format_errors(),
+                    samples_per_second(param_list), raw_data.frame_words_per_second(lfl_parser.frame))
+            decode_names, param_errors, sample_rate, frame_wps = self._parse_cache[parse_key]
+            if param_errors:
+                self._queue_error_message('Parameter Errors', param_errors)
+
+        if decode_names:
+            message = 'Processing params: %s' % ', '.join(decode_names)
+            print(message)
+            self._send_event(PROGRESS, message)
+            # Each worker process decodes a share of the parameters into its
+            # own HDF file. The raw data is shared through the OS page cache.
+            parts = partition(decode_names, jobs)
+            chunks = None
+            if progressive and is_compressed(data_path):
+                print('Progressive decoding requires uncompressed raw data; decoding the whole file.')
+            elif progressive:
+                chunks = self._progressive_chunks(data_path, config, frame_wps, progressive)
+            wps = words_per_second(frame_wps, None if is_compressed(data_path) else data_path)
+            if superframes_in_memory == AUTO:
+                superframes_in_memory = auto_superframes(
+                    superframe_bytes(wps, sample_rate), workers=len(parts))
+                print('Decoding %d superframes in memory (--superframes-in-memory %d).'
+                      % (superframes_in_memory, superframes_in_memory))
+            decode_dir = scratch_dir(
+                scratch, decoded_ratio(wps, sample_rate) * os.path.getsize(data_path), scratch_size,
+                os.path.dirname(os.path.abspath(output_path)))
+            # Parameters decoded in memory are also stored in memory.
+            in_memory = decode_dir == memory_dir()
+            decode_base = os.path.join(decode_dir, os.path.basename(output_path))
+            decode_paths = ['%s.decode%d' % (decode_base, i) for i in range(len(parts))]
+            try:
+                # Workers are abandoned if the LFL is saved again before they
+                # finish.
+                with self._profiler.stage('create_hdf'):
+                    if chunks:
+                        # The output refers to the decoded chunks until it
+                        # is rebuilt from the store, even if decoding is
+                        # cancelled or fails.
+                        preview_dir = tempfile.mkdtemp(dir=decode_dir)
+                        self._preview_dirs.append(preview_dir)
+                        chunk_sources = self._decode_progressive(
+                            lfl_path, data_path, output_path, preview_dir, chunks, parts, keys, axes,
+                            aircraft_info, superframes_in_memory)
+                    else:
+                        decoded = map_cancellable(
+                            decode_params,
+                            [(lfl_path, data_path, decode_path, names, aircraft_info, superframes_in_memory)
+                             for decode_path, names in zip(decode_paths, parts)],
+                            self._wait_cancel)
+                with self._profiler.stage('store parameters'):
+                    if chunks:
+                        # Chunks hold whole superframes, so joining them
+                        # gives the parameters of the whole flight.
+                        for name, sources in sorted(chunk_sources.items()):
+                            self._param_store.add_concatenated(keys[name], sources, name, memory=in_memory)
+                    else:
+                        for decode_path, decoded_names in zip(decode_paths, decoded):
+                            for name in decoded_names:
+                                self._param_store.add(keys[name], decode_path, name, memory=in_memory)
+            except DecodeCancelled:
+                raise
+            except Exception as err:
+                message = 'Error occurred during processing. Please ensure the ' \
+                    'frame doubling is declared if applicable as well as both ' \
+                    'the LFL and raw data file are correct. Exception:\n%s' % err
+                self._queue_error_message('Processing failed!', message)
+                traceback.print_exc()
+                raise ProcessError(message)
+            finally:
+                for decode_path in decode_paths:
+                    if os.path.isfile(decode_path):
+                        os.remove(decode_path)
+        else:
+            print('No parameter definitions changed; reusing decoded parameters.')
+
+        with self._profiler.stage('build HDF'):
+            self._param_store.build(output_path, keys)
+            # The output no longer refers to any decoded chunks.
+            self._remove_previews()
+            evict(cache_dir, cache_size, keep=[self._param_store.store_dir])
+            if self._param_store.memory_store_dir:
+                evict(memory_cache_dir(), scratch_size,
+                      keep=[path for path in map(self._param_store.find, keys.values()) if path])
         print('Finished processing, output: %s' % output_path)
         return axes
 
+    def _remove_previews(self):
+        '''
+        Remove the directories of progressively decoded chunks.
+        '''
+        while self._preview_dirs:
+            shutil.rmtree(self._preview_dirs.pop(), ignore_errors=True)
+
+    def _progressive_chunks(self, data_path, config, frame_wps, chunk_superframes):
+        '''
+        Ranges of frames to decode progressively, split on superframe
+        boundaries located from the Superframe Counter.
+
+        :param config: Parsed LFL.
+        :type config: configobj.ConfigObj
+        :param frame_wps: Words per second defined by the LFL, if any.
+        :type frame_wps: int or None
+        :param chunk_superframes: Number of superframes decoded at a time.
+        :type chunk_superframes: int
+        :returns: Ranges of frames, or None if superframes could not be
+            located, in which case the whole file is decoded at once.
+        :rtype: list of (int, int) or None
+        '''
+        try:
+            counter = superframe_counter(config)
+            if not counter:
+                raise ValueError('The Superframe Counter is not defined by the LFL.')
+            words = raw_data.map_words(data_path)
+            sync_index, wps, frame_count = raw_data.locate_frames(words, frame_wps)
+            first_frame = raw_data.first_superframe(words, sync_index, wps, counter)
+        except ValueError as err:
+            print('Progressive decoding requires superframes to be located (%s); '
+                  'decoding the whole file.' % err)
+            return None
+        return raw_data.superframe_chunks(frame_count, first_frame, chunk_superframes)
+
+    def _decode_progressive(self, lfl_path, data_path, output_path, work_dir, chunks, parts, keys, axes,
+                            aircraft_info, superframes_in_memory):
+        '''
+        Decode the raw data a chunk of superframes at a time. After each
+        chunk, the parameters decoded so far are published to the plotting
+        loop so that the figure fills in while decoding continues.
+
+        Chunks are decoded by one pool of workers, so each worker parses the
+        LFL once (see decode_params).
+
+        :param work_dir: Directory to write the chunks to. The output refers
+            to the decoded chunks so they must remain until it is rebuilt
+            from the store.
+        :type work_dir: str
+        :param chunks: Ranges of frames to decode, split on superframe
+            boundaries (see raw_data.superframe_chunks).
+        :type chunks: list of (int, int)
+        :param parts: Names of the parameters to decode within each worker.
+        :type parts: list of list
+        :returns: Paths of the decoded chunks holding each parameter decoded
+            from every chunk, in order, by parameter name.
+        :rtype: dict
+        '''
+        frame_count = chunks[-1][1]
+        fresh_keys = {name: key for name, key in keys.items() if key in self._param_store}
+        sources = {}
+        complete = {}
+        start_time = time.time()
+        pool = multiprocessing.Pool(processes=len(parts))
+        try:
+            for chunk_index, (frame_start, frame_stop) in enumerate(chunks):
+                chunk_path = copy_frame_part(data_path, frame_start, frame_stop, dest_dir=work_dir)
+                chunk_decode_paths = [os.path.join(work_dir, 'chunk%d.decode%d' % (chunk_index, i))
+                                      for i in range(len(parts))]
+                decoded = map_cancellable(
+                    decode_params,
+                    [(lfl_path, chunk_path, chunk_decode_path, names, aircraft_info, superframes_in_memory)
+                     for chunk_decode_path, names in zip(chunk_decode_paths, parts)],
+                    self._wait_cancel, pool=pool)
+                os.remove(chunk_path)
+                for chunk_decode_path, decoded_names in zip(chunk_decode_paths, decoded):
+                    for name in decoded_names:
+                        sources.setdefault(name, []).append(chunk_decode_path)
+                # Only parameters decoded from every chunk can be joined.
+                complete = {name: paths for name, paths in sources.items()
+                            if len(paths) == chunk_index + 1}
+
+                fraction = frame_stop / frame_count
+                progress = format_progress(fraction, (time.time() - start_time) * (1 - fraction) / fraction)
+                print(progress)
+                self._param_store.build(output_path, fresh_keys, chunks=complete)
+                self._send_event(PARTIAL, (output_path, axes, progress))
+        finally:
+            pool.terminate()
+            pool.join()
+        return complete
+
     def run(self):
         '''
         The processing loop.
         '''
-        prev_mtime = None
-        while True:
-            mtime = os.path.getmtime(self._lfl_path)
-            if not prev_mtime or mtime > prev_mtime:
-                if self._ready_to_plot.is_set():
-                    self._ready_to_plot.clear()
+        # Start watching before processing so that saves made while
+        # processing are not missed.
+        self._watcher = create_watcher(self._lfl_path)
+        try:
+            self._lfl_saved = True
+            while not self.exit_loop.is_set():
+                if not self._lfl_saved:
+                    # Wake periodically to check whether to exit.
+                    self._lfl_saved = self._watcher.wait(timeout=1)
+                    continue
+                self._lfl_saved = False
                 try:
-                    self._axes = self._function()
+                    axes = self._function()
+                except DecodeCancelled:
+                    self._send_event(CANCELLED)
+                    if not self.exit_loop.is_set():
+                        print('LFL saved during processing; restarting with the latest definition.')
+                    continue
                 except ValueError:
                     continue
                 except ProcessError as err:
                     print(err)
                     self.exit_loop.set()
                     return
+                except Exception as err:
+                    # Failures outside of decoding, such as the cache disk
+                    # filling up, end processing as decoding failures do.
+                    traceback.print_exc()
+                    self._queue_error_message(
+                        'Processing failed!', 'Exception:\n%s: %s' % (err.__class__.__name__, err))
+                    self.exit_loop.set()
+                    return
                 else:
-                    self._ready_to_plot.set()
-                finally:
-                    prev_mtime = mtime
-            else:
-                time.sleep(1)
+                    self._send_event(PROCESSED, (self._hdf_path, axes))
+        finally:
+            self._watcher.close()
+            self._watcher = None
+            self._remove_previews()
+            # Wake the plotting loop so that it can exit.
+            if self.exit_loop.is_set():
+                self._send_event(EXIT)
 
     def process_hdf_axis(self, hdf_file, axis1, axis2, axis3, axis4, axis5, axis6):
         pass
 
+    def _handle_event(self, event, session):
+        '''
+        Handle an event from the processing thread.
+
+        :returns: Whether the plotting loop should continue.
+        :rtype: bool
+        '''
+        if event.kind == EXIT:
+            return False
+        elif event.kind == ERROR:
+            from flightdataplotter.gui import show_error_dialog
+            show_error_dialog(*event.data, main_loop=not session.is_open())
+        elif event.kind in (PROCESSED, PARTIAL):
+            hdf_path, axes = event.data[:2]
+            try:
+                with self._profiler.stage('load params'):
+                    params = load_params(hdf_path, itertools.chain.from_iterable(axes.values()))
+                title = os.path.basename(hdf_path)
+                if event.kind == PARTIAL:
+                    # Show the progress of decoding in the window title.
+                    title += ' - decoding %s' % event.data[2]
+                session.update(params, axes, title=title)
+                if event.kind == PROCESSED:
+                    self._profiler.end_cycle()
+            except ValueError as err:
+                print('Waiting for you to fix this error: %s' % err)
+            except Exception as err:
+                # traceback required?
+                print('Exception raised! %s: %s' % (err.__class__.__name__,
+                                                    err))
+        # PROGRESS and CANCELLED events are already reported on the
+        # console by the processing thread.
+        return True
+
+    def _handle_pending(self, session):
+        '''
+        Handle queued events from within the GUI event loop.
+        '''
+        for event in self._next_events(block=False):
+            if not self._handle_event(event, session):
+                import matplotlib.pyplot as plt
+                plt.close('all')
+                return
+
     def plot_loop(self, mask_flag):
         '''
         The plotting loop.
         '''
-        while True:
-            # For some strange reason it appears that printing the following
-            # line affects the plotting window being shown on windows.
-            if self.exit_loop.is_set():
-                return
-            error_message = self._get_error_message()
-            if error_message:
-                show_error_dialog(*error_message)
-                continue
-            if self._ready_to_plot.is_set():
-                self._ready_to_plot.clear()
+        import wx
+        from flightdataplotter.gui import get_app
+        import matplotlib.pyplot as plt
+        from flightdataplotter.plotting import PlotSession
+
+        get_app()
+        session = PlotSession(mask_flag, profiler=self._profiler)
+        while not self.exit_loop.is_set():
+            for event in self._next_events():
+                if not self._handle_event(event, session):
+                    return
+            if session.is_open():
+                # Run the GUI event loop until the figure is closed. Events
+                # sent meanwhile are handled within it and update the figure
+                # in place.
+                self._wake = lambda: wx.CallAfter(self._handle_pending, session)
                 try:
-                    with hdf_file(self._hdf_path) as hdf:
-                        # iterate over whole file as only those params
-                        # required were converted earlier into the HDF file
-                        params = hdf.get_params()
-                    title = os.path.basename(self._hdf_path)
-                    plot_parameters(params, self._axes, mask_flag, title=title)
-                except ValueError as err:
-                    print('Waiting for you to fix this error: %s' % err)
-                except Exception as err:
-                    # traceback required?
-                    print('Exception raised! %s: %s' % (err.__class__.__name__,
-                                                        err))
-            else:
-                time.sleep(1)
+                    self._wake()
+                    plt.show()
+                finally:
+                    self._wake = None
 
 
-class Frame(wx.Frame):
-    '''
-    There a built-in message dialogs which display a message, but they were
-    freezing due to the application's threading model.
+def _plotting():
     '''
-    def __init__(self, title, message):
-        wx.Frame.__init__(self, None, title=title)
-        #self.Bind(wx.EVT_CLOSE, self.OnClose)
-        panel = wx.Panel(self)
-        box = wx.BoxSizer(wx.VERTICAL)
-
-        m_text = wx.StaticText(panel, -1, message, size=(340, 100),
-                               style=wx.TE_MULTILINE)
-        m_text.SetSize(m_text.GetBestSize())
-        button = wx.Button(panel, label='OK')
-        button.SetDefault()
-        button.Bind(wx.EVT_BUTTON, self.OnClose)
-        box.Add(m_text, flag=wx.ALL)
-        box.Add(button, flag=wx.EXPAND)
-
-        panel.SetSizerAndFit(box)
-        self.Layout()
-        self.Fit()
-
-    def OnClose(self, event):
-        self.Destroy()
-
-
-def show_error_dialog(title, message):
+    Import the plotting module. The wx backend is used where wx is
+    available, otherwise matplotlib chooses one.
     '''
-    Show error.
-    '''
-    frame = Frame(title, message)
-    frame.Show()
-    app.MainLoop()
-
-
-def lfl_file_dialog():
-    #TOOD: Remember last directory accessed!
-    lfl_dialog = wx.FileDialog(None, message="Please choose an LFL file",
-                               defaultDir='',
-                               wildcard="*.lfl")
-    if lfl_dialog.ShowModal() == wx.ID_OK:
-        lfl_path = lfl_dialog.GetPath()
-    else:
-        show_error_dialog('Error!', 'An LFL file must be selected.')
-        sys.exit(1)
-    return lfl_path
-
-
-def data_file_dialog():
-    data_dialog = wx.FileDialog(None, message="Please choose a raw data file",
-                                defaultDir='',
-                                wildcard="*.*")
-    if data_dialog.ShowModal() == wx.ID_OK:
-        data_path = data_dialog.GetPath()
-    else:
-        show_error_dialog('Error!', 'A raw data file must be selected.')
-        sys.exit(1)
-    return data_path
+    try:
+        # Importing the GUI module selects its backend.
+        importlib.import_module('flightdataplotter.gui')
+    except ImportError:
+        pass
+    from flightdataplotter import plotting
+    return plotting
 
 
 def main():
@@ -663,30 +1177,51 @@ def main():
     hdf_flag = plot_args[7]
     axes = [['Altitude STD'], plot_args[8], plot_args[9], plot_args[10], plot_args[11], plot_args[12]]
     aircraft_info = plot_args[13]
+    jobs = plot_args[14]
+    cache_dir = plot_args[15]
+    cache_size = plot_args[16]
+    csv_time_column = plot_args[17]
+    csv_frequency = plot_args[18]
+    profiler = plot_args[19]
+    progressive = plot_args[20]
+    hdf_profile = plot_args[21]
+    scratch = plot_args[22]
+    scratch_size = plot_args[23]
 
     if hdf_flag:
-        params, axes = process_raw_hdf(data_path, axes)
-        plot_parameters(params, axes, mask_flag)
-        pass
+        with profiler.stage('load params'):
+            params, axes = process_raw_hdf(data_path, axes)
+        _plotting().plot_parameters(params, axes, mask_flag, profiler=profiler)
+    elif csv_type == GENERIC_CSV:
+        with profiler.stage('read CSV'):
+            params, axes = process_csv(data_path, axes, csv_frequency, csv_time_column)
+        _plotting().plot_parameters(params, axes, mask_flag, profiler=profiler)
     elif csv_type:
+        import compass
         parameters = [item for sublist in filter(None, axes) for item in sublist]
-        CSV_FUNCTIONS[csv_type](data_path, hdf_path, parameters=parameters)
-        params, axes = process_raw_hdf(hdf_path, axes)
-        plot_parameters(params, axes, mask_flag)
+        getattr(compass, CSV_FUNCTIONS[csv_type])(data_path, hdf_path, parameters=parameters)
+        with profiler.stage('load params'):
+            params, axes = process_raw_hdf(hdf_path, axes)
+        _plotting().plot_parameters(params, axes, mask_flag, profiler=profiler)
     else:
         plot_func = lambda: process_thread.process_data(lfl_path, data_path, hdf_path, superframes_in_memory,
-                                                        plot_changed, mask_flag, aircraft_info)
+                                                        plot_changed, mask_flag, aircraft_info, jobs=jobs,
+                                                        cache_dir=cache_dir, cache_size=cache_size,
+                                                        progressive=progressive, hdf_profile=hdf_profile,
+                                                        scratch=scratch, scratch_size=scratch_size)
         process_thread = ProcessAndPlotLoops(hdf_path, plot_changed,
-                                             lfl_path, plot_func)
+                                             lfl_path, plot_func, profiler=profiler)
         process_thread.start()
         try:
             process_thread.plot_loop(mask_flag)
         except KeyboardInterrupt:
             print('Setting exit_loop event.')
             process_thread.exit_loop.set()
+            process_thread.join()
         finally:
             # If the file is in a temporary location, remove it.
-            if hdf_path.startswith(tempfile.gettempdir()) \
+            temp_dirs = tuple(filter(None, (tempfile.gettempdir(), memory_dir())))
+            if hdf_path.startswith(temp_dirs) \
                and os.path.isfile(hdf_path):
                 try:
                     os.remove(hdf_path)
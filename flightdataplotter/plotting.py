@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Plotting parameters on a figure of stacked axes sharing the time axis.
+
+The matplotlib backend is chosen by the caller before this module is
+imported: WXAgg for the interactive plotter and Agg for batch rendering.
+'''
+
+from __future__ import print_function
+
+from datetime import datetime
+
+import matplotlib.font_manager as fm
+import matplotlib.pyplot as plt
+import numpy as np
+
+from flightdataplotter.decimate import DecimatedLine
+from flightdataplotter.profiling import NULL_PROFILER
+from flightdataplotter.sources import ArraySource, HDFParameter, HDFSource, TimeBase
+
+
+def _param_size(param):
+    if isinstance(param, HDFParameter):
+        return param.size
+    return len(param.array)
+
+
+def _line_source(param, size, time_base, mask_flag):
+    '''
+    Source of the samples of a parameter positioned on the shared time base.
+    Parameters opened from HDF files are read on demand and arrays are only
+    sliced, not copied.
+    '''
+    offset = getattr(param, 'offset', 0) or 0
+    if isinstance(param, HDFParameter):
+        return param.source(size=size, scale=time_base.scale(param.frequency),
+                            origin=time_base.origin(offset), masked=not mask_flag)
+    array = param.array[:size]
+    return ArraySource(time_base.x(param.frequency, offset, size),
+                       array.data if mask_flag else array)
+
+
+def _all_masked(param, source):
+    if isinstance(source, HDFSource):
+        # The overview is kept by the source, so drawing reuses it.
+        return source.all_masked()
+    return bool(np.ma.all(param.array.mask))
+
+
+def _line_specs(params, axes, mask_flag, all_masked=None):
+    '''
+    Work out the lines to plot on each axis.
+
+    :param all_masked: Set to add the names of the parameters without valid
+        samples to, including the reference on the first axis. Only
+        parameters whose masked samples are hidden are checked.
+    :type all_masked: set or None
+    :returns: (axis index, parameter name, source, label) for each line. The
+        source is None for parameters which cannot be drawn.
+    :rtype: list of tuple
+    '''
+    max_freq = 0
+    min_freq = float('inf')
+
+    for name, param in params.items():
+        max_freq = max(max_freq, param.frequency)
+        min_freq = min(min_freq, param.frequency)
+
+    for param_name, param in params.items():
+        if param.frequency == min_freq:
+            param_min_freq_len = _param_size(param)
+
+    # Truncate parameter arrays to successfully align them since the file
+    # has not been through split sections.
+    sizes = {}
+    for param_name, param in params.items():
+        size = _param_size(param)
+        array_len = int(param_min_freq_len * (param.frequency / min_freq))
+        if array_len != size:
+            print('Truncated %s from %d to %d for display purposes' % (
+                param_name, size, array_len))
+        sizes[param_name] = min(array_len, size)
+
+    # x-coordinates are in samples of the highest frequency.
+    time_base = TimeBase(max_freq)
+
+    # Only the "reference" altitude is plotted on the first axis.
+    param_name = axes[1][0]
+    source = _line_source(params[param_name], sizes[param_name], time_base, mask_flag)
+    if all_masked is not None and not mask_flag and _all_masked(params[param_name], source):
+        all_masked.add(param_name)
+    specs = [(1, param_name, source, param_name)]
+
+    # Now plot the additional data from the AXIS_N lists at the top of the lfl
+    for index, param_names in axes.items():
+        if index == 1:
+            continue
+        # Avoid iterating over string
+        if isinstance(param_names, str):
+            param_names = [param_names]
+        for param_name in param_names:
+            if param_name not in params:
+                continue
+            param = params[param_name]
+            # Data is aligned in time but the samples are not interpolated so
+            # that scaling issues can be easily addressed
+            label_text = param.name
+            # Only a pixel's worth of min/max envelope is read and drawn for
+            # the visible range.
+            source = _line_source(param, sizes[param_name], time_base, mask_flag)
+            dtype = param.dtype if isinstance(param, HDFParameter) else param.array.dtype
+            if param.data_type == 'ASCII' or dtype.char == 'S':
+                print("Warning: ASCII not supported. Param '%s'" % param)
+                label_text += ' <ASCII NOT DRAWN>'
+                source = None
+            elif _all_masked(param, source):
+                label_text += ' <ALL MASKED>'
+                source = None
+                if all_masked is not None and not mask_flag:
+                    all_masked.add(param_name)
+
+            if param.units is None:
+                label_text += " [No units]"
+            else:
+                if not isinstance(param.units, str):
+                    label_text += " : " + param.units.decode()
+                else:
+                    label_text += " : " + param.units
+            if isinstance(param, HDFParameter):
+                values_mapping = param.values_mapping
+            else:
+                values_mapping = getattr(param.array, 'values_mapping', None)
+            if values_mapping:
+                label_text += '\n%s' % values_mapping
+            specs.append((index, param_name, source, label_text))
+    return specs
+
+
+class PlotSession(object):
+    '''
+    A figure which is kept open across reprocessing cycles.
+
+    Updating the session replaces the data of existing lines, adds or removes
+    only the lines whose parameters appeared or disappeared and keeps the
+    current zoom and pan. When only line data changes, the lines are blitted
+    over the saved background rather than redrawing the figure.
+    '''
+    def __init__(self, mask_flag, blit=True, profiler=NULL_PROFILER):
+        '''
+        :param mask_flag: Whether to show masked data.
+        :type mask_flag: bool
+        :param blit: Whether to blit line updates where the canvas supports it.
+        :type blit: bool
+        :param profiler: Records the stages of updates. When profiling, the
+            figure is drawn within the update so that drawing is timed.
+        :type profiler: flightdataplotter.profiling.Profiler or NullProfiler
+        '''
+        self.mask_flag = mask_flag
+        self.profiler = profiler
+        self.fig = None
+        self._blit = blit
+        self._axes = {}
+        self._lines = {}
+        self._home_xlim = None
+        self._home_ylims = {}
+        self._background = None
+        # Names of the parameters of the last update without valid samples,
+        # when masked samples are hidden.
+        self.all_masked = set()
+
+    def is_open(self):
+        return self.fig is not None and plt.fignum_exists(self.fig.number)
+
+    def _create_figure(self, axes):
+        if self.fig is not None:
+            plt.close(self.fig)
+        # Invariant parameters are identified here. They could be inserted into
+        # the plot configuration file, but this is more straightforward.
+        plt.rc('axes', grid=True)
+        plt.rc('grid', color='0.75', linestyle='-', linewidth=0.5)
+
+        # Start by making a big clean canvas
+        self.fig = plt.figure(facecolor='white', figsize=(8, 6))
+        self._axes = {}
+        self._lines = {}
+        self._home_xlim = None
+        self._home_ylims = {}
+        self._background = None
+        self._blit = self._blit and getattr(self.fig.canvas, 'supports_blit', False)
+        if self._blit:
+            self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+        first_axis = None
+        for index in sorted(axes):
+            axis = self.fig.add_subplot(len(axes), 1, index, sharex=first_axis)
+            first_axis = first_axis or axis
+            if index < len(axes):
+                plt.setp(axis.get_xticklabels(), visible=False)
+            self._axes[index] = axis
+
+    def _on_draw(self, event):
+        '''
+        Save the background after a full draw and draw the animated lines
+        over it.
+        '''
+        canvas = self.fig.canvas
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self._lines.values():
+            line.axis.draw_artist(line.line)
+        self.fig.canvas.blit(self.fig.bbox)
+
+    def _update_legend(self, index):
+        if index == 1:
+            return
+        # These items are altered during the plot, so not suited to plt.rc setup
+        prop = fm.FontProperties(size=10)
+        legendprops = dict(shadow=True, fancybox=True, markerscale=0.5, prop=prop)
+        self._axes[index].legend(loc='upper right', **legendprops)
+
+    def update(self, params, axes, title=''):
+        '''
+        Plot the parameters, reusing the figure if it is still open.
+
+        :param params: Parameters by name.
+        :type params: dict
+        :param axes: Parameter names by axis index, starting from 1.
+        :type axes: dict
+        '''
+        print('Plotting parameters.')
+        with self.profiler.stage('align'):
+            self.all_masked = set()
+            specs = _line_specs(params, axes, self.mask_flag, all_masked=self.all_masked)
+
+        rebuilt = not self.is_open() or sorted(axes) != sorted(self._axes)
+        if rebuilt:
+            self._create_figure(axes)
+        manager = self.fig.canvas.manager
+        if manager is not None:
+            manager.set_window_title("%s %s" % (
+                title, datetime.now().strftime('%A, %d %B %Y at %X')))
+
+        first_axis = self._axes[1]
+        zoomed = not rebuilt and first_axis.get_xlim() != self._home_xlim
+        limits = [(axis.get_xlim(), axis.get_ylim()) for axis in self._axes.values()]
+        xlim = first_axis.get_xlim() if zoomed else None
+
+        changed_axes = set()
+        keys = set()
+        for index, param_name, source, label in specs:
+            key = (index, param_name)
+            keys.add(key)
+            line = self._lines.get(key)
+            if line is None:
+                line = self._lines[key] = DecimatedLine(
+                    self._axes[index], source, label=label, animated=self._blit)
+                if zoomed:
+                    # New lines are read for the whole flight; read them
+                    # again for the zoomed view as the existing lines are.
+                    line.update(xlim)
+                changed_axes.add(index)
+            else:
+                line.set_source(source, xlim)
+                if line.line.get_label() != label:
+                    line.line.set_label(label)
+                    changed_axes.add(index)
+        for key in set(self._lines) - keys:
+            self._lines.pop(key).remove()
+            changed_axes.add(key[0])
+        for index in changed_axes:
+            self._update_legend(index)
+
+        # Autoscale unless the view has been zoomed or panned.
+        for index, axis in self._axes.items():
+            keep_ylim = not rebuilt and axis.get_ylim() != self._home_ylims.get(index)
+            axis.relim()
+            axis.autoscale_view(scalex=not zoomed, scaley=not keep_ylim)
+            if not keep_ylim:
+                self._home_ylims[index] = axis.get_ylim()
+        if not zoomed:
+            self._home_xlim = first_axis.get_xlim()
+
+        unchanged = limits == [(axis.get_xlim(), axis.get_ylim()) for axis in self._axes.values()]
+        if self._blit and self._background is not None and unchanged and not changed_axes:
+            with self.profiler.stage('blit'):
+                self.fig.canvas.restore_region(self._background)
+                self._draw_lines()
+        elif self.profiler.enabled:
+            with self.profiler.stage('draw'):
+                self.fig.canvas.draw()
+        else:
+            self.fig.canvas.draw_idle()
+
+
+def plot_parameters(params, axes, mask_flag, title='', profiler=NULL_PROFILER):
+    '''
+    Plot resulting parameters.
+    '''
+    session = PlotSession(mask_flag, profiler=profiler)
+    session.update(params, axes, title=title)
+    profiler.end_cycle()
+    plt.show()
+    return session
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Timing and memory instrumentation of the stages of each processing cycle.
+
+Stages are recorded with wall time, the CPU time of the thread running the
+stage, the CPU time of worker processes which finished during the stage and
+peak resident memory. On Linux the peak is reset as each stage starts, so it
+is the peak during the stage (and any stage running at the same time in
+another thread). Elsewhere it is the peak since the process started. A
+summary is printed after each cycle and all stages can be exported in the
+Chrome trace format, viewable in chrome://tracing or https://ui.perfetto.dev.
+
+When profiling is off, NullProfiler is used whose stages do nothing.
+'''
+
+from __future__ import print_function
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+CLEAR_REFS_PATH = '/proc/self/clear_refs'
+STATUS_PATH = '/proc/self/status'
+
+
+def reset_peak_rss():
+    '''
+    Reset the peak resident memory of this process to its current resident
+    memory. Only supported on Linux.
+
+    :returns: Whether the peak was reset.
+    :rtype: bool
+    '''
+    try:
+        with open(CLEAR_REFS_PATH, 'w') as clear_refs:
+            clear_refs.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def _status_bytes(field):
+    try:
+        with open(STATUS_PATH) as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def peak_rss(reset=False):
+    '''
+    Peak resident memory of this process and of its largest finished child
+    process in bytes, or None where not available.
+
+    :param reset: Whether the peak of this process was reset by
+        reset_peak_rss, in which case the peak since then is returned.
+    :type reset: bool
+    :rtype: (int or None, int or None)
+    '''
+    rss = _status_bytes('VmHWM') if reset else None
+    if resource is None:
+        return rss, None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    if rss is None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return rss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+
+
+def child_cpu_time():
+    '''
+    CPU time used by the finished child processes of this process.
+
+    :rtype: float
+    '''
+    times = os.times()
+    return times[2] + times[3]
+
+
+class Stage(object):
+    '''
+    A recorded stage.
+    '''
+    __slots__ = ('name', 'cycle', 'start', 'wall', 'cpu', 'child_cpu', 'rss', 'child_rss', 'thread')
+
+    def __init__(self, name, cycle, start, wall, cpu, child_cpu, rss, child_rss, thread):
+        self.name = name
+        self.cycle = cycle
+        self.start = start
+        self.wall = wall
+        self.cpu = cpu
+        self.child_cpu = child_cpu
+        self.rss = rss
+        self.child_rss = child_rss
+        self.thread = thread
+
+
+def _megabytes(value):
+    return '-' if value is None else '%.0f' % (value / 1024.0 ** 2)
+
+
+class Profiler(object):
+    '''
+    Records stages from any thread.
+    '''
+    enabled = True
+
+    def __init__(self, trace_path=None):
+        '''
+        :param trace_path: Path to export the Chrome trace to after each cycle.
+        :type trace_path: str or None
+        '''
+        self.trace_path = trace_path
+        self.stages = []
+        self.cycle = 1
+        self._reported = 0
+        self._origin = time.time()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        Record the code within the context as a stage.
+
+        :type name: str
+        '''
+        start = time.time()
+        cpu = time.thread_time()
+        child_cpu = child_cpu_time()
+        start_child_rss = peak_rss()[1]
+        reset = reset_peak_rss()
+        try:
+            yield
+        finally:
+            wall = time.time() - start
+            rss, child_rss = peak_rss(reset)
+            # The largest finished child is only known to have run within
+            # the stage if its peak is larger than before.
+            if child_rss == start_child_rss:
+                child_rss = None
+            stage = Stage(name, self.cycle, start - self._origin, wall, time.thread_time() - cpu,
+                          child_cpu_time() - child_cpu, rss, child_rss, threading.current_thread().name)
+            with self._lock:
+                self.stages.append(stage)
+
+    def summary(self):
+        '''
+        Table of the stages recorded since the last summary.
+
+        :rtype: str
+        '''
+        with self._lock:
+            stages = self.stages[self._reported:]
+            self._reported = len(self.stages)
+        lines = ['Profile of cycle %d:' % self.cycle,
+                 '  %-24s %9s %9s %9s %9s %9s' % (
+                     'Stage', 'Wall (s)', 'CPU (s)', 'Child (s)', 'RSS (MB)', 'Child MB')]
+        for stage in stages:
+            lines.append('  %-24s %9.3f %9.3f %9.3f %9s %9s' % (
+                stage.name, stage.wall, stage.cpu, stage.child_cpu, _megabytes(stage.rss),
+                _megabytes(stage.child_rss)))
+        return '\n'.join(lines)
+
+    def end_cycle(self):
+        '''
+        Print the summary of the cycle, export the trace and start the next
+        cycle.
+        '''
+        print(self.summary())
+        if self.trace_path:
+            self.export_trace(self.trace_path)
+        self.cycle += 1
+
+    def trace(self):
+        '''
+        The stages in the Chrome trace event format.
+
+        :rtype: dict
+        '''
+        pid = os.getpid()
+        with self._lock:
+            stages = list(self.stages)
+        events = []
+        for stage in stages:
+            events.append({
+                'name': stage.name,
+                'cat': 'cycle %d' % stage.cycle,
+                'ph': 'X',
+                'ts': stage.start * 1e6,
+                'dur': stage.wall * 1e6,
+                'pid': pid,
+                'tid': stage.thread,
+                'args': {'cpu': stage.cpu, 'child_cpu': stage.child_cpu, 'rss': stage.rss, 'child_rss': stage.child_rss},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_trace(self, path):
+        '''
+        Write the stages to a Chrome trace JSON file.
+        '''
+        partial_path = path + '.partial'
+        with open(partial_path, 'w') as trace_file:
+            json.dump(self.trace(), trace_file)
+        os.replace(partial_path, path)
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullProfiler(object):
+    '''
+    Profiler which records nothing.
+    '''
+    enabled = False
+
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def end_cycle(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Helpers for locating frames within ARINC 717 raw data so that parts of a file
+can be selected on frame boundaries.
+
+Raw data is expected as 12-bit words stored in little-endian 16-bit
+containers. Each subframe lasts one second and starts with a sync word, four
+subframes make a frame and superframes are made up of 16 frames. Superframes
+are located from the Superframe Counter, which counts the frames within each
+superframe.
+
+Uncompressed files can be memory mapped so that words are read by the
+operating system as they are accessed rather than loaded into memory.
+'''
+
+from __future__ import division
+
+import math
+import os
+
+import numpy as np
+
+from collections import namedtuple
+
+
+SYNC_WORDS = (0o1107, 0o2670, 0o5107, 0o6670)
+SUBFRAMES_PER_FRAME = len(SYNC_WORDS)
+FRAMES_PER_SUPERFRAME = 16
+FRAME_DURATION = SUBFRAMES_PER_FRAME  # seconds
+WORD_SIZE = 2  # bytes
+WORDS_PER_SECOND = (32, 64, 128, 256, 512, 1024, 2048)
+# Enough data to hold two frames at the highest rate.
+SYNC_SEARCH_BYTES = 2 * SUBFRAMES_PER_FRAME * max(WORDS_PER_SECOND) * WORD_SIZE * 2
+# Enough data to also hold the first superframe and one frame at the highest
+# rate, within which the Superframe Counter wraps.
+SUPERFRAME_SEARCH_BYTES = SYNC_SEARCH_BYTES + \
+    (FRAMES_PER_SUPERFRAME + 1) * SUBFRAMES_PER_FRAME * max(WORDS_PER_SECOND) * WORD_SIZE
+
+# Location of a value recorded once per frame: the subframe and word, both
+# counted from 1 with the sync word as word 1, and the most and least
+# significant bits, counted from 1.
+CounterLocation = namedtuple('CounterLocation', 'subframe word msb lsb')
+
+
+def map_words(path):
+    '''
+    Memory map an uncompressed raw data file as read-only words. A trailing
+    odd byte is ignored.
+
+    :rtype: np.ndarray
+    '''
+    size = os.path.getsize(path) // WORD_SIZE
+    if not size:
+        return np.empty(0, dtype='<u2')
+    return np.memmap(path, dtype='<u2', mode='r', shape=(size,))
+
+
+def frame_words_per_second(frame):
+    '''
+    Words per second defined by a parsed LFL frame, if available.
+
+    The rate is read from the frame's wps or words_per_second attribute.
+    Frames which have neither give None, and the rate is then detected from
+    the raw data by find_sync, which is slower but finds the same frames.
+
+    :param frame: Frame from the LFL parser (lfl_parser.frame).
+    :rtype: int or None
+    '''
+    for attr in ('wps', 'words_per_second'):
+        wps = getattr(frame, attr, None)
+        if wps:
+            return int(wps)
+    return None
+
+
+def find_sync(words, wps=None):
+    '''
+    Find the first complete frame within an array of raw data words.
+
+    :param words: Raw data words.
+    :type words: np.ndarray
+    :param wps: Words per second to try first, such as the rate defined by
+        the LFL. The other standard rates are then tried as the data may not
+        match it, for example when frame doubled.
+    :type wps: int or None
+    :returns: Index of the first word of the frame and the words per second.
+    :rtype: (int, int)
+    :raises ValueError: If a frame could not be found.
+    '''
+    words = np.asarray(words) & 0xFFF
+    rates = [wps] + [rate for rate in WORDS_PER_SECOND if rate != wps] if wps else WORDS_PER_SECOND
+    for rate in rates:
+        length = len(words) - (SUBFRAMES_PER_FRAME - 1) * rate
+        if length <= 0:
+            continue
+        matches = np.ones(length, dtype=bool)
+        for index, sync in enumerate(SYNC_WORDS):
+            matches &= words[index * rate:index * rate + length] == sync
+        found = np.flatnonzero(matches)
+        if len(found):
+            return int(found[0]), rate
+    raise ValueError('Could not find ARINC 717 sync words within raw data.')
+
+
+def locate_frames(words, wps=None):
+    '''
+    Find the first frame within raw data words and count the complete frames
+    from it.
+
+    :returns: Index of the first word of the first frame, the words per
+        second and the number of frames.
+    :rtype: (int, int, int)
+    :raises ValueError: If a frame could not be found.
+    '''
+    sync_index, wps = find_sync(words[:SYNC_SEARCH_BYTES // WORD_SIZE], wps)
+    return sync_index, wps, max(len(words) - sync_index, 0) // (SUBFRAMES_PER_FRAME * wps)
+
+
+def frame_byte_range(sync_offset, wps, frame_start, frame_stop):
+    '''
+    Byte offset and length of a range of frames.
+
+    :param sync_offset: Byte offset of the first frame.
+    :type sync_offset: int
+    :param frame_start: Index of the first frame to include.
+    :param frame_stop: Index of the frame to stop before.
+    :rtype: (int, int)
+    '''
+    frame_size = SUBFRAMES_PER_FRAME * wps * WORD_SIZE
+    offset = sync_offset + frame_start * frame_size
+    return offset, max(frame_stop - frame_start, 0) * frame_size
+
+
+def seconds_to_frames(start, stop):
+    '''
+    Range of frames which cover a time window.
+
+    :param start: Start of the window in seconds.
+    :param stop: End of the window in seconds.
+    :rtype: (int, int)
+    '''
+    return int(start // FRAME_DURATION), int(math.ceil(stop / FRAME_DURATION))
+
+
+def counter_values(words, sync_index, wps, location, frames):
+    '''
+    Values of a counter recorded once per frame within the first frames.
+    Fewer values are returned if the data ends first.
+
+    :param location: Location of the counter within each frame.
+    :type location: CounterLocation
+    :param frames: Number of frames to read the counter from.
+    :type frames: int
+    :rtype: np.ndarray
+    :raises ValueError: If the location is not within a frame.
+    '''
+    if not (1 <= location.subframe <= SUBFRAMES_PER_FRAME and 1 <= location.word <= wps
+            and 1 <= location.lsb <= location.msb <= 12):
+        raise ValueError('Superframe Counter location %s is not within a frame of %d words '
+                         'per second.' % (tuple(location), wps))
+    frame_size = SUBFRAMES_PER_FRAME * wps
+    first = sync_index + (location.subframe - 1) * wps + location.word - 1
+    values = np.asarray(words[first:first + frames * frame_size:frame_size]).astype(int) & 0xFFF
+    return (values >> (location.lsb - 1)) & ((1 << (location.msb - location.lsb + 1)) - 1)
+
+
+def first_superframe(words, sync_index, wps, location):
+    '''
+    Index of the first frame of the first complete superframe, found where
+    the Superframe Counter wraps within the first superframe and one frame.
+
+    :param location: Location of the Superframe Counter within each frame.
+    :type location: CounterLocation
+    :rtype: int
+    :raises ValueError: If the data is shorter than a superframe and one
+        frame, or the counter does not count the frames of each superframe.
+    '''
+    values = counter_values(words, sync_index, wps, location, FRAMES_PER_SUPERFRAME + 1)
+    if len(values) <= FRAMES_PER_SUPERFRAME:
+        raise ValueError('Raw data is too short to locate a superframe.')
+    wraps = np.flatnonzero(np.diff(values) != 1)
+    if len(wraps) != 1:
+        raise ValueError('Superframe Counter does not count the %d frames of each superframe: %s'
+                         % (FRAMES_PER_SUPERFRAME, values.tolist()))
+    return (int(wraps[0]) + 1) % FRAMES_PER_SUPERFRAME
+
+
+def superframes_to_frames(start, stop, first_frame=0):
+    '''
+    Range of frames which make up a range of superframes.
+
+    :param first_frame: Index of the first frame of the first complete
+        superframe (see first_superframe).
+    :type first_frame: int
+    :rtype: (int, int)
+    '''
+    return (first_frame + start * FRAMES_PER_SUPERFRAME,
+            first_frame + stop * FRAMES_PER_SUPERFRAME)
+
+
+def superframe_chunks(frame_count, first_frame, chunk_superframes):
+    '''
+    Ranges of frames which split raw data into chunks of whole superframes,
+    so that parameters decoded from each chunk can be joined. The first
+    chunk also holds the frames before the first complete superframe and
+    the last holds the frames after the last.
+
+    :param frame_count: Number of frames within the raw data.
+    :type frame_count: int
+    :param first_frame: Index of the first frame of the first complete
+        superframe (see first_superframe).
+    :type first_frame: int
+    :param chunk_superframes: Number of superframes within each chunk.
+    :type chunk_superframes: int
+    :rtype: list of (int, int)
+    '''
+    chunk_frames = chunk_superframes * FRAMES_PER_SUPERFRAME
+    stops = list(range(first_frame + chunk_frames, frame_count, chunk_frames)) + [frame_count]
+    return list(zip([0] + stops[:-1], stops))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Choosing where the scratch HDF files of each decode are written.
+
+Decoding writes HDF files which are read back once and deleted. Writing
+them to a memory-backed filesystem (tmpfs, such as /dev/shm) avoids disk
+I/O. The decoding worker processes and the plotting process share them by
+path, so the in-process h5py core driver cannot be used. Decodes estimated
+to be larger than a size limit, or than the memory free to hold them, are
+written to disk instead.
+
+Parameters decoded in memory are stored in a parameter cache on the same
+filesystem (see memory_cache_dir) rather than the cache on disk, so that
+the plot reads them from memory too.
+'''
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+from flightdataplotter.memory import MEMORY_FRACTION, available_memory
+
+
+MEMORY = 'memory'
+DISK = 'disk'
+AUTO = 'auto'
+MODES = (MEMORY, DISK, AUTO)
+SCRATCH_SIZE = 1024 ** 3  # 1 GiB
+MEMORY_DIRS = ('/dev/shm',)
+
+
+def memory_dir():
+    '''
+    A writable directory on a memory-backed filesystem, or None if there is
+    none.
+
+    :rtype: str or None
+    '''
+    for path in MEMORY_DIRS:
+        if os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK):
+            return path
+    return None
+
+
+def memory_cache_dir():
+    '''
+    Directory of the parameter cache on a memory-backed filesystem, or None
+    if there is none. It lasts until the system restarts and is limited to
+    the scratch size.
+
+    :rtype: str or None
+    '''
+    path = memory_dir()
+    if path is None:
+        return None
+    return os.path.join(path, 'FlightDataPlotter-%d' % os.getuid())
+
+
+def free_space(path):
+    '''
+    Bytes free within the filesystem of path.
+
+    :rtype: int
+    '''
+    return shutil.disk_usage(path).free
+
+
+def scratch_dir(mode, estimate, max_size=SCRATCH_SIZE, disk_dir=None, available=None):
+    '''
+    Directory to write scratch files to.
+
+    :param mode: 'memory' to write to a memory-backed filesystem, 'disk' to
+        write to disk_dir, or 'auto' to write to memory only if the files
+        also fit within the memory available to decoding.
+    :type mode: str
+    :param estimate: Estimated size of the scratch files in bytes.
+    :type estimate: int
+    :param max_size: Size above which the files are written to disk.
+    :type max_size: int
+    :param disk_dir: Directory on disk (default is the temporary directory).
+    :type disk_dir: str or None
+    :param available: Available memory in bytes for 'auto', read from the
+        system if None.
+    :type available: int or None
+    :rtype: str
+    '''
+    disk_dir = disk_dir or tempfile.gettempdir()
+    if mode == DISK:
+        return disk_dir
+    path = memory_dir()
+    if path is None:
+        if mode == MEMORY:
+            print('No memory-backed filesystem found; writing scratch files to disk.')
+        return disk_dir
+    if estimate > max_size or estimate > free_space(path):
+        print('Scratch files of about %d MB exceed the memory limit; writing them to disk.'
+              % (estimate // 1024 ** 2))
+        return disk_dir
+    if mode == AUTO:
+        if available is None:
+            available = available_memory()
+        if not available or estimate > available * MEMORY_FRACTION:
+            return disk_dir
+    return path
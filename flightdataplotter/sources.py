@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Sources of decimated line data for plotting.
+
+HDF sources read parameters directly from the HDF file with h5py so that only
+the samples covering the visible x-range are read. When zoomed out, lines are
+drawn from a min/max overview of the whole parameter which is computed once.
+'''
+
+from __future__ import division
+
+import h5py
+import numpy as np
+
+from flightdataplotter.decimate import minmax_decimate
+
+
+BLOCK_SIZE = 1024 * 1024  # samples read at a time when building overviews
+OVERVIEW_BINS = 16384
+
+
+class TimeBase(object):
+    '''
+    x-coordinates of samples in units of samples of a reference frequency,
+    taking each parameter's offset into account.
+
+    Coordinates are computed once per frequency and offset and shared between
+    parameters as views.
+    '''
+    def __init__(self, frequency):
+        '''
+        :param frequency: Reference frequency, usually the highest plotted.
+        :type frequency: float
+        '''
+        self.frequency = frequency
+        self._cache = {}
+
+    def scale(self, frequency):
+        '''
+        Distance between samples of a parameter with the given frequency.
+        '''
+        return self.frequency / frequency
+
+    def origin(self, offset):
+        '''
+        Position of the first sample of a parameter with the given offset.
+        '''
+        return offset * self.frequency
+
+    def x(self, frequency, offset, size):
+        '''
+        :returns: x-coordinates of the first size samples (read-only view).
+        :rtype: np.ndarray
+        '''
+        key = (frequency, offset)
+        x = self._cache.get(key)
+        if x is None or len(x) < size:
+            x = self.origin(offset) + np.arange(size) * self.scale(frequency)
+            x.flags.writeable = False
+            self._cache[key] = x
+        return x[:size]
+
+
+class ArraySource(object):
+    '''
+    Samples held in memory.
+    '''
+    def __init__(self, x, y):
+        '''
+        :param x: x-coordinates of the samples, increasing.
+        :type x: np.ndarray
+        :param y: Sample values.
+        :type y: np.ndarray or np.ma.MaskedArray
+        '''
+        self.x = np.asarray(x)
+        self.y = y
+
+    def read(self, xlim, n_bins):
+        '''
+        Decimated samples covering xlim.
+
+        :param xlim: Range of x to cover or None for all samples.
+        :type xlim: (float, float) or None
+        :param n_bins: Number of bins to decimate to.
+        :type n_bins: int
+        :rtype: (np.ndarray, np.ndarray)
+        '''
+        start, stop = 0, len(self.x)
+        if xlim is not None:
+            # Include a sample either side so lines reach the edges.
+            start = max(np.searchsorted(self.x, min(xlim), side='left') - 1, 0)
+            stop = min(np.searchsorted(self.x, max(xlim), side='right') + 1, len(self.x))
+        return minmax_decimate(self.x[start:stop], self.y[start:stop], n_bins)
+
+
+class HDFSource(object):
+    '''
+    Samples of a parameter within an HDF file, read on demand.
+
+    The x-coordinate of sample i is origin + i * scale.
+    '''
+    def __init__(self, hdf_path, name, size, scale=1.0, origin=0.0, masked=True,
+                 overview_bins=OVERVIEW_BINS, block_size=BLOCK_SIZE):
+        '''
+        :param size: Number of samples to use from the start of the array.
+        :type size: int
+        :param masked: Whether masked samples should be hidden.
+        :type masked: bool
+        '''
+        self.hdf_path = hdf_path
+        self.name = name
+        self.size = size
+        self.scale = scale
+        self.origin = origin
+        self.masked = masked
+        self._bin_size = max(-(-size // overview_bins), 1)
+        # Blocks are a whole number of bins so that bins do not span blocks.
+        self._block_size = max(block_size // self._bin_size, 1) * self._bin_size
+        self._overview = None
+
+    def _read(self, group, start, stop):
+        data = group['data'][start:stop]
+        if self.masked and 'mask' in group:
+            return np.ma.MaskedArray(data, mask=group['mask'][start:stop])
+        return data
+
+    def _get_overview(self):
+        '''
+        Min/max of every bin of the whole parameter as (sample indices, values).
+        '''
+        if self._overview is None:
+            indices = []
+            values = []
+            with h5py.File(self.hdf_path, 'r') as hdf:
+                group = hdf['series'][self.name]
+                for start in range(0, self.size, self._block_size):
+                    stop = min(start + self._block_size, self.size)
+                    block_indices, block_values = minmax_decimate(
+                        np.arange(start, stop), self._read(group, start, stop),
+                        -(-(stop - start) // self._bin_size))
+                    indices.append(block_indices)
+                    values.append(block_values)
+            if indices:
+                self._overview = np.concatenate(indices), np.concatenate(values)
+            else:
+                self._overview = np.empty(0), np.empty(0)
+        return self._overview
+
+    def all_masked(self):
+        '''
+        Whether the parameter has no valid samples.
+        '''
+        return bool(np.isnan(self._get_overview()[1]).all())
+
+    def read(self, xlim, n_bins):
+        '''
+        Decimated samples covering xlim.
+
+        :param xlim: Range of x to cover or None for all samples.
+        :type xlim: (float, float) or None
+        :param n_bins: Number of bins to decimate to.
+        :type n_bins: int
+        :rtype: (np.ndarray, np.ndarray)
+        '''
+        start, stop = 0, self.size
+        if xlim is not None:
+            # Include a sample either side so lines reach the edges.
+            start = int(min(max(np.floor((min(xlim) - self.origin) / self.scale) - 1, 0), self.size))
+            stop = int(min(max(np.ceil((max(xlim) - self.origin) / self.scale) + 2, start), self.size))
+
+        if self._bin_size > 2 and (stop - start) >= n_bins * self._bin_size:
+            # The overview has at least a bin per pixel for this range.
+            indices, values = self._get_overview()
+            first = np.searchsorted(indices, start, side='left')
+            last = np.searchsorted(indices, stop, side='left')
+            indices, values = minmax_decimate(indices[first:last], values[first:last], n_bins)
+        else:
+            with h5py.File(self.hdf_path, 'r') as hdf:
+                data = self._read(hdf['series'][self.name], start, stop)
+            indices, values = minmax_decimate(np.arange(start, stop), data, n_bins)
+        return self.origin + indices * self.scale, values
+
+
+class HDFParameter(object):
+    '''
+    Parameter within an HDF file whose samples are only read when required.
+    '''
+    def __init__(self, hdf_path, name, group):
+        '''
+        :param group: The parameter's group within the HDF file.
+        :type group: h5py.Group
+        '''
+        attrs = group.attrs
+        self.hdf_path = hdf_path
+        self.name = name
+        self.frequency = self.hz = float(attrs.get('frequency', 1))
+        self.offset = float(attrs.get('supf_offset', 0))
+        self.units = attrs.get('units')
+        self.data_type = attrs.get('data_type')
+        if isinstance(self.data_type, bytes):
+            self.data_type = self.data_type.decode()
+        self.values_mapping = attrs.get('values_mapping')
+        self.size = group['data'].shape[0]
+        self.dtype = group['data'].dtype
+        self._array = None
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.name)
+
+    @property
+    def array(self):
+        '''
+        All samples as a masked array, read on first access.
+        '''
+        if self._array is None:
+            with h5py.File(self.hdf_path, 'r') as hdf:
+                group = hdf['series'][self.name]
+                mask = group['mask'][:] if 'mask' in group else False
+                self._array = np.ma.MaskedArray(group['data'][:], mask=mask)
+        return self._array
+
+    def source(self, size=None, scale=1.0, origin=0.0, masked=True):
+        '''
+        :param size: Number of samples to use, defaults to all.
+        :rtype: HDFSource
+        '''
+        return HDFSource(self.hdf_path, self.name, self.size if size is None else size,
+                         scale=scale, origin=origin, masked=masked)
+
+
+def open_params(hdf_path, param_names):
+    '''
+    Open the named parameters within an HDF file without reading their
+    samples.
+
+    :returns: Parameters by name and the names which were not found.
+    :rtype: (dict, list)
+    '''
+    params = {}
+    missing = []
+    with h5py.File(hdf_path, 'r') as hdf:
+        series = hdf['series'] if 'series' in hdf else {}
+        for name in param_names:
+            if name in params or name in missing:
+                continue
+            if name in series:
+                params[name] = HDFParameter(hdf_path, name, series[name])
+            else:
+                missing.append(name)
+    return params, missing
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Watching the LFL file for saves.
+
+On Linux the directory containing the file is watched with inotify so that
+saves are noticed as soon as they happen, including editors which save by
+renaming a temporary file over the original. Elsewhere the file is polled.
+'''
+
+from __future__ import print_function
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+
+DEBOUNCE = 0.05  # seconds
+POLL_INTERVAL = 1.0  # seconds
+
+# inotify constants from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def file_signature(path):
+    '''
+    Signature of a file which changes whenever it is saved, or None if the
+    file does not exist.
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class PollWatcher(object):
+    '''
+    Detects saves by polling the file signature.
+    '''
+    def __init__(self, path, interval=POLL_INTERVAL):
+        self.path = path
+        self._interval = interval
+        self._signature = file_signature(path)
+
+    def wait(self, timeout=None):
+        '''
+        Wait for the file to be saved.
+
+        :param timeout: Seconds to wait for, or None to wait indefinitely.
+        :type timeout: float or None
+        :returns: Whether the file was saved.
+        :rtype: bool
+        '''
+        end = None if timeout is None else time.time() + timeout
+        while True:
+            signature = file_signature(self.path)
+            if signature and signature != self._signature:
+                self._signature = signature
+                return True
+            if end is not None and time.time() >= end:
+                return False
+            delay = self._interval if end is None else min(self._interval, end - time.time())
+            time.sleep(max(delay, 0))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    '''
+    Detects saves with inotify. Bursts of events from an editor are debounced
+    so that a single save is reported once the file has been completely
+    written.
+    '''
+    def __init__(self, path, debounce=DEBOUNCE):
+        self.path = path
+        self._name = os.fsencode(os.path.basename(path))
+        self._debounce = debounce
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # Watch the directory rather than the file to follow atomic renames.
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, 'inotify_add_watch failed: %s' % directory)
+
+    def _read_events(self, timeout):
+        '''
+        Whether any event for the watched file arrived within timeout.
+        '''
+        readable = select.select([self._fd], [], [], timeout)[0]
+        if not readable:
+            return False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as err:
+            if err.errno == errno.EAGAIN:
+                return False
+            raise
+        matched = False
+        offset = 0
+        while offset < len(data):
+            _wd, _mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name == self._name:
+                matched = True
+        return matched
+
+    def wait(self, timeout=None):
+        '''
+        Wait for the file to be saved.
+
+        :param timeout: Seconds to wait for, or None to wait indefinitely.
+        :type timeout: float or None
+        :returns: Whether the file was saved.
+        :rtype: bool
+        '''
+        end = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if end is None else max(end - time.time(), 0)
+            if self._read_events(remaining):
+                # Wait for the editor to finish writing.
+                while self._read_events(self._debounce):
+                    pass
+                # The file may be missing part way through a save.
+                if os.path.isfile(self.path):
+                    return True
+            elif end is not None and time.time() >= end:
+                return False
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(path):
+    '''
+    Create the most responsive watcher available on this platform.
+    '''
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError) as err:
+            print('inotify unavailable (%s); polling %s for changes.' % (err, path))
+    return PollWatcher(path)
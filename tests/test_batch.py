@@ -0,0 +1,104 @@
+################################################################################
+
+
+'''
+Tests for headless batch rendering.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import h5py
+import numpy as np
+
+from flightdataplotter.batch import expand_paths, flight_names, render_params
+from flightdataplotter.sources import HDFSource, open_params
+
+
+################################################################################
+# Test Cases
+
+
+class TestExpandPaths(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name in ('b.dat', 'a.dat', 'c.txt'):
+            open(os.path.join(self.temp_dir, name), 'wb').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_expand_paths(self):
+        path = lambda name: os.path.join(self.temp_dir, name)
+        self.assertEqual(expand_paths([path('*.dat'), path('a.dat'), path('c.txt'), path('missing.dat')]),
+                         [path('a.dat'), path('b.dat'), path('c.txt')])
+
+
+class TestFlightNames(unittest.TestCase):
+    def test_flight_names(self):
+        names = flight_names(['a/flight.dat', 'b/flight.dat', 'b/flight.raw', 'b/other.dat'])
+        self.assertEqual(len(set(names)), 4)
+        self.assertTrue(names[0].startswith('flight-'))
+        self.assertTrue(names[1].startswith('flight-'))
+        self.assertTrue(names[2].startswith('flight-'))
+        self.assertEqual(names[3], 'other')
+        self.assertEqual(flight_names(['a/flight.dat']), ['flight'])
+        # Names do not change between runs.
+        self.assertEqual(names, flight_names(['a/flight.dat', 'b/flight.dat', 'b/flight.raw', 'b/other.dat']))
+
+
+class TestRenderParams(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.hdf_path = os.path.join(self.temp_dir, 'flight.hdf5')
+        with h5py.File(self.hdf_path, 'w') as hdf:
+            series = hdf.create_group('series')
+            for name, frequency, mask in (('Altitude STD', 1, False), ('Airspeed', 2, False),
+                                          ('Heading', 1, True)):
+                group = series.create_group(name)
+                size = 600 * frequency
+                group.create_dataset('data', data=np.arange(size, dtype=float))
+                group.create_dataset('mask', data=np.full(size, mask))
+                group.attrs['frequency'] = frequency
+                group.attrs['units'] = 'kt'
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_render_params(self):
+        axes = {1: ['Altitude STD'], 2: ['Airspeed', 'Heading']}
+        params, missing = open_params(self.hdf_path, ['Altitude STD', 'Airspeed', 'Heading'])
+        image_base = os.path.join(self.temp_dir, 'flight')
+        image_paths, all_masked = render_params(params, axes, image_base, formats=('png', 'svg'))
+        self.assertEqual(image_paths, [image_base + '.png', image_base + '.svg'])
+        for image_path in image_paths:
+            self.assertGreater(os.path.getsize(image_path), 0)
+        self.assertEqual(all_masked, ['Heading'])
+        self.assertEqual(render_params(params, axes, image_base, mask_flag=True)[1], ['Heading'])
+
+    def test_parameters_read_once(self):
+        axes = {1: ['Altitude STD'], 2: ['Airspeed', 'Heading']}
+        params, missing = open_params(self.hdf_path, ['Altitude STD', 'Airspeed', 'Heading'])
+        get_overview = HDFSource._get_overview
+        read = []
+
+        def counting_overview(source):
+            if source._overview is None:
+                read.append(source.name)
+            return get_overview(source)
+
+        with mock.patch.object(HDFSource, '_get_overview', counting_overview):
+            render_params(params, axes, os.path.join(self.temp_dir, 'flight'))
+        self.assertEqual(len(read), len(set(read)))
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
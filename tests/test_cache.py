@@ -0,0 +1,272 @@
+################################################################################
+
+
+'''
+Tests for the decoded parameter cache.
+'''
+
+
+################################################################################
+# Imports
+
+
+import bz2
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import h5py
+import numpy as np
+
+from flightdataplotter.cache import (
+    DecodedParameterStore, concatenated_attrs, content_hash, decompress, evict, hash_values,
+    write_concatenated)
+
+
+################################################################################
+# Test Cases
+
+
+def write_hdf(path, names):
+    with h5py.File(path, 'w') as hdf:
+        hdf.attrs['duration'] = 64
+        series = hdf.create_group('series')
+        for index, name in enumerate(names):
+            group = series.create_group(name)
+            group.create_dataset('data', data=np.arange(64) * (index + 1))
+            group.create_dataset('mask', data=np.zeros(64, dtype=bool))
+            group.attrs['frequency'] = 1
+
+
+class TestDecodedParameterStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(self.data_path, 'wb') as data:
+            data.write(b'\x00' * 1024)
+        self.store = DecodedParameterStore(
+            self.data_path, store_dir=os.path.join(self.temp_dir, 'store'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_key(self):
+        frame = {'Frame': {'Name': 'Test'}}
+        key = self.store.key({'Rate': '1', 'Scale': '2'}, frame, {})
+        self.assertEqual(key, self.store.key({'Scale': '2', 'Rate': '1'}, frame, {}))
+        self.assertNotEqual(key, self.store.key({'Rate': '1', 'Scale': '3'}, frame, {}))
+        self.assertNotEqual(key, self.store.key({'Rate': '1', 'Scale': '2'}, frame, {'Frame Doubled': True}))
+        self.assertNotEqual(key, self.store.key({'Rate': '1', 'Scale': '2'}, {'Frame': {'Name': 'Other'}}, {}))
+
+    def test_add_and_build(self):
+        decode_path = os.path.join(self.temp_dir, 'decode.hdf5')
+        write_hdf(decode_path, ['Altitude STD', 'Airspeed'])
+        keys = {'Altitude STD': hash_values('a'), 'Airspeed': hash_values('b'), 'Heading': hash_values('c')}
+        self.assertTrue(self.store.add(keys['Altitude STD'], decode_path, 'Altitude STD'))
+        self.assertTrue(self.store.add(keys['Airspeed'], decode_path, 'Airspeed'))
+        self.assertFalse(self.store.add(keys['Heading'], decode_path, 'Heading'))
+        self.assertIn(keys['Airspeed'], self.store)
+        self.assertNotIn(keys['Heading'], self.store)
+
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        self.assertEqual(self.store.build(output_path, keys), ['Airspeed', 'Altitude STD'])
+        with h5py.File(output_path, 'r') as hdf:
+            self.assertEqual(hdf.attrs['duration'], 64)
+            self.assertEqual(sorted(hdf['series']), ['Airspeed', 'Altitude STD'])
+            np.testing.assert_array_equal(hdf['series']['Airspeed']['data'][:], np.arange(64) * 2)
+            self.assertIsInstance(hdf['series'].get('Airspeed', getlink=True), h5py.ExternalLink)
+
+        self.store.build(output_path, keys, link=False)
+        with h5py.File(output_path, 'r') as hdf:
+            self.assertIsInstance(hdf['series'].get('Airspeed', getlink=True), h5py.HardLink)
+            np.testing.assert_array_equal(hdf['series']['Altitude STD']['data'][:], np.arange(64))
+
+    def test_build_chunks(self):
+        chunk_paths = [os.path.join(self.temp_dir, 'chunk%d.hdf5' % i) for i in range(3)]
+        for chunk_path in chunk_paths:
+            write_hdf(chunk_path, ['Airspeed'])
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        self.assertEqual(self.store.build(output_path, {}, chunks={'Airspeed': chunk_paths}), ['Airspeed'])
+        with h5py.File(output_path, 'r') as hdf:
+            # The file describes the whole of the chunks.
+            self.assertEqual(hdf.attrs['duration'], 192)
+            group = hdf['series']['Airspeed']
+            self.assertTrue(group['data'].is_virtual)
+            self.assertEqual(group.attrs['frequency'], 1)
+            np.testing.assert_array_equal(group['data'][:], np.tile(np.arange(64), 3))
+            self.assertEqual(group['mask'].shape, (192,))
+
+    def test_add_concatenated(self):
+        chunk_paths = [os.path.join(self.temp_dir, 'chunk%d.hdf5' % i) for i in range(3)]
+        for chunk_path in chunk_paths:
+            write_hdf(chunk_path, ['Altitude STD', 'Airspeed'])
+        key = hash_values('b')
+        self.store.add_concatenated(key, chunk_paths, 'Airspeed')
+        # The entry holds the samples rather than referring to the chunks.
+        for chunk_path in chunk_paths:
+            os.remove(chunk_path)
+        self.assertEqual(os.listdir(self.store.store_dir), [os.path.basename(self.store.find(key))])
+        with h5py.File(self.store.find(key), 'r') as hdf:
+            self.assertEqual(hdf.attrs['duration'], 192)
+            group = hdf['series']['Airspeed']
+            self.assertFalse(group['data'].is_virtual)
+            self.assertEqual(group.attrs['frequency'], 1)
+            np.testing.assert_array_equal(group['data'][:], np.tile(np.arange(64) * 2, 3))
+            self.assertEqual(group['mask'].shape, (192,))
+
+    def test_memory_store(self):
+        memory_cache_dir = os.path.join(self.temp_dir, 'memory')
+        store = DecodedParameterStore(
+            self.data_path, store_dir=os.path.join(self.temp_dir, 'store'), memory_cache_dir=memory_cache_dir)
+        decode_path = os.path.join(self.temp_dir, 'decode.hdf5')
+        write_hdf(decode_path, ['Altitude STD', 'Airspeed'])
+        keys = {'Altitude STD': hash_values('a'), 'Airspeed': hash_values('b')}
+        self.assertTrue(store.add(keys['Airspeed'], decode_path, 'Airspeed', memory=True))
+        self.assertTrue(store.add(keys['Altitude STD'], decode_path, 'Altitude STD'))
+        self.assertTrue(store.find(keys['Airspeed']).startswith(memory_cache_dir))
+        self.assertTrue(store.find(keys['Altitude STD']).startswith(store.store_dir))
+        self.assertIsNone(store.find(hash_values('c')))
+
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        self.assertEqual(store.build(output_path, keys), ['Airspeed', 'Altitude STD'])
+        with h5py.File(output_path, 'r') as hdf:
+            link = hdf['series'].get('Airspeed', getlink=True)
+            self.assertEqual(link.filename, store.find(keys['Airspeed']))
+            np.testing.assert_array_equal(hdf['series']['Airspeed']['data'][:], np.arange(64) * 2)
+
+
+class TestWriteConcatenated(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_write_concatenated(self):
+        chunk_paths = [os.path.join(self.temp_dir, 'chunk%d.hdf5' % i) for i in range(2)]
+        for chunk_path in chunk_paths:
+            write_hdf(chunk_path, ['Altitude STD', 'Airspeed'])
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        with h5py.File(output_path, 'w') as hdf:
+            write_concatenated(hdf.create_group('series'), 'Airspeed', chunk_paths)
+        with h5py.File(output_path, 'r') as hdf:
+            group = hdf['series']['Airspeed']
+            self.assertTrue(group['data'].is_virtual)
+            self.assertEqual(group.attrs['frequency'], 1)
+            np.testing.assert_array_equal(group['data'][:], np.tile(np.arange(64) * 2, 2))
+
+    def test_concatenated_attrs(self):
+        chunk_paths = [os.path.join(self.temp_dir, 'chunk%d.hdf5' % i) for i in range(3)]
+        for chunk_path in chunk_paths:
+            write_hdf(chunk_path, ['Airspeed'])
+        with h5py.File(chunk_paths[0], 'a') as hdf:
+            hdf.attrs['start_datetime'] = 1000
+        with h5py.File(chunk_paths[2], 'a') as hdf:
+            hdf.attrs['duration'] = 20
+        attrs = concatenated_attrs(chunk_paths)
+        self.assertEqual(attrs['duration'], 148)
+        self.assertEqual(attrs['start_datetime'], 1000)
+
+
+class TestContentHash(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_content_hash(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        paths = [os.path.join(self.temp_dir, name) for name in ('a.dat', 'b.dat')]
+        for path in paths:
+            with open(path, 'wb') as data:
+                data.write(b'\x01' * 4096)
+        digest = content_hash(paths[0], cache_dir)
+        self.assertEqual(content_hash(paths[1], cache_dir), digest)
+        # The hash is remembered rather than read again.
+        self.assertEqual(len(os.listdir(os.path.join(cache_dir, 'hashes'))), 2)
+        self.assertEqual(content_hash(paths[0], cache_dir), digest)
+
+
+class TestEvict(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def write_entry(self, store_name, key, size, mtime):
+        store_dir = os.path.join(self.cache_dir, 'params', store_name)
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+        path = os.path.join(store_dir, key + '.hdf5')
+        with open(path, 'wb') as entry:
+            entry.write(b'\x00' * size)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_evict(self):
+        now = time.time()
+        oldest = self.write_entry('flight1', 'a', 100, now - 300)
+        newest = self.write_entry('flight1', 'b', 100, now)
+        in_use = self.write_entry('flight2', 'c', 100, now - 600)
+        other = self.write_entry('flight3', 'd', 100, now - 200)
+        removed = evict(self.cache_dir, 200, keep=[os.path.dirname(in_use)])
+        self.assertEqual(removed, 200)
+        self.assertFalse(os.path.exists(oldest))
+        self.assertFalse(os.path.exists(os.path.dirname(other)))
+        self.assertTrue(os.path.exists(newest))
+        self.assertTrue(os.path.exists(in_use))
+        self.assertEqual(evict(self.cache_dir, 200), 0)
+
+    def test_evict_keep_entries(self):
+        now = time.time()
+        oldest = self.write_entry('flight1', 'a', 100, now - 300)
+        newest = self.write_entry('flight1', 'b', 100, now)
+        in_use = self.write_entry('flight1', 'c', 100, now - 600)
+        self.assertEqual(evict(self.cache_dir, 200, keep=[in_use]), 100)
+        self.assertFalse(os.path.exists(oldest))
+        self.assertTrue(os.path.exists(newest))
+        self.assertTrue(os.path.exists(in_use))
+
+
+class TestDecompress(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_bz2(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with bz2.BZ2File(path, 'wb') as data:
+            data.write(content)
+        return path
+
+    def test_decompress(self):
+        opened = []
+
+        def open_func(path):
+            opened.append(path)
+            return bz2.BZ2File(path, 'rb')
+
+        src_path = self.write_bz2('flight.bz2', b'\x01\x02' * 1000)
+        dest_path = decompress(src_path, open_func, cache_dir=self.cache_dir)
+        with open(dest_path, 'rb') as data:
+            self.assertEqual(data.read(), b'\x01\x02' * 1000)
+        self.assertEqual(decompress(src_path, open_func, cache_dir=self.cache_dir), dest_path)
+        self.assertEqual(opened, [src_path])
+
+        # The least recently used copy is removed when over the size limit.
+        other_path = self.write_bz2('other.bz2', b'\x03' * 2000)
+        os.utime(dest_path, (time.time() - 60, time.time() - 60))
+        other_dest_path = decompress(other_path, open_func, cache_dir=self.cache_dir, max_size=3000)
+        self.assertTrue(os.path.isfile(other_dest_path))
+        self.assertFalse(os.path.exists(dest_path))
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
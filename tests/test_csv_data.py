@@ -0,0 +1,111 @@
+################################################################################
+
+
+'''
+Tests for reading parameters directly from CSV files.
+'''
+
+
+################################################################################
+# Imports
+
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from flightdataplotter.csv_data import find_header, parse_seconds, read_csv, sample_rate
+
+
+################################################################################
+# Test Cases
+
+
+CSV = '''#airframe_info, log_version="1.00"
+#yyy-mm-dd, hh:mm:ss,    ft, kt, deg
+Lcl Date, Lcl Time, AltB, IAS, HDG
+2019-01-01, 10:00:00, 1000, 120, 90
+2019-01-01, 10:00:01, 1010, , 91
+
+2019-01-01, 10:00:02, 1020, 122, 92
+2019-01-01, 10:00:03, 1030, 123, ---
+'''
+
+
+class TestFindHeader(unittest.TestCase):
+    def test_find_header(self):
+        lines = CSV.splitlines()
+        self.assertEqual(find_header(lines, ['IAS'])[0], 2)
+        self.assertEqual(find_header(lines, ['IAS'])[1][:3], ['Lcl Date', 'Lcl Time', 'AltB'])
+        self.assertRaises(ValueError, find_header, lines, ['Airspeed'])
+
+
+class TestReadCSV(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, 'flight.csv')
+        with open(self.csv_path, 'w') as csv_file:
+            csv_file.write(CSV)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_csv(self):
+        for chunk_size in (1, 40, 100000):
+            params, missing = read_csv(
+                self.csv_path, ['IAS', 'HDG', 'IAS', 'Altitude STD'], frequency=2.0, chunk_size=chunk_size)
+            self.assertEqual(sorted(params), ['HDG', 'IAS'])
+            self.assertEqual(missing, ['Altitude STD'])
+            ias = params['IAS'].array
+            np.testing.assert_array_equal(ias.data[~ias.mask], [120, 122, 123])
+            np.testing.assert_array_equal(ias.mask, [False, True, False, False])
+            np.testing.assert_array_equal(params['HDG'].array.mask, [False, False, False, True])
+            self.assertEqual(params['HDG'].frequency, 2.0)
+        self.assertEqual(read_csv(self.csv_path, ['IAS'])[0]['IAS'].frequency, 1.0)
+
+    def test_wrong_field_count(self):
+        with open(self.csv_path, 'w') as csv_file:
+            csv_file.write('Time,IAS,HDG\n0,120,90\n1,121\n2,122,92,extra\n3,123,93\n')
+        params, _missing = read_csv(self.csv_path, ['IAS', 'HDG'], chunk_size=12)
+        # Rows with the wrong number of fields are masked rather than
+        # dropped, so later samples keep their time.
+        ias = params['IAS'].array
+        np.testing.assert_array_equal(ias.mask, [False, True, True, False])
+        self.assertEqual(ias[3], 123)
+
+    def test_quoted_and_skipped_rows(self):
+        with io.open(self.csv_path, 'w', encoding='utf-8') as csv_file:
+            csv_file.write(u'Time,IAS,Name\n0,"120",caf\u00e9\n   \n#note\n1,121,x\r\n2,n/a,y')
+        ias = read_csv(self.csv_path, ['IAS'])[0]['IAS'].array
+        np.testing.assert_array_equal(ias.data[:2], [120, 121])
+        np.testing.assert_array_equal(ias.mask, [False, False, True])
+
+    def test_time_column(self):
+        params, _missing = read_csv(self.csv_path, ['IAS'], time_column='Lcl Time')
+        self.assertEqual(params['IAS'].frequency, 1.0)
+        # An explicit frequency is used as is.
+        params, _missing = read_csv(self.csv_path, ['IAS'], frequency=4.0, time_column='Lcl Time')
+        self.assertEqual(params['IAS'].frequency, 4.0)
+        self.assertRaises(ValueError, read_csv, self.csv_path, ['IAS'], time_column='Time')
+
+
+class TestSampleRate(unittest.TestCase):
+    def test_parse_seconds(self):
+        self.assertEqual(parse_seconds('12.5'), 12.5)
+        self.assertEqual(parse_seconds(' 10:00:01.5'), 36001.5)
+        self.assertEqual(parse_seconds('"01:02"'), 62)
+        self.assertRaises(ValueError, parse_seconds, 'noon')
+
+    def test_sample_rate(self):
+        self.assertEqual(sample_rate(['0', '0.25', '0.5', 'bad', '0.75']), 4.0)
+        # Repeated timestamps and gaps do not change the median interval.
+        self.assertEqual(sample_rate(['10:00:00', '10:00:00', '10:00:01', '10:00:02', '10:00:10']), 1.0)
+        self.assertRaises(ValueError, sample_rate, ['0', '0'])
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,74 @@
+################################################################################
+
+
+'''
+Tests for decimating lines for plotting.
+'''
+
+
+################################################################################
+# Imports
+
+
+import unittest
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from flightdataplotter.decimate import DecimatedLine, minmax_decimate
+from flightdataplotter.sources import ArraySource
+
+
+################################################################################
+# Test Cases
+
+
+class TestMinmaxDecimate(unittest.TestCase):
+    def test_short_array_unchanged(self):
+        x, y = minmax_decimate(np.arange(10), np.ma.arange(10), 5)
+        np.testing.assert_array_equal(x, np.arange(10))
+        np.testing.assert_array_equal(y, np.arange(10))
+
+    def test_envelope(self):
+        y = np.sin(np.linspace(0, 20, 100000))
+        y[54321] = 50
+        x, decimated = minmax_decimate(np.arange(len(y)), y, 100)
+        self.assertLessEqual(len(decimated), 200)
+        self.assertEqual(decimated.max(), 50)
+        self.assertIn(54321, x)
+        self.assertAlmostEqual(decimated.min(), y.min())
+        self.assertTrue(np.all(np.diff(x) >= 0))
+
+    def test_masked_gap(self):
+        y = np.ma.arange(10000, dtype=float)
+        y[2000:4000] = np.ma.masked
+        x, decimated = minmax_decimate(np.arange(len(y)), y, 100)
+        gap = np.isnan(decimated)
+        self.assertTrue(gap.any())
+        self.assertTrue(np.all((x[gap] >= 2000) & (x[gap] < 4000)))
+        self.assertFalse(np.isnan(decimated[x >= 4000]).any())
+
+    def test_uneven_bins(self):
+        y = np.arange(1001)
+        x, decimated = minmax_decimate(y * 2, y, 10)
+        self.assertEqual(decimated[-1], 1000)
+        self.assertEqual(x[-1], 2000)
+
+
+class TestDecimatedLine(unittest.TestCase):
+    def test_zoom(self):
+        fig, axis = plt.subplots(figsize=(4, 3), dpi=100)
+        y = np.random.RandomState(0).normal(size=1000000)
+        line = DecimatedLine(axis, ArraySource(np.arange(len(y)), y), label='Test')
+        self.assertLessEqual(len(line.line.get_xdata()), 2 * axis.bbox.width)
+        axis.set_xlim(1000, 1100)
+        xdata = line.line.get_xdata()
+        np.testing.assert_array_equal(xdata, np.arange(999, 1102))
+        plt.close(fig)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
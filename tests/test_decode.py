@@ -0,0 +1,76 @@
+################################################################################
+
+
+'''
+Tests for decoding within worker processes.
+'''
+
+
+################################################################################
+# Imports
+
+
+import multiprocessing
+import os
+import time
+import unittest
+
+from flightdataplotter.decode import DecodeCancelled, map_cancellable, partition
+
+
+################################################################################
+# Test Cases
+
+
+def slow_add(a, b, delay):
+    time.sleep(delay)
+    return a + b
+
+
+def worker_pid(delay):
+    time.sleep(delay)
+    return os.getpid()
+
+
+def fail():
+    raise KeyError('Altitude STD')
+
+
+class TestPartition(unittest.TestCase):
+    def test_partition(self):
+        self.assertEqual(partition(['d', 'a', 'c', 'b', 'e'], 2), [['a', 'c', 'e'], ['b', 'd']])
+        self.assertEqual(partition(['a'], 4), [['a']])
+        self.assertEqual(partition([], 4), [])
+
+
+class TestMapCancellable(unittest.TestCase):
+    def test_results(self):
+        args_list = [(i, i, 0.1) for i in range(4)]
+        self.assertEqual(map_cancellable(slow_add, args_list, lambda timeout: False), [0, 2, 4, 6])
+        self.assertEqual(map_cancellable(slow_add, args_list, processes=2), [0, 2, 4, 6])
+
+    def test_exception(self):
+        self.assertRaises(KeyError, map_cancellable, fail, [()])
+
+    def test_cancel(self):
+        start = time.time()
+        self.assertRaises(DecodeCancelled, map_cancellable, slow_add, [(1, 2, 30)] * 2,
+                          lambda timeout: time.time() - start > 0.2)
+        self.assertLess(time.time() - start, 5)
+
+    def test_pool(self):
+        pool = multiprocessing.Pool(processes=1)
+        try:
+            pids = map_cancellable(worker_pid, [(0,), (0,)], pool=pool)
+            # The worker is kept for later calls.
+            self.assertEqual(map_cancellable(worker_pid, [(0,)], pool=pool), pids[:1])
+            self.assertRaises(KeyError, map_cancellable, fail, [()], pool=pool)
+            # The pool is terminated by a failure.
+            self.assertRaises(ValueError, pool.apply_async, worker_pid, (0,))
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -9,8 +9,28 @@
 # Imports
 
 
+import bz2
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
+import h5py
+import numpy as np
+
+from unittest import mock
+
+from flightdataplotter.plot_params import (
+    CSV_TYPES, ERROR, EXIT, PARTIAL, PROCESSED, PROGRESS, ProcessAndPlotLoops, _copy_part, _zero_copy, copy_file_part,
+    copy_frame_part, create_parser, format_progress)
+
+from flightdataplotter import raw_data
+from flightdataplotter.cache import DecodedParameterStore
+from tests.test_raw_data import COUNTER, make_frames, set_counter
+
 
 ################################################################################
 # Test Cases
@@ -28,5 +48,265 @@ class TestFlightDataPlotter(unittest.TestCase):
         pass
 
 
+class TestCreateParser(unittest.TestCase):
+    def test_csv_type(self):
+        parser = create_parser()
+        self.assertEqual(parser.parse_args(['--csv', 'generic']).csv_type, 'generic')
+        self.assertIn('hfdm', CSV_TYPES)
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertRaises(SystemExit, parser.parse_args, ['--csv', 'foo'])
+
+
+class TestFormatProgress(unittest.TestCase):
+    def test_format_progress(self):
+        self.assertEqual(format_progress(0.25, 95), '[#####---------------]  25% ETA 1:35')
+        self.assertEqual(format_progress(1, 0), '[####################] 100% ETA 0:00')
+
+
+class TestWaitCancel(unittest.TestCase):
+    def test_without_watcher(self):
+        loops = ProcessAndPlotLoops('output.hdf5', False, 'test.lfl', None)
+        start = time.time()
+        self.assertFalse(loops._wait_cancel(0.1))
+        # The timeout is waited rather than returning at once.
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        loops.exit_loop.set()
+        self.assertTrue(loops._wait_cancel(10))
+
+
+class TestRun(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lfl_path = os.path.join(self.temp_dir, 'test.lfl')
+        open(self.lfl_path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_unexpected_error(self):
+        def process():
+            raise OSError(28, 'No space left on device')
+
+        loops = ProcessAndPlotLoops('output.hdf5', False, self.lfl_path, process)
+        with contextlib.redirect_stderr(io.StringIO()):
+            loops.run()
+        self.assertTrue(loops.exit_loop.is_set())
+        # The plotting loop is told of the error and then to exit.
+        self.assertEqual([event.kind for event in loops._next_events(block=False)], [ERROR, EXIT])
+
+
+    def test_previews_removed(self):
+        preview_dir = tempfile.mkdtemp(dir=self.temp_dir)
+
+        def process():
+            # The output may refer to the chunks of a failed decode.
+            loops._preview_dirs.append(preview_dir)
+            raise OSError(28, 'No space left on device')
+
+        loops = ProcessAndPlotLoops('output.hdf5', False, self.lfl_path, process)
+        with contextlib.redirect_stderr(io.StringIO()):
+            loops.run()
+        self.assertFalse(os.path.exists(preview_dir))
+
+
+def decode_counter(lfl_path, data_path, output_path, param_names, aircraft_info, superframes_in_memory):
+    '''
+    Stands in for decode_params, decoding the Superframe Counter of each frame
+    of data written by make_frames at 64 words per second.
+    '''
+    words = np.fromfile(data_path, dtype='<u2')
+    values = raw_data.counter_values(words, 0, 64, COUNTER, len(words) // 256)
+    with h5py.File(output_path, 'w') as hdf:
+        hdf.attrs['duration'] = len(values) * 4
+        group = hdf.create_group('series').create_group('Superframe Counter')
+        group.create_dataset('data', data=values)
+        group.create_dataset('mask', data=np.zeros(len(values), dtype=bool))
+        group.attrs['frequency'] = 0.25
+    return list(param_names)
+
+
+class TestDecodeProgressive(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        # The counter first wraps after the fifth frame.
+        self.words = set_counter(make_frames(64, 40, lead=5), 64, COUNTER, 11, lead=5)
+        self.data_path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(self.data_path, 'wb') as data:
+            data.write(self.words.astype('<u2').tobytes())
+        self.output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        self.loops = ProcessAndPlotLoops(self.output_path, False, 'test.lfl', None)
+        self.loops._param_store = DecodedParameterStore(
+            self.data_path, store_dir=os.path.join(self.temp_dir, 'store'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_chunks_joined(self):
+        chunks = raw_data.superframe_chunks(40, 5, 1)
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        with mock.patch('flightdataplotter.plot_params.decode_params', decode_counter), \
+                contextlib.redirect_stdout(io.StringIO()):
+            sources = self.loops._decode_progressive(
+                'test.lfl', self.data_path, self.output_path, work_dir, chunks,
+                [['Superframe Counter']], {'Superframe Counter': 'key'}, {}, {}, -1)
+        self.assertEqual([event.kind for event in self.loops._events.queue], [PARTIAL] * len(chunks))
+        paths = sources['Superframe Counter']
+        self.assertEqual(len(paths), len(chunks))
+        # Each chunk after the first starts a superframe.
+        for path in paths[1:]:
+            with h5py.File(path, 'r') as hdf:
+                self.assertEqual(hdf['series']['Superframe Counter']['data'][0], 0)
+
+        self.loops._param_store.add_concatenated('key', paths, 'Superframe Counter')
+        with h5py.File(self.loops._param_store.find('key'), 'r') as hdf:
+            self.assertEqual(hdf.attrs['duration'], 160)
+            np.testing.assert_array_equal(hdf['series']['Superframe Counter']['data'][:],
+                                          raw_data.counter_values(self.words, 5, 64, COUNTER, 40))
+
+
+class TestNextEvents(unittest.TestCase):
+    def test_superseded_results(self):
+        loops = ProcessAndPlotLoops('output.hdf5', False, 'test.lfl', None)
+        loops._send_event(PARTIAL, ('output.hdf5', {}, '10%'))
+        loops._send_event(PROGRESS, 'Processing params')
+        loops._send_event(PARTIAL, ('output.hdf5', {}, '20%'))
+        self.assertEqual([event.kind for event in loops._next_events()], [PROGRESS, PARTIAL])
+        loops._send_event(PARTIAL, ('output.hdf5', {}, '30%'))
+        loops._send_event(PROCESSED, ('output.hdf5', {}))
+        self.assertEqual([event.kind for event in loops._next_events()], [PROCESSED])
+
+
+def slice_part(data, percent_start, percent_stop):
+    '''
+    The part of data copied by copy_file_part before it streamed the data.
+    '''
+    offset = int(percent_start * len(data) / 100.0)
+    if offset % 2:
+        offset += 1
+    amount = int(percent_stop * len(data) / 100.0) - offset
+    if amount % 2:
+        amount -= 1
+    return data[offset:offset + amount]
+
+
+class InterruptedFile(object):
+    '''
+    A file which fails after its first read.
+    '''
+    def __init__(self, data):
+        self.file = io.BytesIO(data)
+        self.reads = 0
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def read(self, size):
+        self.reads += 1
+        if self.reads > 1:
+            raise IOError('Interrupted')
+        return self.file.read(size)
+
+
+class TestCopyFilePart(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data = bytes(bytearray(i % 251 for i in range(10001)))
+        self.src_path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(self.src_path, 'wb') as src:
+            src.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_slice_semantics(self):
+        for percent_start, percent_stop in ((0, 100), (13, 57), (33, 34), (50, 100), (99, 100)):
+            dest_path = copy_file_part(self.src_path, percent_start, percent_stop)
+            part = self.read(dest_path)
+            self.assertEqual(part, slice_part(self.data, percent_start, percent_stop))
+            # The part is whole words long.
+            self.assertEqual(len(part) % 2, 0)
+            os.remove(dest_path)
+
+    def test_small_buffer(self):
+        dest_path = copy_file_part(self.src_path, 13, 57, buffer_size=7)
+        self.assertEqual(self.read(dest_path), slice_part(self.data, 13, 57))
+
+    def test_dest_dir_and_name(self):
+        dest_dir = os.path.join(self.temp_dir, 'parts')
+        os.mkdir(dest_dir)
+        dest_path = copy_file_part(self.src_path, 13, 57, dest_dir=dest_dir, name='original')
+        self.assertEqual(dest_path, os.path.join(dest_dir, 'original_13-57.dat'))
+        self.assertEqual(self.read(dest_path), slice_part(self.data, 13, 57))
+
+    def test_zero_copy(self):
+        dest_path = os.path.join(self.temp_dir, 'dest.dat')
+        with open(self.src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+            copied = _zero_copy(src, dest, 100, 5000)
+        # Where no zero-copy method is available nothing is copied.
+        self.assertIn(copied, (0, 5000))
+        self.assertEqual(self.read(dest_path), self.data[100:100 + copied])
+
+    def test_compressed(self):
+        bz2_path = os.path.join(self.temp_dir, 'flight.bz2')
+        with bz2.open(bz2_path, 'wb') as compressed:
+            compressed.write(self.data)
+        dest_path = os.path.join(self.temp_dir, 'dest.dat')
+        with bz2.open(bz2_path, 'rb') as src:
+            _copy_part(src, True, dest_path, 1000, 3000, buffer_size=7)
+        self.assertEqual(self.read(dest_path), self.data[1000:4000])
+
+    def test_interrupted_copy_not_reused(self):
+        dest_path = os.path.join(self.temp_dir, 'flight_0-100.dat')
+        with self.assertRaises(IOError):
+            _copy_part(InterruptedFile(self.data), True, dest_path, 0, 10000, buffer_size=100)
+        self.assertFalse(os.path.exists(dest_path))
+        self.assertTrue(os.path.exists(dest_path + '.partial'))
+        self.assertEqual(self.read(copy_file_part(self.src_path, 0, 100)), slice_part(self.data, 0, 100))
+        self.assertFalse(os.path.exists(dest_path + '.partial'))
+
+
+class TestCopyFramePart(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.words = set_counter(make_frames(64, 40, lead=5), 64, COUNTER, 11, lead=5)
+        self.src_path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(self.src_path, 'wb') as src:
+            src.write(self.words.astype('<u2').tobytes())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def read_words(self, path):
+        with open(path, 'rb') as f:
+            return np.frombuffer(f.read(), dtype='<u2')
+
+    def test_frames(self):
+        dest_path = copy_frame_part(self.src_path, 2, 4)
+        np.testing.assert_array_equal(self.read_words(dest_path), self.words[5 + 2 * 256:5 + 4 * 256])
+
+    def test_superframes(self):
+        # The counter first wraps after the fifth frame.
+        dest_path = copy_frame_part(self.src_path, 16, 32, ext='_sf1-2.dat', counter=COUNTER)
+        part = self.read_words(dest_path)
+        np.testing.assert_array_equal(part, self.words[5 + 21 * 256:5 + 37 * 256])
+        self.assertEqual(set_counter(part.copy(), 64, COUNTER, 0).tolist(), part.tolist())
+
+    def test_superframes_compressed(self):
+        bz2_path = os.path.join(self.temp_dir, 'flight.bz2')
+        with bz2.open(bz2_path, 'wb') as compressed:
+            compressed.write(self.words.astype('<u2').tobytes())
+        with mock.patch('flightdataplotter.plot_params._open_source',
+                        return_value=(bz2.open(bz2_path, 'rb'), True)):
+            dest_path = copy_frame_part(self.src_path, 0, 16, ext='_sf0-1.dat', counter=COUNTER)
+        np.testing.assert_array_equal(self.read_words(dest_path), self.words[5 + 5 * 256:5 + 21 * 256])
+
+    def test_after_last_frame(self):
+        self.assertRaises(ValueError, copy_frame_part, self.src_path, 40, 50)
+
+
 ################################################################################
 # vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,116 @@
+################################################################################
+
+
+'''
+Tests for the dataset layouts of decoded parameters.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from flightdataplotter.cache import DecodedParameterStore, hash_values
+from flightdataplotter.hdf_profile import PROFILES, SUPERFRAME_DURATION, HDFProfile
+
+
+################################################################################
+# Test Cases
+
+
+def write_hdf(path, size=10000):
+    with h5py.File(path, 'w') as hdf:
+        hdf.attrs['duration'] = size // 4
+        group = hdf.create_group('series').create_group('Airspeed')
+        group.create_dataset('data', data=np.arange(size, dtype=np.float64))
+        group.create_dataset('mask', data=np.arange(size) % 7 == 0)
+        group['data'].attrs['units'] = 'kt'
+        group.attrs['frequency'] = 4.0
+
+
+class TestHDFProfile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.src_path = os.path.join(self.temp_dir, 'src.hdf5')
+        write_hdf(self.src_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_dataset_options(self):
+        profile = PROFILES['lzf']
+        self.assertEqual(profile.dataset_options(100000, 4.0), {
+            'chunks': (4 * SUPERFRAME_DURATION * 16,), 'compression': 'lzf', 'shuffle': True})
+        # Chunks are no larger than the dataset.
+        self.assertEqual(profile.dataset_options(10, 4.0)['chunks'], (10,))
+        self.assertEqual(PROFILES['gzip'].dataset_options(100000, 0.25)['compression_opts'], 1)
+        self.assertEqual(PROFILES['none'].dataset_options(100000, 1.0), {'chunks': (1024,)})
+        self.assertEqual(PROFILES['native'].dataset_options(100000, 1.0), {})
+        self.assertEqual(profile.dataset_options(0, 1.0), {})
+
+    def test_copy_params(self):
+        for name, profile in sorted(PROFILES.items()):
+            path = os.path.join(self.temp_dir, name + '.hdf5')
+            with h5py.File(self.src_path, 'r') as src, profile.open(path) as dest:
+                profile.copy_params(dest, src['series'].items())
+            with h5py.File(path, 'r') as hdf:
+                group = hdf['series']['Airspeed']
+                self.assertEqual(group.attrs['frequency'], 4.0)
+                self.assertEqual(group['data'].attrs['units'], 'kt')
+                np.testing.assert_array_equal(group['data'][:], np.arange(10000))
+                np.testing.assert_array_equal(group['mask'][:], np.arange(10000) % 7 == 0)
+                self.assertEqual(group['data'].compression, profile.compression, name)
+                if not profile.native:
+                    self.assertEqual(group['data'].chunks, (4096,), name)
+
+
+class TestStoreProfile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(self.data_path, 'wb') as data:
+            data.write(b'\x00' * 1024)
+        self.decode_path = os.path.join(self.temp_dir, 'decode.hdf5')
+        write_hdf(self.decode_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_store_profile(self):
+        store_dir = os.path.join(self.temp_dir, 'store')
+        key = hash_values('a')
+        native = DecodedParameterStore(self.data_path, store_dir=store_dir)
+        lzf = DecodedParameterStore(self.data_path, store_dir=store_dir, profile=PROFILES['lzf'])
+        lzf.add(key, self.decode_path, 'Airspeed')
+        # Entries of another layout are not used.
+        self.assertIn(key, lzf)
+        self.assertNotIn(key, native)
+
+        for link in (True, False):
+            output_path = os.path.join(self.temp_dir, 'output.hdf5')
+            self.assertEqual(lzf.build(output_path, {'Airspeed': key}, link=link), ['Airspeed'])
+            with h5py.File(output_path, 'r') as hdf:
+                data = hdf['series']['Airspeed']['data']
+                self.assertEqual(data.compression, 'lzf')
+                np.testing.assert_array_equal(data[:], np.arange(10000))
+
+    def test_custom_profile(self):
+        profile = HDFProfile('small', chunk_superframes=1)
+        store = DecodedParameterStore(
+            self.data_path, store_dir=os.path.join(self.temp_dir, 'store'), profile=profile)
+        store.add(hash_values('a'), self.decode_path, 'Airspeed')
+        with h5py.File(store._path(hash_values('a')), 'r') as hdf:
+            self.assertEqual(hdf['series']['Airspeed']['data'].chunks, (256,))
+            self.assertIsNone(hdf['series']['Airspeed']['data'].compression)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,89 @@
+################################################################################
+
+
+'''
+Tests for reading plot configuration from LFL files.
+'''
+
+
+################################################################################
+# Imports
+
+
+import unittest
+
+from configobj import ConfigObj
+
+from flightdataplotter.lfl import config_axes, frame_config, superframe_counter
+from flightdataplotter.raw_data import CounterLocation
+
+
+################################################################################
+# Test Cases
+
+
+class TestConfigAxes(unittest.TestCase):
+    def test_config_axes(self):
+        config = ConfigObj([
+            '[Parameter Group]',
+            'AXIS_1 = Airspeed, Heading',
+            'AXIS_2 = Pitch',
+            'AXIS_4 = Roll',
+        ])
+        self.assertEqual(config_axes(config), {
+            1: ['Altitude STD'], 2: ['Airspeed', 'Heading'], 3: ['Pitch']})
+        self.assertEqual(config_axes(config, ['Heading']), {
+            1: ['Altitude STD'], 2: ['Heading'], 3: ['Airspeed', 'Heading'], 4: ['Pitch']})
+
+    def test_missing_axis(self):
+        self.assertRaises(ValueError, config_axes, ConfigObj(['[Parameter Group]']))
+        self.assertRaises(ValueError, config_axes, ConfigObj([]))
+
+
+class TestFrameConfig(unittest.TestCase):
+    def test_frame_config(self):
+        lines = [
+            '[Frame]',
+            'Name = Test',
+            '[Parameters]',
+            '[[Superframe Counter]]',
+            'Words = 64',
+            '[[Airspeed]]',
+            'Words = 10',
+            '[Parameter Group]',
+            'AXIS_1 = Airspeed',
+        ]
+        frame_conf = frame_config(ConfigObj(lines))
+        self.assertEqual(sorted(frame_conf), ['Frame', 'Frame Parameters'])
+        self.assertEqual(frame_conf['Frame Parameters'], {'Superframe Counter': {'Words': '64'}})
+        # Editing the Superframe Counter changes the frame configuration.
+        edited = frame_config(ConfigObj([line.replace('64', '65') for line in lines]))
+        self.assertNotEqual(edited, frame_conf)
+        # Editing other parameters or groups does not.
+        edited = frame_config(ConfigObj([line.replace('10', '11').replace('= Airspeed', '= Pitch')
+                                         for line in lines]))
+        self.assertEqual(edited, frame_conf)
+
+
+class TestSuperframeCounter(unittest.TestCase):
+    def test_superframe_counter(self):
+        config = ConfigObj([
+            '[Parameters]',
+            '[[Superframe Counter]]',
+            'Location = 3',
+            'Subframe = 2',
+            'MSB = 4',
+        ])
+        self.assertEqual(superframe_counter(config), CounterLocation(2, 3, 4, 1))
+        del config['Parameters']['Superframe Counter']['Subframe']
+        self.assertEqual(superframe_counter(config), CounterLocation(1, 3, 4, 1))
+
+    def test_undefined(self):
+        self.assertIsNone(superframe_counter(ConfigObj([])))
+        self.assertIsNone(superframe_counter(ConfigObj(['[Parameters]', '[[Superframe Counter]]', 'Words = 64'])))
+        self.assertRaises(ValueError, superframe_counter,
+                          ConfigObj(['[Parameters]', '[[Superframe Counter]]', 'Location = 1, 3']))
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,126 @@
+################################################################################
+
+
+'''
+Tests for choosing the number of superframes decoded in memory.
+'''
+
+
+################################################################################
+# Imports
+
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from flightdataplotter import raw_data
+from flightdataplotter.memory import (
+    AUTO,
+    DEFAULT_WPS,
+    MAX_SUPERFRAMES,
+    MIN_SUPERFRAMES,
+    SUPERFRAME_DURATION,
+    auto_superframes,
+    decoded_ratio,
+    samples_per_second,
+    superframe_bytes,
+    superframes_arg,
+    words_per_second,
+)
+
+
+################################################################################
+# Test Cases
+
+
+class Param(object):
+    def __init__(self, frequency):
+        self.name = 'Param %s' % frequency
+        self.frequency = frequency
+
+
+class TestSuperframesArg(unittest.TestCase):
+    def test_superframes_arg(self):
+        self.assertEqual(superframes_arg('auto'), AUTO)
+        self.assertEqual(superframes_arg('100'), 100)
+        self.assertEqual(superframes_arg('-1'), -1)
+        self.assertRaises(ValueError, superframes_arg, 'many')
+
+    def test_parser(self):
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--superframes-in-memory', type=superframes_arg, default=-1)
+        self.assertEqual(parser.parse_args(['--superframes-in-memory', 'auto']).superframes_in_memory, AUTO)
+        self.assertEqual(parser.parse_args(['--superframes-in-memory', '8']).superframes_in_memory, 8)
+
+
+class TestEstimates(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_samples_per_second(self):
+        self.assertEqual(samples_per_second([Param(8), Param(0.25)]), 8.25)
+        # Parameters without a rate are counted at 1 Hz and reported.
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(samples_per_second([Param(8), Param(None)]), 9)
+        self.assertIn('Sample rate unknown for Param None', output.getvalue())
+        self.assertEqual(samples_per_second([]), 0)
+
+    def test_words_per_second(self):
+        self.assertEqual(words_per_second(512), 512)
+        data_path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(data_path, 'wb') as data:
+            words = np.zeros(2 * 4 * 128, dtype='<u2')
+            words[::128] = raw_data.SYNC_WORDS * 2
+            data.write(words.tobytes())
+        # Detected from the raw data when the frame does not define it.
+        self.assertEqual(words_per_second(None, data_path), 128)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(words_per_second(None), DEFAULT_WPS)
+        self.assertIn('Words per second unknown', output.getvalue())
+
+    def test_superframe_bytes(self):
+        raw = 256 * SUPERFRAME_DURATION * raw_data.WORD_SIZE
+        self.assertEqual(superframe_bytes(256, 0), raw)
+        with_params = superframe_bytes(256, 8.25)
+        self.assertGreater(with_params, raw)
+        # Higher sample rates need more memory.
+        self.assertGreater(superframe_bytes(256, 16.25), with_params)
+
+    def test_decoded_ratio(self):
+        # 64 words per second of raw data hold 128 bytes a second, and one
+        # parameter sampled at 8 Hz is decoded into 72 bytes a second.
+        self.assertAlmostEqual(decoded_ratio(64, 8), 72 / 128.0)
+        self.assertEqual(decoded_ratio(64, 0), 0)
+
+
+class TestAutoSuperframes(unittest.TestCase):
+    def test_auto_superframes(self):
+        self.assertEqual(auto_superframes(1000, available=400000, fraction=0.25), 100)
+        # Memory is shared between the workers.
+        self.assertEqual(auto_superframes(1000, workers=4, available=400000, fraction=0.25), 25)
+
+    def test_limits(self):
+        self.assertEqual(auto_superframes(10 ** 9, available=10 ** 6), MIN_SUPERFRAMES)
+        self.assertEqual(auto_superframes(1, available=10 ** 12), MAX_SUPERFRAMES)
+        self.assertEqual(auto_superframes(0, available=10 ** 9), MIN_SUPERFRAMES)
+
+    def test_system_memory(self):
+        superframes = auto_superframes(10 ** 6)
+        self.assertGreaterEqual(superframes, MIN_SUPERFRAMES)
+        self.assertLessEqual(superframes, MAX_SUPERFRAMES)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
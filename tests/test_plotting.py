@@ -0,0 +1,118 @@
+################################################################################
+
+
+'''
+Tests for plotting parameters on a figure kept open across reprocessing.
+'''
+
+
+################################################################################
+# Imports
+
+
+import unittest
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from flightdataplotter.plotting import PlotSession
+
+
+################################################################################
+# Test Cases
+
+
+class Param(object):
+    def __init__(self, name, array, frequency=1.0, units='ft'):
+        self.name = name
+        self.array = np.ma.asarray(array, dtype=float)
+        self.frequency = frequency
+        self.offset = 0
+        self.units = units
+        self.data_type = None
+
+
+def make_params(scale=1, names=('Altitude STD', 'Airspeed', 'Heading'), size=600):
+    return {name: Param(name, np.arange(size) * (index + 1) * scale)
+            for index, name in enumerate(names)}
+
+
+class TestPlotSession(unittest.TestCase):
+    def setUp(self):
+        self.session = PlotSession(False, blit=False)
+        self.axes = {1: ['Altitude STD'], 2: ['Airspeed', 'Heading']}
+
+    def tearDown(self):
+        if self.session.fig is not None:
+            plt.close(self.session.fig)
+
+    def legend_labels(self, index):
+        legend = self.session._axes[index].get_legend()
+        return [text.get_text() for text in legend.get_texts()]
+
+    def test_update_in_place(self):
+        self.session.update(make_params(), self.axes)
+        fig = self.session.fig
+        lines = {key: line.line for key, line in self.session._lines.items()}
+        self.session.update(make_params(scale=2), self.axes)
+        self.assertIs(self.session.fig, fig)
+        self.assertEqual({key: line.line for key, line in self.session._lines.items()}, lines)
+        self.assertEqual(max(lines[(2, 'Airspeed')].get_ydata()), 599 * 2 * 2)
+
+    def test_zoom_kept(self):
+        self.session.update(make_params(), self.axes)
+        axis = self.session._axes[2]
+        axis.set_xlim(100, 200)
+        axis.set_ylim(0, 50)
+        self.session.update(make_params(scale=2), self.axes)
+        self.assertEqual(tuple(self.session._axes[1].get_xlim()), (100, 200))
+        self.assertEqual(tuple(axis.get_ylim()), (0, 50))
+        # Axes which were not zoomed vertically are scaled to the new data
+        # within the view.
+        self.assertGreaterEqual(self.session._axes[1].get_ylim()[1], 200 * 2)
+
+    def test_line_added_while_zoomed(self):
+        names = ('Altitude STD', 'Airspeed')
+        self.session.update(make_params(names=names, size=100000), self.axes)
+        self.session._axes[1].set_xlim(1000, 2000)
+        self.session.update(make_params(size=100000), self.axes)
+
+        def points_in_view(key):
+            x = np.asarray(self.session._lines[key].line.get_xdata())
+            return np.count_nonzero((x >= 1000) & (x <= 2000))
+
+        self.assertGreater(points_in_view((2, 'Heading')), points_in_view((2, 'Airspeed')) // 2)
+
+    def test_removed_params(self):
+        self.session.update(make_params(), self.axes)
+        line = self.session._lines[(2, 'Heading')].line
+        self.session.update(make_params(names=('Altitude STD', 'Airspeed')), self.axes)
+        self.assertNotIn((2, 'Heading'), self.session._lines)
+        self.assertNotIn(line, self.session._axes[2].lines)
+        self.assertEqual(self.legend_labels(2), ['Airspeed : ft'])
+
+    def test_legend_refreshed(self):
+        self.session.update(make_params(), self.axes)
+        self.assertEqual(self.legend_labels(2), ['Airspeed : ft', 'Heading : ft'])
+        params = make_params()
+        params['Heading'].units = 'deg'
+        self.session.update(params, self.axes)
+        self.assertEqual(self.legend_labels(2), ['Airspeed : ft', 'Heading : deg'])
+
+    def test_rebuild_on_axes_change(self):
+        self.session.update(make_params(), self.axes)
+        fig = self.session.fig
+        axes = {1: ['Altitude STD'], 2: ['Airspeed'], 3: ['Heading']}
+        self.session.update(make_params(), axes)
+        self.assertIsNot(self.session.fig, fig)
+        # The old figure is closed.
+        self.assertEqual(plt.get_fignums(), [self.session.fig.number])
+        self.assertEqual(sorted(self.session._axes), [1, 2, 3])
+        self.assertEqual(sorted(self.session._lines), [(1, 'Altitude STD'), (2, 'Airspeed'), (3, 'Heading')])
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,112 @@
+################################################################################
+
+
+'''
+Tests for per-stage timing and memory instrumentation.
+'''
+
+
+################################################################################
+# Imports
+
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from flightdataplotter.profiling import NULL_PROFILER, Profiler, reset_peak_rss
+
+
+################################################################################
+# Test Cases
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_stages(self):
+        profiler = Profiler()
+        with profiler.stage('parse_lfl'):
+            time.sleep(0.05)
+
+        def decode():
+            with profiler.stage('create_hdf'):
+                pass
+
+        thread = threading.Thread(target=decode, name='Processing')
+        thread.start()
+        thread.join()
+        with self.assertRaises(KeyError):
+            with profiler.stage('align'):
+                raise KeyError('Altitude STD')
+        self.assertEqual([stage.name for stage in profiler.stages], ['parse_lfl', 'create_hdf', 'align'])
+        self.assertEqual(profiler.stages[1].thread, 'Processing')
+        self.assertGreaterEqual(profiler.stages[0].wall, 0.05)
+        self.assertLess(profiler.stages[0].cpu, 0.05)
+
+    def test_thread_cpu(self):
+        profiler = Profiler()
+        stop = threading.Event()
+
+        def spin():
+            while not stop.is_set():
+                pass
+
+        thread = threading.Thread(target=spin)
+        thread.start()
+        try:
+            with profiler.stage('wait'):
+                time.sleep(0.2)
+        finally:
+            stop.set()
+            thread.join()
+        # CPU time of other threads is not counted.
+        self.assertLess(profiler.stages[0].cpu, 0.1)
+
+    @unittest.skipUnless(reset_peak_rss(), 'The peak resident memory cannot be reset.')
+    def test_peak_reset(self):
+        profiler = Profiler()
+        with profiler.stage('allocate'):
+            array = np.ones(64 * 1024 ** 2 // 8)
+            del array
+        with profiler.stage('small'):
+            pass
+        large, small = profiler.stages
+        self.assertGreater(large.rss - small.rss, 32 * 1024 ** 2)
+
+    def test_summary_and_trace(self):
+        trace_path = os.path.join(self.temp_dir, 'trace.json')
+        profiler = Profiler(trace_path)
+        with profiler.stage('configobj'):
+            pass
+        self.assertIn('configobj', profiler.summary())
+        # Stages are only summarised once.
+        self.assertNotIn('configobj', profiler.summary())
+        with profiler.stage('draw'):
+            pass
+        profiler.end_cycle()
+        self.assertEqual(profiler.cycle, 2)
+        with open(trace_path) as trace_file:
+            events = json.load(trace_file)['traceEvents']
+        self.assertEqual([event['name'] for event in events], ['configobj', 'draw'])
+        self.assertEqual(events[0]['ph'], 'X')
+
+    def test_null_profiler(self):
+        self.assertFalse(NULL_PROFILER.enabled)
+        with NULL_PROFILER.stage('draw'):
+            pass
+        NULL_PROFILER.end_cycle()
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
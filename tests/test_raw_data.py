@@ -0,0 +1,152 @@
+################################################################################
+
+
+'''
+Tests for locating frames within ARINC 717 raw data.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from flightdataplotter import raw_data
+
+
+################################################################################
+# Test Cases
+
+
+def make_frames(wps, frames, lead=0):
+    '''
+    Synthetic raw data words with sync words at the start of each subframe.
+    '''
+    words = np.random.RandomState(0).randint(0, 0x1000, size=lead + frames * 4 * wps).astype(np.uint16)
+    # Avoid accidental sync patterns within the random data.
+    words[np.isin(words, raw_data.SYNC_WORDS)] = 0
+    for subframe in range(frames * 4):
+        words[lead + subframe * wps] = raw_data.SYNC_WORDS[subframe % 4]
+    return words
+
+
+def set_counter(words, wps, location, first_value, lead=0):
+    '''
+    Record a Superframe Counter which counts frames from 0 to 15 in place,
+    starting from first_value in the first frame.
+    '''
+    frames = (len(words) - lead) // (4 * wps)
+    first = lead + (location.subframe - 1) * wps + location.word - 1
+    values = (np.arange(frames) + first_value) % raw_data.FRAMES_PER_SUPERFRAME
+    words[first:first + frames * 4 * wps:4 * wps] = values << (location.lsb - 1)
+    return words
+
+
+COUNTER = raw_data.CounterLocation(subframe=2, word=5, msb=8, lsb=5)
+
+
+class TestFindSync(unittest.TestCase):
+    def test_find_sync(self):
+        words = make_frames(64, 3, lead=10)
+        self.assertEqual(raw_data.find_sync(words), (10, 64))
+        self.assertEqual(raw_data.find_sync(words, wps=64), (10, 64))
+        # Data at another rate than the one given, such as frame doubled.
+        self.assertEqual(raw_data.find_sync(words, wps=32), (10, 64))
+
+    def test_find_sync_mid_frame(self):
+        # Data starting in the second subframe finds the next full frame.
+        words = make_frames(256, 3)[256:]
+        self.assertEqual(raw_data.find_sync(words), (3 * 256, 256))
+
+    def test_find_sync_upper_bits(self):
+        words = make_frames(128, 2) | 0xF000
+        self.assertEqual(raw_data.find_sync(words), (0, 128))
+
+    def test_locate_frames(self):
+        words = make_frames(128, 5, lead=7)
+        self.assertEqual(raw_data.locate_frames(words[:-1]), (7, 128, 4))
+        self.assertEqual(raw_data.locate_frames(words, wps=128), (7, 128, 5))
+
+    def test_find_sync_missing(self):
+        self.assertRaises(ValueError, raw_data.find_sync, np.zeros(4096, dtype=np.uint16))
+
+
+class TestFrameRanges(unittest.TestCase):
+    def test_frame_byte_range(self):
+        self.assertEqual(raw_data.frame_byte_range(20, 64, 2, 5), (20 + 2 * 512, 3 * 512))
+        self.assertEqual(raw_data.frame_byte_range(0, 64, 5, 2), (5 * 512, 0))
+
+    def test_seconds_to_frames(self):
+        self.assertEqual(raw_data.seconds_to_frames(0, 600), (0, 150))
+        self.assertEqual(raw_data.seconds_to_frames(5, 10), (1, 3))
+
+    def test_superframes_to_frames(self):
+        self.assertEqual(raw_data.superframes_to_frames(2, 4), (32, 64))
+        self.assertEqual(raw_data.superframes_to_frames(2, 4, first_frame=5), (37, 69))
+
+    def test_superframe_chunks(self):
+        self.assertEqual(raw_data.superframe_chunks(100, 5, 2), [(0, 37), (37, 69), (69, 100)])
+        self.assertEqual(raw_data.superframe_chunks(64, 0, 2), [(0, 32), (32, 64)])
+        self.assertEqual(raw_data.superframe_chunks(20, 5, 2), [(0, 20)])
+
+    def test_frame_words_per_second(self):
+        class Frame(object):
+            wps = 512
+        self.assertEqual(raw_data.frame_words_per_second(Frame()), 512)
+        self.assertIsNone(raw_data.frame_words_per_second(None))
+
+
+class TestSuperframeCounter(unittest.TestCase):
+    def test_counter_values(self):
+        words = set_counter(make_frames(64, 20, lead=3), 64, COUNTER, 14, lead=3)
+        values = raw_data.counter_values(words, 3, 64, COUNTER, 4)
+        self.assertEqual(values.tolist(), [14, 15, 0, 1])
+        # The data ends first.
+        self.assertEqual(len(raw_data.counter_values(words, 3, 64, COUNTER, 30)), 20)
+        self.assertRaises(ValueError, raw_data.counter_values, words, 3, 64,
+                          raw_data.CounterLocation(1, 65, 12, 1), 4)
+
+    def test_first_superframe(self):
+        for first_value, first_frame in ((0, 0), (1, 15), (14, 2), (15, 1)):
+            words = set_counter(make_frames(64, 20, lead=3), 64, COUNTER, first_value, lead=3)
+            self.assertEqual(raw_data.first_superframe(words, 3, 64, COUNTER), first_frame)
+
+    def test_first_superframe_invalid(self):
+        words = make_frames(64, 20)
+        # The counter is not recorded.
+        self.assertRaises(ValueError, raw_data.first_superframe, words, 0, 64, COUNTER)
+        # Too short to find where the counter wraps.
+        words = set_counter(make_frames(64, 16), 64, COUNTER, 3)
+        self.assertRaises(ValueError, raw_data.first_superframe, words, 0, 64, COUNTER)
+
+
+class TestWords(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_map_words(self):
+        words = make_frames(64, 2)
+        path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(path, 'wb') as data:
+            data.write(words.astype('<u2').tobytes() + b'\x00')
+        mapped = raw_data.map_words(path)
+        np.testing.assert_array_equal(mapped, words)
+        self.assertEqual(raw_data.find_sync(mapped), (0, 64))
+        del mapped
+
+        empty_path = os.path.join(self.temp_dir, 'empty.dat')
+        open(empty_path, 'wb').close()
+        self.assertEqual(len(raw_data.map_words(empty_path)), 0)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,68 @@
+################################################################################
+
+
+'''
+Tests for choosing where scratch HDF files are written.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from flightdataplotter import scratch
+from flightdataplotter.scratch import AUTO, DISK, MEMORY, memory_dir, scratch_dir
+
+
+################################################################################
+# Test Cases
+
+
+class TestScratchDir(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.memory_dir = os.path.join(self.temp_dir, 'shm')
+        self.disk_dir = os.path.join(self.temp_dir, 'disk')
+        os.mkdir(self.memory_dir)
+        os.mkdir(self.disk_dir)
+        patcher = mock.patch.object(scratch, 'MEMORY_DIRS', ('/nonexistent', self.memory_dir))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_memory_dir(self):
+        self.assertEqual(memory_dir(), self.memory_dir)
+        with mock.patch.object(scratch, 'MEMORY_DIRS', ('/nonexistent',)):
+            self.assertIsNone(memory_dir())
+
+    def test_disk(self):
+        self.assertEqual(scratch_dir(DISK, 1024, disk_dir=self.disk_dir), self.disk_dir)
+        self.assertEqual(scratch_dir(DISK, 1024), tempfile.gettempdir())
+
+    def test_memory(self):
+        self.assertEqual(scratch_dir(MEMORY, 1024, disk_dir=self.disk_dir), self.memory_dir)
+        # Falls back to disk above the size limit.
+        self.assertEqual(scratch_dir(MEMORY, 2048, max_size=1024, disk_dir=self.disk_dir), self.disk_dir)
+        # And when larger than the free space.
+        self.assertEqual(scratch_dir(MEMORY, 2 ** 62, max_size=2 ** 63, disk_dir=self.disk_dir), self.disk_dir)
+        with mock.patch.object(scratch, 'MEMORY_DIRS', ()):
+            self.assertEqual(scratch_dir(MEMORY, 1024, disk_dir=self.disk_dir), self.disk_dir)
+
+    def test_auto(self):
+        self.assertEqual(scratch_dir(AUTO, 1024, disk_dir=self.disk_dir, available=10 ** 9), self.memory_dir)
+        # Falls back to disk when the files would take much of the memory available.
+        self.assertEqual(scratch_dir(AUTO, 1024, disk_dir=self.disk_dir, available=2048), self.disk_dir)
+        self.assertEqual(scratch_dir(AUTO, 2048, max_size=1024, disk_dir=self.disk_dir, available=10 ** 9),
+                         self.disk_dir)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,116 @@
+################################################################################
+
+
+'''
+Tests for reading line data for plotting.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from flightdataplotter.sources import ArraySource, HDFSource, TimeBase, open_params
+
+
+################################################################################
+# Test Cases
+
+
+class TestTimeBase(unittest.TestCase):
+    def test_x(self):
+        time_base = TimeBase(8.0)
+        np.testing.assert_array_equal(time_base.x(8.0, 0, 4), [0, 1, 2, 3])
+        np.testing.assert_array_equal(time_base.x(2.0, 0.25, 3), [2, 6, 10])
+        self.assertEqual(time_base.scale(4.0), 2)
+        self.assertEqual(time_base.origin(0.5), 4)
+
+    def test_shared_views(self):
+        time_base = TimeBase(4.0)
+        x = time_base.x(1.0, 0.5, 100)
+        shorter = time_base.x(1.0, 0.5, 50)
+        self.assertIs(shorter.base, x.base)
+        self.assertFalse(shorter.flags.writeable)
+        # A longer request replaces the cached coordinates.
+        self.assertEqual(len(time_base.x(1.0, 0.5, 200)), 200)
+
+
+class TestArraySource(unittest.TestCase):
+    def test_read(self):
+        source = ArraySource(np.arange(100) * 2, np.ma.arange(100))
+        x, y = source.read(None, 100)
+        self.assertEqual(len(x), 100)
+        x, y = source.read((20, 40), 100)
+        np.testing.assert_array_equal(x, np.arange(18, 43, 2))
+        np.testing.assert_array_equal(y, np.arange(9, 22))
+
+
+class TestHDFSource(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.hdf_path = os.path.join(self.temp_dir, 'test.hdf5')
+        self.data = np.sin(np.linspace(0, 100, 1000000))
+        self.data[123456] = 10
+        mask = np.zeros(len(self.data), dtype=bool)
+        mask[500000:600000] = True
+        with h5py.File(self.hdf_path, 'w') as hdf:
+            group = hdf.create_group('series').create_group('Altitude STD')
+            group.create_dataset('data', data=self.data)
+            group.create_dataset('mask', data=mask)
+            group.attrs['frequency'] = 8.0
+            group.attrs['supf_offset'] = 0.25
+            group.attrs['units'] = 'ft'
+            masked = hdf['series'].create_group('Masked')
+            masked.create_dataset('data', data=np.zeros(10))
+            masked.create_dataset('mask', data=np.ones(10, dtype=bool))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_open_params(self):
+        params, missing = open_params(self.hdf_path, ['Altitude STD', 'Airspeed', 'Altitude STD'])
+        self.assertEqual(missing, ['Airspeed'])
+        param = params['Altitude STD']
+        self.assertEqual(param.frequency, 8)
+        self.assertEqual(param.offset, 0.25)
+        self.assertEqual(param.size, len(self.data))
+        self.assertEqual(param.array[123456], 10)
+        self.assertTrue(param.array.mask[500000])
+
+    def test_overview(self):
+        source = HDFSource(self.hdf_path, 'Altitude STD', len(self.data), scale=2.0, block_size=100000)
+        x, y = source.read(None, 500)
+        self.assertLessEqual(len(y), 1000)
+        self.assertEqual(np.nanmax(y), 10)
+        self.assertEqual(x[np.nanargmax(y)], 123456 * 2)
+        # The masked section is a gap.
+        gap = np.isnan(y)
+        self.assertTrue(gap.any())
+        self.assertTrue(np.all((x[gap] >= 1000000) & (x[gap] < 1200000)))
+        self.assertFalse(source.all_masked())
+
+    def test_window(self):
+        source = HDFSource(self.hdf_path, 'Altitude STD', len(self.data), scale=2.0, origin=1.0)
+        x, y = source.read((201, 401), 500)
+        np.testing.assert_array_equal(x, np.arange(99, 202) * 2.0 + 1)
+        np.testing.assert_array_equal(y, self.data[99:202])
+
+    def test_unmasked(self):
+        source = HDFSource(self.hdf_path, 'Altitude STD', len(self.data), masked=False)
+        x, y = source.read((500000, 500010), 500)
+        self.assertFalse(np.isnan(y).any())
+
+    def test_all_masked(self):
+        self.assertTrue(HDFSource(self.hdf_path, 'Masked', 10).all_masked())
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
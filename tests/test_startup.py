@@ -0,0 +1,82 @@
+################################################################################
+
+
+'''
+Tests that starting the plotter does not import GUI or decoding packages
+before they are needed.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import h5py
+import numpy as np
+
+
+################################################################################
+# Test Cases
+
+
+# Generous enough for a slow machine but far below the cost of importing wx,
+# pyplot and compass.
+STARTUP_BUDGET = 3.0  # seconds
+# Plotting a small file adds importing pyplot and drawing once.
+HEADLESS_BUDGET = 6.0  # seconds
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(*args, **kwargs):
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT_DIR, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, **kwargs)
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_is_lazy(self):
+        modules = run_python('-c', (
+            'import sys, flightdataplotter.plot_params; '
+            'print(" ".join(sorted(sys.modules)))')).stdout.split()
+        for module in ('wx', 'matplotlib.pyplot', 'compass', 'analysis_engine', 'hdfaccess'):
+            self.assertNotIn(module, modules)
+
+    def test_help_budget(self):
+        start = time.time()
+        output = run_python('-m', 'flightdataplotter.plot_params', '--help').stdout
+        self.assertLess(time.time() - start, STARTUP_BUDGET)
+        self.assertIn('--lfl', output)
+
+    def test_headless_budget(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            hdf_path = os.path.join(temp_dir, 'flight.hdf5')
+            with h5py.File(hdf_path, 'w') as hdf:
+                series = hdf.create_group('series')
+                for name in ('Altitude STD', 'Airspeed'):
+                    group = series.create_group(name)
+                    group.create_dataset('data', data=np.arange(3600, dtype=float))
+                    group.create_dataset('mask', data=np.zeros(3600, dtype=bool))
+                    group.attrs['frequency'] = 1
+            # Without a display, as on a build server.
+            env = dict(os.environ, MPLBACKEND='Agg')
+            env.pop('DISPLAY', None)
+            start = time.time()
+            output = run_python('-m', 'flightdataplotter.plot_params', '--hdf', '-r', hdf_path,
+                                '--axis2', 'Airspeed', env=env).stdout
+            self.assertLess(time.time() - start, HEADLESS_BUDGET)
+            self.assertIn('Plotting parameters.', output)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
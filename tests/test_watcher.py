@@ -0,0 +1,95 @@
+################################################################################
+
+
+'''
+Tests for watching the LFL file for saves.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from flightdataplotter.watcher import InotifyWatcher, PollWatcher
+
+
+################################################################################
+# Test Cases
+
+
+def save_later(func, delay=0.1):
+    timer = threading.Timer(delay, func)
+    timer.start()
+    return timer
+
+
+class WatcherTestMixin(object):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'test.lfl')
+        with open(self.path, 'w') as f:
+            f.write('[Parameters]\n')
+        self.watcher = self.create_watcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, path=None, text='[Parameters]\n[[Altitude STD]]\n'):
+        with open(path or self.path, 'w') as f:
+            f.write(text)
+
+    def test_timeout(self):
+        self.assertFalse(self.watcher.wait(timeout=0.1))
+
+    def test_save(self):
+        save_later(self.write)
+        self.assertTrue(self.watcher.wait(timeout=5))
+        self.assertFalse(self.watcher.wait(timeout=0.1))
+
+    def test_atomic_rename(self):
+        temp_path = os.path.join(self.temp_dir, 'test.lfl.tmp')
+
+        def save():
+            self.write(temp_path)
+            os.replace(temp_path, self.path)
+
+        save_later(save)
+        self.assertTrue(self.watcher.wait(timeout=5))
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify requires Linux')
+class TestInotifyWatcher(WatcherTestMixin, unittest.TestCase):
+    def create_watcher(self):
+        return InotifyWatcher(self.path)
+
+    def test_other_files_ignored(self):
+        save_later(lambda: self.write(os.path.join(self.temp_dir, '.test.lfl.swp')))
+        self.assertFalse(self.watcher.wait(timeout=0.3))
+
+    def test_debounce(self):
+        def save():
+            for _ in range(5):
+                self.write()
+                time.sleep(0.01)
+
+        save_later(save)
+        self.assertTrue(self.watcher.wait(timeout=5))
+        self.assertFalse(self.watcher.wait(timeout=0.2))
+
+
+class TestPollWatcher(WatcherTestMixin, unittest.TestCase):
+    def create_watcher(self):
+        return PollWatcher(self.path, interval=0.05)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4